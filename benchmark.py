@@ -0,0 +1,904 @@
+"""
+Benchmark
+
+Load test of the transcription pipeline against local mock provider servers, so
+throughput and latency can be measured without spending API credits.
+
+Usage:
+    python benchmark.py                                          (default matrix)
+    python benchmark.py --minutes 1 10 30 --concurrency 1 4 8
+    python benchmark.py --latency 0.2 --latency deepgram=2 --failure-rate 0.05 --throttle 5
+    python benchmark.py --json after.json --baseline before.json  (fail on regressions)
+    python benchmark.py --stage http://127.0.0.1:5000            (stage audio in a local S3, e.g. moto_server)
+    python benchmark.py --serve --port 8765                      (only run the mock servers)
+
+The mock servers imitate every endpoint the providers call (AssemblyAI upload, transcript
+and polling, Speechmatics and Rev AI jobs, Groq and OpenAI transcriptions, Deepgram listen,
+IBM recognize, Vatis asr and the OpenAI chat completions used to combine), and the
+real-time WebSocket APIs of Deepgram, AssemblyAI and Speechmatics used in live mode. They run in
+their own process, so their threads and memory do not count towards the measurements.
+Providers that are given a staged audio URL instead of an upload download it from there.
+
+For every audio length and concurrency level the pipeline transcribes a batch of
+generated recordings, and the report shows throughput, p50/p99 latency per file, peak
+RSS and the peak number of threads.
+"""
+
+import os
+import sys
+import argparse
+import base64
+import concurrent.futures
+import contextlib
+import hashlib
+import importlib.util
+import itertools
+import json
+import math
+import multiprocessing
+import random
+import re
+import struct
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import transcriber
+
+# === CONFIG ===
+MINUTES = (1, 10)  # Audio lengths benchmarked by default
+CONCURRENCY = (1, 4)  # Files transcribed at the same time by default
+FILES_PER_WORKER = 2  # Files per concurrency level and worker
+LATENCY_SECONDS = 0.1  # Mock response time of every request
+JOB_SECONDS = 0.5  # How long a mock async job stays 'processing'
+WORDS_PER_SECOND = 2.5  # Words the mocks return per second of audio
+SAMPLE_INTERVAL = 0.05  # How often RSS and threads are sampled
+TOLERANCE = 0.2  # Allowed slowdown against a baseline before it counts as a regression
+STAGE_BUCKET = 'transcriber-benchmark'  # Bucket used with --stage
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'  # From RFC 6455, for the handshake
+MOCK_WORDS = ("de", "vergadering", "begint", "om", "tien", "uur", "en", "we", "bespreken",
+              "het", "budget", "voor", "volgend", "jaar", "met", "alle", "afdelingen")
+
+# Route prefix of every mocked provider
+MOCK_PROVIDERS = {
+    "AssemblyAI": "assemblyai",
+    "OpenAI Whisper": "openai",
+    "Groq Whisper Large-v3 Turbo": "groq",
+    "Speechmatics": "speechmatics",
+    "Deepgram": "deepgram",
+    "IBM Watson Speech to Text": "ibm",
+    "Rev AI": "revai",
+    "Vatis Tech": "vatis",
+}
+
+
+# === MOCK SERVERS ===
+
+def mock_words(size):
+    """Return (word, start, end) tuples for an upload of this many bytes (16 kHz 16-bit mono)."""
+    seconds = size / 32000.0
+    count = max(1, int(seconds * WORDS_PER_SECOND))
+    step = seconds / count if seconds else 0.4
+    return [(MOCK_WORDS[i % len(MOCK_WORDS)], round(i * step, 2), round((i + 0.8) * step, 2))
+            for i in range(count)]
+
+
+class MockState:
+    """
+    Settings, jobs and counters shared by all requests of a mock server.
+
+    Args:
+        latency (dict): Seconds per response, by route prefix ('' is the default).
+        jitter (float): Random extra latency, as a fraction of the latency.
+        job_seconds (float): How long async jobs stay 'processing'.
+        failure_rate (dict): Fraction of requests answered with HTTP 500, by route prefix.
+        throttle (dict): Requests per second allowed before HTTP 429, by route prefix
+            (0 is unlimited).
+    """
+
+    def __init__(self, latency=None, jitter=0.0, job_seconds=JOB_SECONDS, failure_rate=None, throttle=None):
+        self.latency = latency or {'': LATENCY_SECONDS}
+        self.jitter = jitter
+        self.job_seconds = job_seconds
+        self.failure_rate = failure_rate or {}
+        self.throttle = throttle or {}
+        self.lock = threading.Lock()
+        self.uploads = {}
+        self.jobs = {}
+        self.buckets = {}
+        self.counters = {}
+
+    def setting(self, values, prefix):
+        return values.get(prefix, values.get('', 0))
+
+    def count(self, prefix, key, amount=1):
+        with self.lock:
+            counters = self.counters.setdefault(prefix, {})
+            counters[key] = counters.get(key, 0) + amount
+
+    def throttled(self, prefix):
+        """Take a token from the prefix's bucket; True if there was none left."""
+        rate = self.setting(self.throttle, prefix)
+        if not rate:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            tokens, last = self.buckets.get(prefix, (rate, now))
+            tokens = min(rate, tokens + (now - last) * rate)
+            if tokens < 1:
+                self.buckets[prefix] = (tokens, now)
+                return True
+            self.buckets[prefix] = (tokens - 1, now)
+            return False
+
+    def new_job(self, size):
+        job_id = uuid.uuid4().hex
+        with self.lock:
+            self.jobs[job_id] = (time.monotonic() + self.job_seconds, size)
+        return job_id
+
+    def job(self, job_id):
+        """Return (done, size) of a job, or None if it does not exist."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        return time.monotonic() >= job[0], job[1]
+
+    def take_counters(self):
+        with self.lock:
+            counters, self.counters = self.counters, {}
+        return counters
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Answers provider API requests like the real services, after the configured latency."""
+
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real APIs
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.headers.get('Upgrade', '').lower() == 'websocket':
+            self.handle_stream()
+        else:
+            self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_DELETE(self):
+        self.handle_request('DELETE')
+
+    def read_body(self):
+        """
+        Read the request body. JSON bodies are kept in self.json and small forms (without
+        audio) in self.form; audio is discarded.
+
+        Returns:
+            int: Size of the body in bytes.
+        """
+        content_type = self.headers.get('Content-Type', '')
+        form = content_type.startswith('multipart/form-data') and int(self.headers.get('Content-Length') or 0) < 1 << 16
+        keep = content_type.startswith('application/json') or form
+        blocks, size = [], 0
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                length = int(self.rfile.readline().split(b';')[0], 16)
+                if not length:
+                    self.rfile.readline()
+                    break
+                block = self.rfile.read(length)
+                size += len(block)
+                if keep:
+                    blocks.append(block)
+                self.rfile.readline()
+        else:
+            remaining = int(self.headers.get('Content-Length') or 0)
+            while remaining > 0:
+                block = self.rfile.read(min(remaining, 1 << 16))
+                if not block:
+                    break
+                remaining -= len(block)
+                size += len(block)
+                if keep:
+                    blocks.append(block)
+        self.json = json.loads(b''.join(blocks)) if keep and blocks and not form else {}
+        self.form = b''.join(blocks) if form else b''
+        return size
+
+    def fetch(self, url):
+        """Download staged audio like a provider would; returns its size in bytes (0 on failure)."""
+        prefix = urlsplit(self.path).path.strip('/').split('/')[0]
+        try:
+            with urllib.request.urlopen(url, timeout=60) as response:
+                size = sum(len(block) for block in iter(lambda: response.read(1 << 16), b''))
+        except OSError:
+            self.state.count(prefix, 'fetch_failed')
+            return 0
+        self.state.count(prefix, 'bytes_fetched', size)
+        return size
+
+    def send(self, status, body=None, content_type='application/json', headers=None):
+        data = body if isinstance(body, bytes) else json.dumps(body if body is not None else {}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def handle_request(self, method):
+        url = urlsplit(self.path)
+        size = self.read_body()
+        if url.path == '/_stats':
+            self.send(200, self.state.take_counters())
+            return
+        prefix = url.path.strip('/').split('/')[0]
+        state = self.state
+        state.count(prefix, 'requests')
+        state.count(prefix, 'bytes_in', size)
+        latency = state.setting(state.latency, prefix)
+        time.sleep(latency * (1 + random.uniform(0, state.jitter)))
+        if state.throttled(prefix):
+            state.count(prefix, 'throttled')
+            self.send(429, {'error': 'rate limit exceeded'}, headers={'Retry-After': '1'})
+            return
+        if random.random() < state.setting(state.failure_rate, prefix):
+            state.count(prefix, 'failed')
+            self.send(500, {'error': 'injected failure'})
+            return
+        for route_method, pattern, handler in ROUTES:
+            match = re.fullmatch(pattern, url.path)
+            if route_method == method and match:
+                handler(self, size, parse_qs(url.query), *match.groups())
+                return
+        self.send(404, {'error': f'no mock for {method} {url.path}'})
+
+    # --- AssemblyAI ---
+
+    def assemblyai_upload(self, size, query):
+        upload_id = uuid.uuid4().hex
+        with self.state.lock:
+            self.state.uploads[upload_id] = size
+        self.send(200, {'upload_url': f'mock://{upload_id}'})
+
+    def assemblyai_transcript(self, size, query):
+        audio_url = self.json.get('audio_url', '')
+        if audio_url.startswith('http'):
+            upload_size = self.fetch(audio_url)
+        else:
+            with self.state.lock:
+                upload_size = self.state.uploads.pop(audio_url.replace('mock://', ''), 0)
+        self.send(200, {'id': self.state.new_job(upload_size), 'status': 'queued'})
+
+    def assemblyai_poll(self, size, query, job_id):
+        job = self.state.job(job_id)
+        if job is None:
+            self.send(404, {'error': 'transcript not found'})
+        elif not job[0]:
+            self.send(200, {'id': job_id, 'status': 'processing'})
+        else:
+            words = mock_words(job[1])
+            self.send(200, {'id': job_id, 'status': 'completed', 'text': ' '.join(w for w, _, _ in words),
+                            'words': [{'text': w, 'start': int(s * 1000), 'end': int(e * 1000), 'confidence': 0.9}
+                                      for w, s, e in words]})
+
+    # --- Speechmatics ---
+
+    def speechmatics_submit(self, size, query):
+        match = re.search(rb'name="config"\r\n\r\n(.*?)\r\n--', self.form, re.S)
+        fetch_url = (json.loads(match.group(1)).get('fetch_data') or {}).get('url') if match else None
+        self.send(201, {'id': self.state.new_job(self.fetch(fetch_url) if fetch_url else size)})
+
+    def speechmatics_status(self, size, query, job_id):
+        job = self.state.job(job_id)
+        if job is None:
+            self.send(404, {'error': 'job not found'})
+        else:
+            self.send(200, {'job': {'id': job_id, 'job_status': 'done' if job[0] else 'running'}})
+
+    def speechmatics_transcript(self, size, query, job_id):
+        job = self.state.job(job_id)
+        if job is None:
+            self.send(404, {'error': 'job not found'})
+            return
+        self.send(200, {'results': [{'type': 'word', 'start_time': s, 'end_time': e,
+                                     'alternatives': [{'content': w, 'confidence': 0.9}]}
+                                    for w, s, e in mock_words(job[1])]})
+
+    # --- Rev AI ---
+
+    def revai_submit(self, size, query):
+        source_url = (self.json.get('source_config') or {}).get('url')
+        self.send(200, {'id': self.state.new_job(self.fetch(source_url) if source_url else size),
+                        'status': 'in_progress'})
+
+    def revai_status(self, size, query, job_id):
+        job = self.state.job(job_id)
+        if job is None:
+            self.send(404, {'error': 'job not found'})
+        else:
+            self.send(200, {'id': job_id, 'status': 'transcribed' if job[0] else 'in_progress'})
+
+    def revai_transcript(self, size, query, job_id):
+        job = self.state.job(job_id)
+        if job is None:
+            self.send(404, {'error': 'job not found'})
+            return
+        elements = []
+        for w, s, e in mock_words(job[1]):
+            elements += [{'type': 'text', 'value': w, 'ts': s, 'end_ts': e, 'confidence': 0.9},
+                         {'type': 'punct', 'value': ' '}]
+        self.send(200, {'monologues': [{'speaker': 0, 'elements': elements}]})
+
+    def delete_job(self, size, query, job_id):
+        with self.state.lock:
+            self.state.jobs.pop(job_id, None)
+        self.send(200, {})
+
+    # --- Synchronous transcription ---
+
+    def whisper(self, size, query):
+        words = mock_words(size)
+        self.send(200, {'task': 'transcribe', 'language': 'dutch', 'duration': size / 32000.0,
+                        'text': ' '.join(w for w, _, _ in words),
+                        'words': [{'word': w, 'start': s, 'end': e} for w, s, e in words]})
+
+    def deepgram(self, size, query):
+        words = mock_words(self.fetch(self.json['url']) if self.json.get('url') else size)
+        self.send(200, {'results': {'channels': [{'alternatives': [{
+            'transcript': ' '.join(w for w, _, _ in words), 'confidence': 0.9,
+            'words': [{'word': w, 'punctuated_word': w, 'start': s, 'end': e, 'confidence': 0.9}
+                      for w, s, e in words]}]}]}})
+
+    def ibm(self, size, query):
+        words = mock_words(size)
+        self.send(200, {'results': [{'final': True, 'alternatives': [{
+            'transcript': ' '.join(w for w, _, _ in words), 'confidence': 0.9,
+            'timestamps': [[w, s, e] for w, s, e in words],
+            'word_confidence': [[w, 0.9] for w, _, _ in words]}]}]})
+
+    def vatis(self, size, query):
+        self.send(200, {'result': {'text': ' '.join(w for w, _, _ in mock_words(size))}})
+
+    # --- OpenAI chat (combine step) ---
+
+    def chat(self, size, query):
+        # Answer with the last transcript in the request, like a combine that changed nothing
+        text = (self.json.get('messages') or [{}])[-1].get('content', '').split('\n\n')[-1]
+        text = text.split(':\n', 1)[-1]
+        base = {'id': 'chatcmpl-mock', 'created': int(time.time()), 'model': self.json.get('model', 'gpt-4o')}
+        prompt_tokens = sum(len(m.get('content', '').split()) for m in self.json.get('messages') or [])
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': len(text.split()),
+                 'total_tokens': prompt_tokens + len(text.split())}
+        if self.json.get('stream'):
+            events = [{**base, 'object': 'chat.completion.chunk',
+                       'choices': [{'index': 0, 'delta': {'content': word + ' '}, 'finish_reason': None}]}
+                      for word in text.split()]
+            events.append({**base, 'object': 'chat.completion.chunk',
+                           'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})
+            if (self.json.get('stream_options') or {}).get('include_usage'):
+                events.append({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})
+            body = ''.join(f'data: {json.dumps(event)}\n\n' for event in events) + 'data: [DONE]\n\n'
+            self.send(200, body.encode('utf-8'), 'text/event-stream')
+        else:
+            self.send(200, {**base, 'object': 'chat.completion',
+                            'choices': [{'index': 0, 'finish_reason': 'stop',
+                                         'message': {'role': 'assistant', 'content': text}}],
+                            'usage': usage})
+
+
+    # --- Streaming (WebSocket) ---
+
+    def handle_stream(self):
+        """Accept a WebSocket connection and answer it like the provider's real-time API."""
+        url = urlsplit(self.path)
+        dialect = STREAM_DIALECTS.get(STREAM_ROUTES.get(url.path.rstrip('/')))
+        if dialect is None:
+            self.send(404, {'error': f'no streaming mock for {url.path}'})
+            return
+        key = self.headers.get('Sec-WebSocket-Key', '')
+        self.send_response(101)
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept',
+                         base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode())
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+        prefix = url.path.strip('/').split('/')[0]
+        self.state.count(prefix, 'streams')
+        self.stream(prefix, dialect)
+
+    def ws_read(self):
+        """
+        Read one message from the client, answering pings on the way.
+
+        Returns:
+            tuple: (opcode, payload); opcode 8 when the client closed the connection.
+        """
+        opcode, data = None, b''
+        while True:
+            head = self.rfile.read(2)
+            if len(head) < 2:
+                return 8, b''
+            length = head[1] & 0x7f
+            if length == 126:
+                length = struct.unpack('>H', self.rfile.read(2))[0]
+            elif length == 127:
+                length = struct.unpack('>Q', self.rfile.read(8))[0]
+            mask = self.rfile.read(4) if head[1] & 0x80 else b'\0' * 4
+            payload = self.rfile.read(length)
+            if length:
+                mask = (mask * (length // 4 + 1))[:length]
+                payload = (int.from_bytes(payload, 'big') ^ int.from_bytes(mask, 'big')).to_bytes(length, 'big')
+            if head[0] & 0x0f == 0x9:
+                self.ws_send(payload, 0xA)
+                continue
+            if head[0] & 0x0f == 0xA:
+                continue
+            opcode = head[0] & 0x0f or opcode
+            data += payload
+            if head[0] & 0x80:
+                return opcode, data
+
+    def ws_send(self, payload, opcode=0x1):
+        """Send one unmasked message: a dict as JSON text, or bytes with the given opcode."""
+        if isinstance(payload, dict):
+            payload = json.dumps(payload).encode('utf-8')
+        length = len(payload)
+        if length < 126:
+            head = struct.pack('>BB', 0x80 | opcode, length)
+        elif length < 1 << 16:
+            head = struct.pack('>BBH', 0x80 | opcode, 126, length)
+        else:
+            head = struct.pack('>BBQ', 0x80 | opcode, 127, length)
+        self.wfile.write(head + payload)
+        self.wfile.flush()
+
+    def stream(self, prefix, dialect):
+        """
+        Run one streaming session: after every second of audio, send its words as a partial
+        and then a final transcript; at the provider's end message send the rest and close.
+        """
+        if 'started' in dialect:
+            opcode, message = self.ws_read()
+            if opcode != 0x1 or json.loads(message).get('message') != 'StartRecognition':
+                self.ws_send({'message': 'Error', 'reason': 'expected StartRecognition'})
+                self.ws_send(b'', 0x8)
+                return
+            self.ws_send(dialect['started'])
+        received, sent = 0, 0
+
+        def send_words(upto, partial):
+            text = ' '.join(MOCK_WORDS[i % len(MOCK_WORDS)] for i in range(sent, upto))
+            if text:
+                if partial:
+                    self.ws_send(dialect['result'](text, False))
+                self.ws_send(dialect['result'](text, True))
+            return upto
+
+        while True:
+            opcode, payload = self.ws_read()
+            if opcode == 0x8:
+                return
+            if opcode == 0x2:
+                seconds = (received + len(payload)) // 32000
+                received += len(payload)
+                self.state.count(prefix, 'bytes_in', len(payload))
+                if seconds > (received - len(payload)) // 32000:
+                    sent = send_words(int(seconds * WORDS_PER_SECOND), True)
+            elif opcode == 0x1 and dialect['end'](json.loads(payload)):
+                sent = send_words(int(received / 32000.0 * WORDS_PER_SECOND), False)
+                if dialect.get('closing'):
+                    self.ws_send(dialect['closing'])
+                self.ws_send(b'', 0x8)
+                return
+
+
+ROUTES = [
+    ('POST', r'/assemblyai/v2/upload', MockHandler.assemblyai_upload),
+    ('POST', r'/assemblyai/v2/transcript', MockHandler.assemblyai_transcript),
+    ('GET', r'/assemblyai/v2/transcript/(\w+)', MockHandler.assemblyai_poll),
+    ('DELETE', r'/assemblyai/v2/transcript/(\w+)', MockHandler.delete_job),
+    ('POST', r'/speechmatics/v2/jobs/?', MockHandler.speechmatics_submit),
+    ('GET', r'/speechmatics/v2/jobs/(\w+)/?', MockHandler.speechmatics_status),
+    ('GET', r'/speechmatics/v2/jobs/(\w+)/transcript', MockHandler.speechmatics_transcript),
+    ('DELETE', r'/speechmatics/v2/jobs/(\w+)/?', MockHandler.delete_job),
+    ('POST', r'/revai/speechtotext/v1/jobs', MockHandler.revai_submit),
+    ('GET', r'/revai/speechtotext/v1/jobs/(\w+)', MockHandler.revai_status),
+    ('GET', r'/revai/speechtotext/v1/jobs/(\w+)/transcript', MockHandler.revai_transcript),
+    ('DELETE', r'/revai/speechtotext/v1/jobs/(\w+)', MockHandler.delete_job),
+    ('POST', r'/(?:openai|groq/openai)/v1/audio/transcriptions', MockHandler.whisper),
+    ('POST', r'/openai/v1/chat/completions', MockHandler.chat),
+    ('POST', r'/deepgram/v1/listen', MockHandler.deepgram),
+    ('POST', r'/ibm/v1/recognize', MockHandler.ibm),
+    ('POST', r'/vatis/api/v1/speech-to-text/asr', MockHandler.vatis),
+]
+
+# Path of every mocked real-time API, and how each one talks
+STREAM_ROUTES = {
+    '/deepgram/v1/listen': 'deepgram',
+    '/assemblyai/v3/ws': 'assemblyai',
+    '/speechmatics/v2': 'speechmatics',
+}
+STREAM_DIALECTS = {
+    'deepgram': {
+        'result': lambda text, final: {'type': 'Results', 'is_final': final,
+                                       'channel': {'alternatives': [{'transcript': text}]}},
+        'end': lambda message: message.get('type') == 'CloseStream',
+    },
+    'assemblyai': {
+        'result': lambda text, final: {'type': 'Turn', 'transcript': text, 'end_of_turn': final},
+        'end': lambda message: message.get('type') == 'Terminate',
+        'closing': {'type': 'Termination'},
+    },
+    'speechmatics': {
+        'started': {'message': 'RecognitionStarted', 'id': 'mock'},
+        'result': lambda text, final: {'message': 'AddTranscript' if final else 'AddPartialTranscript',
+                                       'metadata': {'transcript': text}},
+        'end': lambda message: message.get('message') == 'EndOfStream',
+        'closing': {'message': 'EndOfTranscript'},
+    },
+}
+
+
+def serve(port, settings, ready=None):
+    """
+    Run the mock servers until the process is stopped.
+
+    Args:
+        port (int): Port to listen on (0 picks a free one).
+        settings (dict): Keyword arguments of MockState.
+        ready (multiprocessing.Queue): Receives the port once the server listens.
+    """
+    handler = type('Handler', (MockHandler,), {'state': MockState(**settings)})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    if ready is not None:
+        ready.put(server.server_address[1])
+    else:
+        print(f"[INFO] Mock providers listening on http://127.0.0.1:{server.server_address[1]}")
+    server.serve_forever()
+
+
+@contextlib.contextmanager
+def mock_servers(settings):
+    """Start the mock servers in a separate process and yield their base URL."""
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve, args=(0, settings, ready), daemon=True)
+    process.start()
+    try:
+        yield f'http://127.0.0.1:{ready.get(timeout=30)}'
+    finally:
+        process.terminate()
+        process.join()
+
+
+def mock_config(base, providers, combine, rate_limits, work_dir, stage=None):
+    """
+    Return a config that points the providers at the mock servers.
+
+    Args:
+        base (str): Base URL of the mock servers.
+        providers (list): Names of the providers to use.
+        combine (str): 'combine' method.
+        rate_limits (bool): Keep the providers' default rate limits.
+        work_dir (str): Directory for the provider stats file.
+        stage (str): Optional S3-compatible endpoint to stage the audio in (STAGE_BUCKET).
+    """
+    config = {
+        'assemblyai_api_key': 'mock', 'openai_api_key': 'mock', 'groq_api_key': 'mock',
+        'speechmatics_api_key': 'mock', 'deepgram_api_key': 'mock', 'ibm_api_key': 'mock',
+        'revai_api_key': 'mock', 'vatis_api_key': 'mock',
+        'groq_whisper_endpoint': f'{base}/groq/openai/v1/audio/transcriptions',
+        'ibm_url': f'{base}/ibm',
+        'endpoints': {name: f'{base}/{prefix}' for name, prefix in MOCK_PROVIDERS.items()},
+        'providers': providers,
+        'combine': combine,
+        'cache': False,
+        'preprocess': False,
+        'stats_file': os.path.join(work_dir, 'provider_stats.json'),
+    }
+    config['endpoints']['OpenAI'] = f'{base}/openai/v1'
+    config['streaming_urls'] = {
+        'Deepgram': f'ws{base[4:]}/deepgram/v1/listen?encoding=linear16&sample_rate={transcriber.RATE}',
+        'AssemblyAI': f'ws{base[4:]}/assemblyai/v3/ws?sample_rate={transcriber.RATE}',
+        'Speechmatics': f'ws{base[4:]}/speechmatics/v2',
+    }
+    if combine == 'rover':
+        del config['openai_api_key']
+    if not rate_limits:
+        config['rate_limits'] = {name: {} for name in transcriber.PROVIDERS}
+    if stage:
+        config.update({
+            'stage_bucket': STAGE_BUCKET, 'stage_endpoint_url': stage,
+            'aws_region': os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+            'aws_access_key_id': os.environ.get('AWS_ACCESS_KEY_ID', 'mock'),
+            'aws_secret_access_key': os.environ.get('AWS_SECRET_ACCESS_KEY', 'mock'),
+        })
+    return config
+
+
+# === LOAD ===
+
+def make_audio(path, minutes):
+    """
+    Write a 16 kHz mono WAV of this length: 4 second bursts of noise with short pauses,
+    so chunking finds places to split.
+    """
+    rate = transcriber.RATE
+    burst = os.urandom(rate * 2 * 4)
+    pause = bytes(rate * 2 // 2)
+    frames = int(minutes * 60 * rate)
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        written = 0
+        for block in itertools.cycle((burst, pause)):
+            block = block[:(frames - written) * 2]
+            if not block:
+                break
+            wf.writeframes(block)
+            written += len(block) // 2
+
+
+def rss_mb():
+    """Return the resident memory of this process in MB (the peak so far where only that is known)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+class Sampler:
+    """Samples RSS and the number of threads in the background and keeps the peaks."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak_rss = 0.0
+        self.peak_threads = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while True:
+            self.peak_rss = max(self.peak_rss, rss_mb())
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values), max(1, math.ceil(pct / 100 * len(values)))) - 1]
+
+
+def run_scenario(audio_path, minutes, concurrency, files, providers, verbose=False):
+    """
+    Transcribe a batch of copies of one recording, concurrency files at a time.
+
+    Returns:
+        dict: Measurements of the run.
+    """
+    latencies = []
+    errors = 0
+
+    def one_file(idx):
+        start = time.monotonic()
+        run_dir = os.path.join('recordings', f'bench_{minutes}m_c{concurrency}_{idx}_{uuid.uuid4().hex[:6]}')
+        os.makedirs(run_dir)
+        transcriber.process_file(audio_path, providers, executor, run_dir=run_dir)
+        elapsed = time.monotonic() - start
+        failed = sum(1 for result in transcriber.load_results(run_dir).values() if result.status != 'ok')
+        return elapsed, failed
+
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+    with output, Sampler() as sampler:
+        start = time.monotonic()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=transcriber.config.get('max_workers')) as executor, \
+                concurrent.futures.ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch') as files_executor:
+            for elapsed, failed in files_executor.map(one_file, range(files)):
+                latencies.append(elapsed)
+                errors += failed
+        wall = time.monotonic() - start
+    return {
+        'minutes': minutes,
+        'concurrency': concurrency,
+        'files': files,
+        'wall_seconds': round(wall, 3),
+        'files_per_second': round(files / wall, 3),
+        'audio_minutes_per_second': round(files * minutes / wall, 3),
+        'p50_seconds': round(percentile(latencies, 50), 3),
+        'p99_seconds': round(percentile(latencies, 99), 3),
+        'peak_rss_mb': round(sampler.peak_rss, 1),
+        'peak_threads': sampler.peak_threads,
+        'provider_errors': errors,
+    }
+
+
+def mock_counters(base):
+    """Fetch and reset the request counters of the mock servers."""
+    response = transcriber.http_request('GET', f'{base}/_stats', retries=0)
+    return response.json()
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    Compare results with a baseline run of the same scenarios.
+
+    Returns:
+        list: Descriptions of the measurements that got worse by more than the tolerance.
+    """
+    regressions = []
+    earlier = {(b['minutes'], b['concurrency']): b for b in baseline}
+    for result in results:
+        before = earlier.get((result['minutes'], result['concurrency']))
+        if not before:
+            continue
+        scenario = f"{result['minutes']} min x {result['concurrency']}"
+        for key, higher_is_worse in (('p50_seconds', True), ('p99_seconds', True), ('peak_rss_mb', True),
+                                     ('audio_minutes_per_second', False)):
+            old, new = before.get(key), result[key]
+            if not old:
+                continue
+            change = (new - old) / old if higher_is_worse else (old - new) / old
+            if change > tolerance:
+                regressions.append(f"{scenario}: {key} {old} -> {new} ({change:+.0%} worse)")
+    return regressions
+
+
+def print_report(results):
+    columns = [('minutes', 'Min'), ('concurrency', 'Conc'), ('files', 'Files'),
+               ('audio_minutes_per_second', 'Audio min/s'), ('files_per_second', 'Files/s'),
+               ('p50_seconds', 'p50 s'), ('p99_seconds', 'p99 s'), ('peak_rss_mb', 'RSS MB'),
+               ('peak_threads', 'Threads'), ('provider_errors', 'Errors')]
+    widths = [max(len(title), *(len(str(r[key])) for r in results)) for key, title in columns]
+    print('  '.join(title.rjust(width) for (_, title), width in zip(columns, widths)))
+    for result in results:
+        print('  '.join(str(result[key]).rjust(width) for (key, _), width in zip(columns, widths)))
+
+
+def parse_setting(values, cast=float):
+    """Turn ['0.2', 'deepgram=2'] into {'': 0.2, 'deepgram': 2.0}."""
+    setting = {}
+    for value in values or ():
+        prefix, _, amount = value.rpartition('=')
+        setting[prefix.lower()] = cast(amount)
+    return setting
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the transcription pipeline against local mock provider servers.")
+    parser.add_argument('--minutes', type=float, nargs='+', default=MINUTES,
+                        help=f"audio lengths to benchmark (default: {' '.join(map(str, MINUTES))})")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=CONCURRENCY,
+                        help=f"files transcribed at the same time (default: {' '.join(map(str, CONCURRENCY))})")
+    parser.add_argument('--files', type=int,
+                        help=f"files per scenario (default: {FILES_PER_WORKER} per concurrent file)")
+    parser.add_argument('--provider', action='append', metavar='NAME',
+                        help="provider to benchmark (repeat for more; default: all mocked providers "
+                             "whose SDK is installed, except Rev AI)")
+    parser.add_argument('--combine', default='rover', choices=transcriber.COMBINE_METHODS,
+                        help="combine method (default: rover)")
+    parser.add_argument('--latency', action='append', metavar='[PREFIX=]SECONDS',
+                        help=f"mock response time, for all or one route prefix such as deepgram "
+                             f"(default: {LATENCY_SECONDS})")
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help="random extra latency as a fraction of the latency")
+    parser.add_argument('--job-seconds', type=float, default=JOB_SECONDS,
+                        help=f"how long mock async jobs take (default: {JOB_SECONDS})")
+    parser.add_argument('--failure-rate', action='append', metavar='[PREFIX=]FRACTION',
+                        help="fraction of requests answered with HTTP 500")
+    parser.add_argument('--throttle', action='append', metavar='[PREFIX=]PER_SECOND',
+                        help="requests per second per provider before HTTP 429 with Retry-After")
+    parser.add_argument('--rate-limits', action='store_true',
+                        help="keep the providers' default client-side rate limits")
+    parser.add_argument('--json', metavar='FILE', help="save the results to this file")
+    parser.add_argument('--baseline', metavar='FILE',
+                        help="results of an earlier run; exit with status 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help=f"allowed slowdown against the baseline (default: {TOLERANCE})")
+    parser.add_argument('--metrics-file', metavar='FILE',
+                        help="write the pipeline's Prometheus metrics to this file")
+    parser.add_argument('--trace-file', metavar='FILE', help="write the pipeline's spans to this file")
+    parser.add_argument('--verbose', action='store_true', help="show the pipeline's output and debug log")
+    parser.add_argument('--stage', metavar='URL',
+                        help=f"stage the audio in bucket {STAGE_BUCKET} of this S3-compatible endpoint")
+    parser.add_argument('--serve', action='store_true', help="only run the mock servers")
+    parser.add_argument('--port', type=int, default=0, help="with --serve: port to listen on")
+    args = parser.parse_args(argv)
+
+    settings = {
+        'latency': parse_setting(args.latency) or {'': LATENCY_SECONDS},
+        'jitter': args.jitter,
+        'job_seconds': args.job_seconds,
+        'failure_rate': parse_setting(args.failure_rate),
+        'throttle': parse_setting(args.throttle),
+    }
+    if args.serve:
+        serve(args.port, settings)
+        return
+
+    names = args.provider or [name for name in MOCK_PROVIDERS
+                              if name != "Rev AI" and (name != "OpenAI Whisper" or importlib.util.find_spec('openai'))]
+    unknown = [name for name in names if name not in MOCK_PROVIDERS]
+    if unknown:
+        parser.error(f"no mock for {', '.join(unknown)}")
+    if args.combine != 'rover' and not importlib.util.find_spec('openai'):
+        parser.error(f"--combine {args.combine} needs the openai package")
+
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir, mock_servers(settings) as base:
+        os.chdir(work_dir)
+        try:
+            transcriber.config.data = mock_config(base, names, args.combine, args.rate_limits, work_dir, args.stage)
+            if args.stage:
+                s3 = transcriber.aws_client('s3', args.stage)
+                if STAGE_BUCKET not in [b['Name'] for b in s3.list_buckets().get('Buckets', [])]:
+                    s3.create_bucket(Bucket=STAGE_BUCKET)
+            for key, path in (('metrics_file', args.metrics_file), ('trace_file', args.trace_file)):
+                if path:
+                    transcriber.config[key] = os.path.join(cwd, path)
+            transcriber.setup_logging('DEBUG' if args.verbose else 'CRITICAL')
+            providers = transcriber.enabled_providers()
+            print(f"[INFO] Mock providers on {base}: {', '.join(name for name, _ in providers)}")
+            for minutes in args.minutes:
+                audio_path = os.path.join(work_dir, f'bench_{minutes}m.wav')
+                make_audio(audio_path, minutes)
+                for concurrency in args.concurrency:
+                    files = args.files or FILES_PER_WORKER * concurrency
+                    print(f"[INFO] {minutes} min audio, {files} files, {concurrency} at a time...")
+                    result = run_scenario(audio_path, minutes, concurrency, files, providers, args.verbose)
+                    result['requests'] = mock_counters(base)
+                    results.append(result)
+                os.remove(audio_path)
+        finally:
+            os.chdir(cwd)
+
+    print()
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n[INFO] Results saved as {args.json}")
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\n[ERROR] Regressions against " + args.baseline + ":\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print(f"\n[INFO] No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import math
+import os
+import struct
+import sys
+import wave
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import transcriber  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def workspace(tmp_path, monkeypatch):
+    """Run every test in an empty directory with an empty config and fresh shared state."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(transcriber.config, '_data', {})
+    monkeypatch.setattr(transcriber, 'metrics', transcriber.Metrics())
+    for name in ('_upload_scheduler', '_provider_stats', '_archive', '_job_engine', '_local_whisper'):
+        monkeypatch.setattr(transcriber, name, None)
+    for name in ('_sessions', '_limiters', '_hash_memo', '_aws_clients', '_tee_sources'):
+        monkeypatch.setattr(transcriber, name, {})
+    return tmp_path
+
+
+def write_wav(path, seconds, rate=8000, speech=lambda second: True, channels=1):
+    """Write a 16-bit WAV of a tone in the seconds where speech(second) is true, else silence."""
+    with wave.open(str(path), 'wb') as out:
+        out.setnchannels(channels)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        frames = bytearray()
+        for i in range(int(seconds * rate)):
+            sample = int(8000 * math.sin(2 * math.pi * 440 * i / rate)) if speech(i // rate) else 0
+            frames += struct.pack('<h', sample) * channels
+        out.writeframes(bytes(frames))
+    return str(path)
@@ -0,0 +1,66 @@
+import os
+
+from conftest import write_wav
+from transcriber import Archive, BatchJournal, Transcript, save_result, transcript_segments
+
+
+def test_segments_end_at_pauses_sentences_and_the_word_limit():
+    words = [('Hallo', 0.0, 0.4), ('daar.', 0.5, 0.9), ('Na', 3.0, 3.2), ('de', 3.3, 3.4), ('pauze', 3.5, 3.9)]
+    result = Transcript.from_words('A', [(word, start, end, None) for word, start, end in words])
+    assert transcript_segments(result) == [(0, 900, 'Hallo daar.'), (3000, 3900, 'Na de pauze')]
+
+    sentence = ' '.join(['woord'] * 11) + '. ' + ' '.join(['nog'] * 70)
+    segments = transcript_segments(Transcript('A', sentence))
+    assert [len(text.split()) for _, _, text in segments] == [11, 30, 30, 10]
+    assert all(start is None and end is None for start, end, _ in segments)
+
+
+def test_search_finds_marks_and_filters(tmp_path):
+    archive = Archive(str(tmp_path / 'archive.db'))
+    run_dir = str(tmp_path / 'run_20240301_200000')
+    archive.add(run_dir, 'A', [(0, 1000, 'de draak vliegt over het dorp'), (1000, 2000, 'de ridder slaapt')])
+    archive.add(run_dir, 'B', [(None, None, 'een draak in de verte')])
+
+    hits = archive.search('draak')
+    assert {hit['provider'] for hit in hits} == {'A', 'B'}
+    assert all(hit['created'] == '2024-03-01T20:00:00' for hit in hits)
+    assert archive.search('draak dorp', provider='A')[0]['start_ms'] == 0
+    assert archive.search('rid*')[0]['text'] == ('de [ridder] slaapt' if archive.fts else 'de ridder slaapt')
+    assert archive.search('draak', provider='C') == []
+
+    # Adding a provider's transcript again replaces it
+    archive.add(run_dir, 'A', [(0, 500, 'alleen dit')])
+    assert [hit['provider'] for hit in archive.search('draak')] == ['B']
+    archive.close()
+
+
+def test_old_runs_are_imported_with_their_recording(tmp_path):
+    audio = write_wav(tmp_path / 'sessie.wav', 1)
+    run_dir = os.path.join('recordings', 'run_20240101_120000')
+    os.makedirs(run_dir)
+    save_result(run_dir, Transcript('Deepgram', 'de goblin valt aan'))
+    with open(os.path.join(run_dir, 'Combined_ROVER.txt'), 'w', encoding='utf-8') as f:
+        f.write('de goblin valt aan')
+    with open(os.path.join(run_dir, 'Vatis_Tech.txt'), 'w', encoding='utf-8') as f:
+        f.write('de koboldt valt aan')
+    os.makedirs(os.path.join('recordings', 'run_20240102_120000'))
+    journal = BatchJournal(os.path.join('recordings', 'batch_journal.jsonl'))
+    journal.file_done(audio, run_dir)
+
+    archive = Archive(os.path.join('recordings', 'archive.db'))
+    assert archive.import_runs() == 2
+    hits = archive.search('goblin')
+    assert sorted(hit['provider'] for hit in hits) == ['Combined', 'Deepgram']
+    assert hits[0]['audio_path'] == os.path.abspath(audio) and hits[0]['audio_hash']
+    assert archive.search('koboldt')[0]['provider'] == 'Vatis Tech'
+    archive.close()
+
+
+def test_journal_files_are_a_copy(tmp_path):
+    journal = BatchJournal(str(tmp_path / 'journal.jsonl'))
+    journal.provider_done('a.wav', 'run_a', 'A', 'A.txt')
+    files = journal.files()
+    files[os.path.abspath('a.wav')]['providers']['B'] = 'B.txt'
+    files.clear()
+    assert journal.state('a.wav')['providers'] == {'A': 'A.txt'}
+    assert list(journal.files()) == [os.path.abspath('a.wav')]
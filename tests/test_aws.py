@@ -0,0 +1,176 @@
+import concurrent.futures
+import json
+import time
+import wave
+
+import pytest
+
+import transcriber
+from transcriber import AudioStage, JobEngine, Transcript, parse_aws_transcript, staged_url, staging, submit_aws
+
+moto = pytest.importorskip('moto')
+BUCKET = 'transcriber-test'
+
+
+@pytest.fixture
+def s3():
+    with moto.mock_aws():
+        transcriber.config.update({
+            'aws_access_key_id': 'testing', 'aws_secret_access_key': 'testing', 'aws_region': 'eu-west-1',
+            'aws_s3_bucket': BUCKET, 'aws_part_mb': 5, 'http_retries': 0,
+        })
+        client = transcriber.aws_client('s3')
+        client.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={'LocationConstraint': 'eu-west-1'})
+        yield client
+
+
+@pytest.fixture
+def audio(tmp_path):
+    # 12 MB of silence: three parts of 5 MB
+    path = str(tmp_path / 'session.wav')
+    with wave.open(path, 'wb') as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(16000)
+        out.writeframes(bytes(12 * 1024 * 1024))
+    return path
+
+
+def keys(s3):
+    return [item['Key'] for item in s3.list_objects_v2(Bucket=BUCKET).get('Contents', [])]
+
+
+def test_upload_is_multipart_and_removed_with_the_result(s3, audio):
+    job = submit_aws(audio)
+    media_key, = keys(s3)
+    assert media_key == f'transcriber/{job.job_id}.wav'
+    # The ETag of a multipart upload ends in the number of parts
+    assert s3.head_object(Bucket=BUCKET, Key=media_key)['ETag'].strip('"').endswith('-3')
+
+    s3.put_object(Bucket=BUCKET, Key=f'transcriber/{job.job_id}.json', Body=json.dumps({'results': {
+        'transcripts': [{'transcript': 'Hallo.'}],
+        'items': [{'type': 'pronunciation', 'start_time': '0.0', 'end_time': '0.4',
+                   'alternatives': [{'content': 'Hallo', 'confidence': '0.9'}]}],
+    }}))
+    for _ in range(10):
+        done, result, _ = job.poll()
+        if done:
+            break
+    assert done and result.ok and result.words == ['Hallo']
+    assert keys(s3) == []
+
+
+def test_a_failed_part_aborts_the_upload(s3, audio):
+    parts = []
+
+    def fail_second_part(params, **kwargs):
+        parts.append(params['PartNumber'])
+        if params['PartNumber'] == 2:
+            raise transcriber.lazy_import('botocore.exceptions').EndpointConnectionError(endpoint_url='s3')
+    s3.meta.events.register('provide-client-params.s3.UploadPart', fail_second_part)
+
+    result = submit_aws(audio)
+
+    assert isinstance(result, Transcript) and result.status == 'error'
+    assert 2 in parts
+    assert s3.list_multipart_uploads(Bucket=BUCKET).get('Uploads', []) == []
+    assert keys(s3) == []
+    assert transcriber.aws_client('transcribe').list_transcription_jobs()['TranscriptionJobSummaries'] == []
+
+
+def test_cancelling_the_job_removes_the_audio(s3, audio):
+    job = submit_aws(audio)
+    assert keys(s3)
+    job.cancel()
+    assert keys(s3) == []
+
+
+def test_an_unreadable_result_still_removes_the_audio(s3, audio):
+    job = submit_aws(audio)
+    for _ in range(10):
+        done, result, _ = job.poll()
+        if done:
+            break
+    assert done and 'could not read' in result.error
+    assert keys(s3) == []
+
+
+def test_a_job_given_up_on_is_deleted_with_its_audio(s3, audio):
+    job = submit_aws(audio)
+    transcribe = transcriber.aws_client('transcribe')
+    job.poll = lambda: (False, None, None)
+    result = JobEngine().wait(job, timeout=0)
+    assert 'timed out' in result.error
+    for _ in range(100):
+        if not keys(s3) and not transcribe.list_transcription_jobs()['TranscriptionJobSummaries']:
+            break
+        time.sleep(0.05)
+    assert keys(s3) == []
+    assert transcribe.list_transcription_jobs()['TranscriptionJobSummaries'] == []
+
+
+def test_unsupported_formats_are_not_uploaded(s3, tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_text('not audio')
+    assert 'unsupported audio format' in submit_aws(str(path)).error
+    assert keys(s3) == []
+
+
+def test_aws_punctuation_sticks_to_the_previous_word():
+    result = parse_aws_transcript({'results': {
+        'transcripts': [{'transcript': 'Goedemorgen, allemaal.'}],
+        'items': [
+            {'type': 'pronunciation', 'start_time': '0.1', 'end_time': '0.8',
+             'alternatives': [{'content': 'Goedemorgen', 'confidence': '0.98'}]},
+            {'type': 'punctuation', 'alternatives': [{'content': ','}]},
+            {'type': 'pronunciation', 'start_time': '0.9', 'end_time': '1.4',
+             'alternatives': [{'content': 'allemaal', 'confidence': '0.91'}]},
+            {'type': 'punctuation', 'alternatives': [{'content': '.'}]},
+        ]}})
+    assert result.text == 'Goedemorgen, allemaal.'
+    assert result.words == ['Goedemorgen,', 'allemaal.']
+    assert list(result.starts) == [0.1, 0.9]
+    assert list(result.confidences) == [0.98, 0.91]
+
+
+def test_staged_audio_is_uploaded_once_and_deleted_on_close(s3, tmp_path):
+    requests = pytest.importorskip('requests')
+    path = str(tmp_path / 'chunk.wav')
+    with open(path, 'wb') as f:
+        f.write(b'RIFF audio')
+    stage = AudioStage(BUCKET, 'stage/', expires=60)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        urls = set(executor.map(stage.url, [path] * 8))
+    url, = urls
+    assert 'X-Amz-Signature' in url
+    key, = keys(s3)
+    assert key.startswith('stage/')
+    assert requests.get(url).content == b'RIFF audio'
+
+    stage.close()
+    assert keys(s3) == []
+
+
+def test_audio_that_cannot_be_staged_is_uploaded_by_the_providers(s3, tmp_path, caplog, monkeypatch):
+    monkeypatch.setattr(transcriber.log, 'propagate', True)
+    path = str(tmp_path / 'chunk.wav')
+    with open(path, 'wb') as f:
+        f.write(b'RIFF audio')
+    stage = AudioStage('missing-bucket')
+    assert stage.url(path) is None
+    assert 'providers upload it themselves' in caplog.text
+    stage.close()
+
+
+def test_staging_is_only_on_for_providers_that_fetch_urls(s3, tmp_path):
+    path = str(tmp_path / 'chunk.wav')
+    with open(path, 'wb') as f:
+        f.write(b'RIFF audio')
+    transcriber.config['stage_bucket'] = BUCKET
+    with staging([('OpenAI Whisper', None), ('Vatis Tech', None)]):
+        assert staged_url(path) is None
+    with staging([('OpenAI Whisper', None), ('Deepgram', None)]):
+        assert staged_url(path).startswith('https://')
+        assert len(keys(s3)) == 1
+    assert keys(s3) == []
+    assert staged_url(path) is None
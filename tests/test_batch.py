@@ -0,0 +1,58 @@
+import os
+
+import transcriber
+from conftest import write_wav
+from transcriber import BatchJournal, Transcript
+
+
+def test_journal_replays_finished_providers_and_files(tmp_path):
+    journal = BatchJournal(str(tmp_path / 'journal.jsonl'))
+    journal.provider_done('a.wav', 'recordings/run_a', 'Deepgram', 'recordings/run_a/Deepgram.txt')
+    journal.provider_done('b.wav', 'recordings/run_b', 'Deepgram', 'recordings/run_b/Deepgram.txt')
+    journal.file_done('a.wav', 'recordings/run_a')
+
+    replayed = BatchJournal(str(tmp_path / 'journal.jsonl'))
+    assert replayed.state('a.wav') == {'run_dir': 'recordings/run_a', 'done': True,
+                                       'providers': {'Deepgram': 'recordings/run_a/Deepgram.txt'}}
+    assert replayed.state(os.path.abspath('b.wav'))['done'] is False
+    assert replayed.state('c.wav') is None
+
+
+def test_journal_skips_a_line_cut_off_by_a_crash(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    BatchJournal(str(path)).file_done('a.wav', 'recordings/run_a')
+    with open(path, 'a') as f:
+        f.write('{"file": "/b.wav", "run_d')
+    assert BatchJournal(str(path)).state('a.wav')['done']
+
+
+def run_batch(tmp_path, monkeypatch, provider):
+    transcriber.config.update({'preprocess': False, 'combine': 'rover', 'cache': False})
+    monkeypatch.setattr(transcriber, 'enabled_providers', lambda: [('A', provider)])
+    (tmp_path / 'in').mkdir(exist_ok=True)
+    write_wav(tmp_path / 'in' / 'one.wav', 1)
+    write_wav(tmp_path / 'in' / 'two.wav', 1)
+    transcriber.main([str(tmp_path / 'in'), '--journal', str(tmp_path / 'journal.jsonl')])
+    return BatchJournal(str(tmp_path / 'journal.jsonl'))
+
+
+def test_batch_resumes_and_reports_files_whose_providers_all_failed(tmp_path, monkeypatch, capsys):
+    calls = []
+
+    def failing(path):
+        calls.append(path)
+        return Transcript.failed('A', 'down')
+    journal = run_batch(tmp_path, monkeypatch, failing)
+    assert journal.state(str(tmp_path / 'in' / 'one.wav')) is None
+    errors = capsys.readouterr().err
+    assert "Not finished" in errors
+    assert "not subscriptable" not in errors
+
+    def working(path):
+        calls.append(path)
+        return Transcript('A', 'hallo')
+    journal = run_batch(tmp_path, monkeypatch, working)
+    assert journal.state(str(tmp_path / 'in' / 'two.wav'))['done']
+    calls.clear()
+    run_batch(tmp_path, monkeypatch, working)
+    assert calls == []
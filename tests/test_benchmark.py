@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+import transcriber
+
+benchmark = pytest.importorskip('benchmark')
+
+
+def result(**values):
+    entry = {'minutes': 1, 'concurrency': 1, 'p50_seconds': 2.0, 'p99_seconds': 3.0, 'peak_rss_mb': 100.0,
+             'audio_minutes_per_second': 1.0}
+    entry.update(values)
+    return entry
+
+
+def test_compare_reports_only_changes_beyond_the_tolerance():
+    baseline = [result(), result(concurrency=4)]
+    assert benchmark.compare([result(p50_seconds=2.3, audio_minutes_per_second=0.9)], baseline) == []
+    regressions = benchmark.compare([result(p99_seconds=4.0), result(concurrency=4, audio_minutes_per_second=0.5),
+                                     result(minutes=10)], baseline)
+    assert len(regressions) == 2
+    assert regressions[0].startswith('1 min x 1: p99_seconds 3.0 -> 4.0')
+    assert 'audio_minutes_per_second' in regressions[1]
+
+
+def test_settings_and_percentiles():
+    assert benchmark.parse_setting(['0.2', 'deepgram=2']) == {'': 0.2, 'deepgram': 2.0}
+    assert benchmark.percentile([], 99) == 0.0
+    assert benchmark.percentile([3.0, 1.0, 2.0, 4.0], 50) == 2.0
+    assert benchmark.percentile([3.0, 1.0, 2.0, 4.0], 99) == 4.0
+    words = benchmark.mock_words(32000 * 4)
+    assert len(words) == int(4 * benchmark.WORDS_PER_SECOND)
+    assert all(start < end <= 4.0 for _, start, end in words)
+
+
+def test_a_small_run_against_the_mocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(transcriber, 'setup_logging', lambda level=None: None)
+    results_file = tmp_path / 'results.json'
+    benchmark.main(['--minutes', '0.1', '--concurrency', '1', '--files', '1', '--latency', '0',
+                    '--job-seconds', '0', '--provider', 'Deepgram', '--provider', 'AssemblyAI',
+                    '--json', str(results_file)])
+    run, = json.loads(results_file.read_text())
+    assert (run['minutes'], run['files'], run['provider_errors']) == (0.1, 1, 0)
+    assert run['requests']['deepgram']['bytes_in'] > 0
+
+    baseline = tmp_path / 'baseline.json'
+    baseline.write_text(json.dumps([dict(run, p50_seconds=run['p50_seconds'] / 10)]))
+    with pytest.raises(SystemExit) as exit_info:
+        benchmark.main(['--minutes', '0.1', '--concurrency', '1', '--files', '1', '--latency', '0.5',
+                        '--provider', 'Deepgram', '--baseline', str(baseline)])
+    assert exit_info.value.code == 1
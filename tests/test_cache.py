@@ -0,0 +1,70 @@
+import concurrent.futures
+import os
+import time
+
+import transcriber
+from conftest import write_wav
+from transcriber import TranscriptCache, audio_hash, process_file, provider_cache_key, transcript_cache
+
+
+def test_audio_hash_follows_the_content(tmp_path):
+    a = write_wav(tmp_path / 'a.wav', 1)
+    b = write_wav(tmp_path / 'b.wav', 1)
+    c = write_wav(tmp_path / 'c.wav', 2)
+    assert audio_hash(a) == audio_hash(b)
+    assert audio_hash(a) != audio_hash(c)
+
+
+def test_keys_depend_on_every_parameter():
+    assert TranscriptCache.key('transcript', 'abc', 'A') == TranscriptCache.key('transcript', 'abc', 'A')
+    assert TranscriptCache.key('transcript', 'abc', 'A') != TranscriptCache.key('transcript', 'abc', 'B')
+    before = provider_cache_key('abc', 'A')
+    transcriber.config['prompt'] = 'D&D sessie'
+    assert provider_cache_key('abc', 'A') != before
+
+
+def test_put_and_get(tmp_path):
+    cache = TranscriptCache(str(tmp_path / 'cache'))
+    key = TranscriptCache.key('x')
+    assert cache.get(key) is None
+    cache.put(key, {'text': 'hallo'})
+    assert cache.get(key) == {'text': 'hallo'}
+
+
+def test_evict_removes_expired_then_least_recently_used(tmp_path):
+    cache = TranscriptCache(str(tmp_path / 'cache'), max_bytes=10 ** 6, max_age=3600)
+    keys = [TranscriptCache.key(k) for k in range(3)]
+    for key, age in zip(keys, (7200, 1800, 600)):
+        cache.put(key, 'x' * 100)
+        os.utime(cache._path(key), (time.time() - age,) * 2)
+    cache.evict()
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[1]) and cache.get(keys[2])
+    # Reading keys[1] made it the most recently used
+    os.utime(cache._path(keys[2]), (time.time() - 1200,) * 2)
+    cache.max_bytes = os.path.getsize(cache._path(keys[1]))
+    cache.evict()
+    assert cache.get(keys[2]) is None
+    assert cache.get(keys[1])
+
+
+def test_disabled_cache():
+    transcriber.config['cache'] = False
+    assert transcript_cache() is None
+
+
+def test_second_run_of_the_same_audio_calls_no_provider(tmp_path):
+    transcriber.config.update({'preprocess': False, 'combine': 'rover'})
+    calls = []
+
+    def provider(path):
+        calls.append(path)
+        return transcriber.Transcript('A', 'een twee drie')
+    path = write_wav(tmp_path / 'a.wav', 2)
+    copy = write_wav(tmp_path / 'copy.wav', 2)
+    cache = transcript_cache()
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        _, first = process_file(path, [('A', provider)], executor, cache)
+        _, second = process_file(copy, [('A', provider)], executor, cache)
+    assert first == second == 'een twee drie'
+    assert len(calls) == 1
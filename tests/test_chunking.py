@@ -0,0 +1,67 @@
+import wave
+
+from conftest import write_wav
+from transcriber import Transcript, split_audio, stitch_results, stitch_transcripts
+
+
+def duration(path):
+    with wave.open(path) as wf:
+        return wf.getnframes() / wf.getframerate()
+
+
+def test_short_file_is_not_split(tmp_path):
+    path = write_wav(tmp_path / 'short.wav', 5)
+    assert split_audio(path, str(tmp_path), chunk_seconds=10) == [(path, 0.0)]
+
+
+def test_split_disabled_with_zero_chunk_seconds(tmp_path):
+    path = write_wav(tmp_path / 'long.wav', 30)
+    assert split_audio(path, str(tmp_path), chunk_seconds=0) == [(path, 0.0)]
+
+
+def test_chunks_overlap_and_cover_the_recording(tmp_path):
+    path = write_wav(tmp_path / 'long.wav', 35)
+    (tmp_path / 'out').mkdir()
+    chunks = split_audio(path, str(tmp_path / 'out'), chunk_seconds=10, overlap_seconds=2)
+    assert len(chunks) >= 3
+    assert chunks[0][1] == 0.0
+    for (path_a, start_a), (_, start_b) in zip(chunks, chunks[1:]):
+        # The next chunk starts overlap_seconds before the end of this one
+        assert abs(start_a + duration(path_a) - 2 - start_b) < 0.01
+    last_path, last_start = chunks[-1]
+    assert abs(last_start + duration(last_path) - 35) < 0.01
+
+
+def test_boundary_is_placed_in_a_pause(tmp_path):
+    # Silence from 7 to 8 seconds, before the nominal 10-second boundary
+    path = write_wav(tmp_path / 'pause.wav', 25, speech=lambda second: second != 7)
+    (tmp_path / 'out').mkdir()
+    chunks = split_audio(path, str(tmp_path / 'out'), chunk_seconds=10, overlap_seconds=1)
+    first_end = duration(chunks[0][0])
+    assert 7 <= first_end <= 8
+
+
+def test_stitch_transcripts_drops_the_repeated_overlap():
+    texts = ["een twee drie vier vijf", "vier vijf zes zeven", "zeven acht"]
+    assert stitch_transcripts(texts) == "een twee drie vier vijf zes zeven acht"
+
+
+def test_stitch_transcripts_without_overlap_joins_and_skips_empty_chunks():
+    assert stitch_transcripts(["een twee", "", "drie vier"]) == "een twee drie vier"
+
+
+def test_stitch_results_moves_words_to_the_recording_timeline():
+    first = Transcript.from_words('A', [('een', 0.5, 0.9, 1.0), ('twee', 9.2, 9.6, 1.0)])
+    second = Transcript.from_words('A', [('twee', 1.2, 1.6, 1.0), ('drie', 3.0, 3.5, 1.0)])
+    result = stitch_results([first, second], [('a.wav', 0.0), ('b.wav', 8.0)], overlap_seconds=2)
+    assert result.words == ['een', 'twee', 'drie']
+    assert list(result.starts) == [0.5, 9.2, 11.0]
+    assert result.ok
+
+
+def test_stitch_results_with_a_failed_chunk_is_partial():
+    good = Transcript('A', 'een twee')
+    result = stitch_results([good, Transcript.failed('A', 'timeout')], [('a.wav', 0.0), ('b.wav', 8.0)])
+    assert result.status == 'partial'
+    assert result.text == 'een twee'
+    assert 'timeout' in result.error
@@ -0,0 +1,125 @@
+import os
+import threading
+
+import transcriber
+from transcriber import Transcript, WindowedCombiner
+
+
+def fake_chat_stream(api_key, messages):
+    """Answers with the first provider's text, in two pieces."""
+    text = messages[1]['content'].split('\n\n')[0].split(':\n', 1)[1]
+    middle = len(text) // 2
+    yield text[:middle]
+    yield text[middle:]
+
+
+def no_chat_stream(api_key, messages):
+    raise AssertionError('ChatGPT should not be asked')
+
+
+def test_windows_are_written_in_order_without_the_overlap(tmp_path, monkeypatch):
+    monkeypatch.setattr(transcriber, 'chat_stream', fake_chat_stream)
+    combiner = WindowedCombiner(['A', 'B'], 2, str(tmp_path), 'key', max_overlap_words=6)
+    # The second window is ready first, but may only be written after the first
+    combiner.add('A', 1, Transcript('A', 'the quick brown fox jumps over the lazy dog'))
+    combiner.add('B', 1, Transcript('B', 'quick brown fox jumped over a lazy dog'))
+    combiner.add('B', 0, Transcript('B', 'one two three the quick brown'))
+    combiner.add('A', 0, Transcript('A', 'one two three the quick brown'))
+
+    combined = combiner.result()
+
+    assert combined == 'one two three the quick brown\n\nfox jumps over the lazy dog'
+    with open(os.path.join(tmp_path, 'Combined_OpenAI.txt'), encoding='utf-8') as f:
+        assert f.read().strip() == combined
+
+
+def test_a_single_transcript_is_used_as_is_and_failures_are_skipped(tmp_path, monkeypatch):
+    monkeypatch.setattr(transcriber, 'chat_stream', no_chat_stream)
+    combiner = WindowedCombiner(['A', 'B'], 1, str(tmp_path), 'key')
+    combiner.add('A', 0, Transcript.failed('A', 'HTTP 500'))
+    combiner.add('B', 0, Transcript('B', 'only this one'))
+
+    assert combiner.result() == 'only this one'
+
+
+def test_a_failed_merge_falls_back_to_the_longest_transcript(tmp_path, monkeypatch):
+    def broken(api_key, messages):
+        raise RuntimeError('rate limited')
+        yield
+    monkeypatch.setattr(transcriber, 'chat_stream', broken)
+    combiner = WindowedCombiner(['A', 'B'], 1, str(tmp_path), 'key')
+    combiner.add('A', 0, Transcript('A', 'short'))
+    combiner.add('B', 0, Transcript('B', 'the longer one'))
+
+    assert combiner.result() == 'the longer one'
+
+
+def test_dropped_providers_are_not_waited_for(tmp_path):
+    combiner = WindowedCombiner(['A', 'B'], 1, str(tmp_path), None, method='rover')
+    combiner.add('A', 0, Transcript('A', 'no race left'))
+    done = threading.Event()
+    threading.Timer(0.05, lambda: (combiner.drop('B'), done.set())).start()
+
+    assert combiner.result() == 'no race left'
+    assert done.is_set()
+    assert os.path.exists(os.path.join(tmp_path, 'Combined_ROVER.txt'))
+
+
+def apply_opcodes(opcodes, a, b):
+    out = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            assert a[i1:i2] == b[j1:j2]
+            out.extend(a[i1:i2])
+        else:
+            out.extend(b[j1:j2])
+    return out
+
+
+def test_align_words_covers_both_sequences():
+    a = [f'woord{i}' for i in range(500)]
+    b = list(a)
+    b[5:7] = ['helemaal', 'niks']
+    del b[40:43]
+    b[300:300] = ['extra', 'woorden']
+
+    opcodes = transcriber.align_words(a, b)
+
+    assert apply_opcodes(opcodes, a, b) == b
+    assert opcodes[0][1] == opcodes[0][3] == 0
+    assert (opcodes[-1][2], opcodes[-1][4]) == (len(a), len(b))
+    assert all(op[2] == nxt[1] and op[4] == nxt[3] for op, nxt in zip(opcodes, opcodes[1:]))
+    assert sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == 'equal') >= len(a) - 10
+
+
+def test_rover_takes_the_majority_word():
+    combined = transcriber.rover_combine([
+        ('A', 'de kat zat op de mat'),
+        ('B', 'de kat zit op de mat'),
+        ('C', 'de kat zat op de mat vandaag'),
+    ])
+    assert combined == 'de kat zat op de mat'
+
+
+def test_rover_weights_and_confidences_change_the_vote():
+    transcripts = [('A', 'de kat zat'), ('B', 'de hond zat')]
+    assert transcriber.rover_combine(transcripts, {'B': 2.0}) == 'de hond zat'
+    assert transcriber.rover_combine([
+        ('A', ['de', 'kat', 'zat'], [1.0, 0.9, 1.0]),
+        ('B', ['de', 'hond', 'zat'], [1.0, 0.2, 1.0]),
+    ]) == 'de kat zat'
+    assert transcriber.rover_combine([('A', ''), ('B', [])]) == ''
+
+
+def words(name, text, confidences):
+    return Transcript.from_words(name, [(word, k, k + 0.5, confidence)
+                                        for k, (word, confidence) in enumerate(zip(text.split(), confidences))])
+
+
+def test_combining_whole_files_votes_with_the_word_confidences(tmp_path):
+    transcriber.config['combine'] = 'rover'
+    results = [words('A', 'de kat zat', [1.0, 0.2, 1.0]), words('B', 'de hond zat', [1.0, 0.9, 1.0])]
+    assert transcriber.combine_transcripts(results, str(tmp_path)) == 'de hond zat'
+    # Without confidences the tie goes to the first provider
+    assert transcriber.combine_transcripts([Transcript('A', 'de kat zat'), Transcript('B', 'de hond zat')],
+                                           str(tmp_path)) == 'de kat zat'
@@ -0,0 +1,97 @@
+import os
+import re
+import threading
+import time
+
+import pytest
+
+import transcriber
+from conftest import write_wav
+from transcriber import BatchJournal, RedisQueue, SQLiteQueue
+
+
+def test_leases_expire_and_jobs_fail_after_their_attempts(tmp_path):
+    queue = SQLiteQueue(str(tmp_path / 'queue.db'), max_attempts=2)
+    queue.put('a', {'kind': 'file', 'path': 'a.wav'})
+    queue.put('b', {'kind': 'file', 'path': 'b.wav'})
+    assert queue.lease('w1', -1) == {'id': 'a', 'attempts': 1, 'kind': 'file', 'path': 'a.wav'}
+    assert not queue.renew('a', 'w2', 60)
+
+    # The lease of w1 ran out, so the next worker gets the job again before b
+    assert queue.lease('w2', 60)['id'] == 'a'
+    assert not queue.renew('a', 'w1', 60) and queue.renew('a', 'w2', 60)
+    queue.fail('a', 'w2', 'boom')
+    assert queue.get(['a'])['a']['status'] == 'failed'
+
+    # Putting a failed job again gives it fresh attempts; a done job stays done
+    queue.put('a', {'kind': 'file', 'path': 'a.wav'})
+    job = queue.lease('w3', 60)
+    assert job['id'] == 'a' and job['attempts'] == 1
+    queue.complete('a', 'w3', {'files': {}})
+    queue.put('a', {'kind': 'file', 'path': 'a.wav'})
+    assert queue.get(['a', 'c']) == {'a': {'status': 'done', 'attempts': 1, 'worker': 'w3', 'error': None,
+                                           'result': {'files': {}}}}
+
+
+def test_redis_leases_are_claimed_once(monkeypatch):
+    fakeredis = pytest.importorskip('fakeredis')
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(transcriber.lazy_import('redis').Redis, 'from_url',
+                        lambda url, decode_responses: fakeredis.FakeRedis(server=server, decode_responses=True))
+    queue = RedisQueue('redis://queue-host/0', max_attempts=2)
+    for k in range(50):
+        queue.put(f'job-{k}', {'kind': 'file', 'path': f'{k}.wav'})
+    leased = []
+
+    def work(name):
+        worker_queue = RedisQueue('redis://queue-host/0', max_attempts=2)
+        while (job := worker_queue.lease(name, 60)) is not None:
+            leased.append((job['id'], job['attempts']))
+    threads = [threading.Thread(target=work, args=(f'w{k}',)) for k in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(leased) == sorted((f'job-{k}', 1) for k in range(50))
+    assert {job['status'] for job in queue.get([job_id for job_id, _ in leased]).values()} == {'leased'}
+
+    queue.put('late', {'kind': 'file', 'path': 'late.wav'})
+    assert queue.lease('w1', -1)['attempts'] == 1
+    assert queue.lease('w2', -1)['attempts'] == 2
+    assert queue.lease('w3', 60) is None
+    assert queue.get(['late'])['late'] == {'status': 'failed', 'attempts': 2, 'worker': 'w2',
+                                           'error': 'lease expired', 'result': None}
+
+
+@pytest.mark.parametrize('shard_seconds', [0, 4])
+def test_workers_do_the_coordinators_jobs(tmp_path, monkeypatch, shard_seconds):
+    transcriber.config.update({'preprocess': False, 'combine': 'rover', 'cache': False, 'queue_poll_seconds': 0.05,
+                               'shard_seconds': shard_seconds, 'chunk_overlap_seconds': 0})
+    monkeypatch.setattr(transcriber, 'enabled_providers',
+                        lambda: [('A', lambda path: 'de kat zat op de mat'), ('B', lambda path: 'de kat zat op de mat')])
+    audio = write_wav(tmp_path / 'session.wav', 10)
+    queue = SQLiteQueue(str(tmp_path / 'queue.db'))
+    journal = BatchJournal(str(tmp_path / 'journal.jsonl'))
+    failed = []
+    coordinator = threading.Thread(target=lambda: failed.extend(transcriber.run_coordinator([audio], queue, journal)))
+    coordinator.start()
+    while not queue._db.execute('SELECT count(*) FROM jobs').fetchone()[0]:
+        time.sleep(0.01)
+    transcriber.run_worker(queue, drain=True)
+    coordinator.join(10)
+
+    assert not coordinator.is_alive() and failed == []
+    state = journal.state(audio)
+    assert state['done']
+    assert os.path.exists(os.path.join(state['run_dir'], 'A.txt'))
+    # Only the coordinator indexes results; the worker leaves the setting alone
+    assert transcriber.config.get('archive', True)
+    assert transcriber.archive().search('kat')[0]['run_dir'] == state['run_dir']
+    rendered = transcriber.metrics.render()
+    assert 'transcriber_worker_jobs_total{kind="%s",status="done"}' % ('chunk' if shard_seconds else 'file') in rendered
+
+
+def test_every_metric_used_is_registered():
+    with open(transcriber.__file__, encoding='utf-8') as f:
+        used = set(re.findall(r"metrics\.(?:inc|set|observe)\('(\w+)'", f.read()))
+    assert used and used <= set(transcriber.METRICS)
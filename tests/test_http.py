@@ -0,0 +1,98 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import transcriber
+from transcriber import http_request, http_session, request_timeout
+
+
+@pytest.fixture
+def server():
+    """A local server that answers with the statuses queued in server.statuses, then 200."""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            httpd.bodies.append(body)
+            time.sleep(httpd.delay)
+            status, headers = httpd.statuses.pop(0) if httpd.statuses else (200, {})
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'ok')
+
+        do_PUT = do_POST
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.statuses, httpd.bodies, httpd.delay = [], [], 0
+    httpd.url = f'http://127.0.0.1:{httpd.server_address[1]}/upload'
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    transcriber.config.update({'http_backoff': 0.01, 'http_retries': 3})
+    yield httpd
+    httpd.shutdown()
+
+
+def test_retries_server_errors_and_rewinds_the_file_body(server, tmp_path):
+    server.statuses = [(503, {}), (429, {'Retry-After': '0'})]
+    path = tmp_path / 'audio.wav'
+    path.write_bytes(b'RIFF' * 1000)
+    with open(path, 'rb') as body:
+        response = http_request('POST', server.url, provider='A', idempotent=True, data=body)
+    assert response.status_code == 200
+    assert server.bodies == [b'RIFF' * 1000] * 3
+    assert transcriber.metrics._values[('transcriber_http_retries_total', (('provider', 'A'), ('reason', '503')))] == 1
+
+
+def test_gives_up_after_the_retries_and_returns_the_last_response(server):
+    server.statuses = [(500, {})] * 3
+    response = http_request('PUT', server.url, provider='A', data=b'x', retries=2)
+    assert response.status_code == 500
+    assert len(server.bodies) == 3
+
+
+def test_posts_are_only_retried_when_they_cannot_have_been_done(server):
+    requests = pytest.importorskip('requests')
+    server.statuses = [(429, {'Retry-After': '0'}), (503, {})]
+    assert http_request('POST', server.url, data=b'x').status_code == 503
+    assert len(server.bodies) == 2
+
+    # The server may have started the job before the response timed out
+    server.delay = 0.5
+    with pytest.raises(requests.ReadTimeout):
+        http_request('POST', server.url, data=b'x', timeout=0.1)
+    assert len(server.bodies) == 3
+
+
+def test_client_errors_are_not_retried(server):
+    server.statuses = [(400, {})]
+    assert http_request('POST', server.url, data=b'x').status_code == 400
+    assert len(server.bodies) == 1
+
+
+def test_connection_errors_are_retried_then_raised():
+    requests = pytest.importorskip('requests')
+    transcriber.config.update({'http_backoff': 0.01})
+    with pytest.raises(requests.ConnectionError):
+        # Nothing listens on port 9 of localhost
+        http_request('POST', 'http://127.0.0.1:9/x', data=b'x', retries=1)
+    assert transcriber.metrics._values[('transcriber_http_requests_total',
+                                        (('provider', '127.0.0.1:9'), ('status', 'error')))] == 2
+
+
+def test_one_session_per_host():
+    assert http_session('https://api.example.org/a') is http_session('https://api.example.org/b')
+    assert http_session('https://api.example.org/a') is not http_session('https://other.example.org/a')
+
+
+def test_timeout_per_provider_name():
+    transcriber.config.update({'timeout': 10, 'timeouts': {'IBM Watson Speech to Text': 600}})
+    assert request_timeout('IBM Watson Speech to Text') == 600
+    assert request_timeout('Deepgram') == 10
@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+import transcriber
+from transcriber import AsyncJob, JobEngine, Transcript, retry_after_seconds
+
+
+class Response:
+    def __init__(self, retry_after=None):
+        self.headers = {'Retry-After': retry_after} if retry_after is not None else {}
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(transcriber, 'POLL_INITIAL_SECONDS', 0.01)
+    monkeypatch.setattr(transcriber, 'POLL_MAX_SECONDS', 0.05)
+    return JobEngine()
+
+
+def counting_poll(polls_needed, result=None):
+    polls = []
+
+    def poll():
+        polls.append(time.monotonic())
+        if len(polls) >= polls_needed:
+            return True, result or Transcript('A', 'klaar'), None
+        return False, None, None
+    return poll, polls
+
+
+def test_polls_until_the_job_is_done(engine):
+    poll, polls = counting_poll(3)
+    result = engine.wait(AsyncJob('A', poll, 'job-1'), timeout=5)
+    assert result.text == 'klaar'
+    assert len(polls) == 3
+
+
+def test_retry_after_sets_the_next_poll(engine):
+    polls = []
+
+    def poll():
+        polls.append(time.monotonic())
+        return (len(polls) == 2), Transcript('A', 'klaar'), 0.3
+    engine.wait(AsyncJob('A', poll), timeout=5)
+    assert polls[1] - polls[0] >= 0.25
+
+
+def test_job_times_out(engine):
+    cancelled = threading.Event()
+    result = engine.wait(AsyncJob('A', lambda: (False, None, None), 'job-2', cancel=cancelled.set), timeout=0.1)
+    assert result.status == 'error'
+    assert 'timed out' in result.error
+    assert cancelled.wait(5)
+
+
+def test_repeated_poll_errors_fail_the_job(engine):
+    def poll():
+        raise ConnectionError('down')
+    cancelled = threading.Event()
+    result = engine.wait(AsyncJob('A', poll, cancel=cancelled.set), timeout=5)
+    assert result.status == 'error'
+    assert 'down' in result.error
+    assert cancelled.wait(5)
+
+
+def test_notify_wakes_a_waiting_job(monkeypatch):
+    monkeypatch.setattr(transcriber, 'POLL_INITIAL_SECONDS', 30)
+    engine = JobEngine()
+    poll, polls = counting_poll(2)
+    job = AsyncJob('A', poll)
+    future = engine.submit(job, timeout=60)
+    while not polls:
+        time.sleep(0.01)
+    started = time.monotonic()
+    engine.notify(job.token)
+    assert future.result(5).text == 'klaar'
+    assert time.monotonic() - started < 5
+
+
+def test_cancelling_stops_polling_and_cancels_the_remote_job(engine):
+    cancelled = threading.Event()
+    future = engine.submit(AsyncJob('A', lambda: (False, None, None), cancel=cancelled.set), timeout=60)
+    time.sleep(0.05)
+    future.cancel()
+    assert cancelled.wait(5)
+
+
+def test_retry_after_header():
+    assert retry_after_seconds(Response('2.5')) == 2.5
+    assert retry_after_seconds(Response()) is None
+    assert retry_after_seconds(Response('soon')) is None
+    assert retry_after_seconds(Response('Wed, 21 Oct 2015 07:28:00 GMT')) == 0.0
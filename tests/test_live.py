@@ -0,0 +1,49 @@
+import glob
+import os
+import re
+import threading
+
+import pytest
+
+import transcriber
+from conftest import write_wav
+
+pytest.importorskip('websocket')
+benchmark = pytest.importorskip('benchmark')
+
+STREAMS = ['Deepgram', 'AssemblyAI', 'Speechmatics']
+
+
+def test_replay_streams_to_every_provider_and_saves_the_finals(tmp_path):
+    audio = write_wav(tmp_path / 'live.wav', 3, rate=transcriber.RATE)
+    with benchmark.mock_servers({}) as base:
+        settings = benchmark.mock_config(base, STREAMS, 'rover', False, str(tmp_path))
+        transcriber.config.update({key: settings[key] for key in (
+            'deepgram_api_key', 'assemblyai_api_key', 'speechmatics_api_key', 'streaming_urls', 'providers')})
+        transcriber.run_live(replay=audio, realtime=False)
+
+    run_dir, = glob.glob(os.path.join('recordings', 'run_*_live'))
+    words = int(3 * benchmark.WORDS_PER_SECOND)
+    for name in STREAMS:
+        with open(os.path.join(run_dir, f'Live_{name}.txt'), encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        assert lines and all(re.fullmatch(r'\[\d\d:\d\d:\d\d\] \S.*', line) for line in lines)
+        assert sum(len(line.split()) - 1 for line in lines) == words
+
+
+def test_rolling_chunks_run_beside_the_streams_on_one_worker(tmp_path, monkeypatch):
+    audio = write_wav(tmp_path / 'live.wav', 3, rate=transcriber.RATE)
+    monkeypatch.setattr(transcriber, 'enabled_providers', lambda: [('Deepgram', None), ('A', lambda path: 'hallo')])
+    with benchmark.mock_servers({}) as base:
+        settings = benchmark.mock_config(base, ['Deepgram'], 'rover', False, str(tmp_path))
+        transcriber.config.update({key: settings[key] for key in ('deepgram_api_key', 'streaming_urls')})
+        transcriber.config.update({'providers': ['Deepgram', 'A'], 'max_workers': 1})
+        live = threading.Thread(target=transcriber.run_live, kwargs={'replay': audio, 'realtime': False}, daemon=True)
+        live.start()
+        live.join(30)
+    assert not live.is_alive()
+
+    run_dir, = glob.glob(os.path.join('recordings', 'run_*_live'))
+    assert os.path.exists(os.path.join(run_dir, 'Live_Deepgram.txt'))
+    with open(os.path.join(run_dir, 'Live_A.txt'), encoding='utf-8') as f:
+        assert 'hallo' in f.read()
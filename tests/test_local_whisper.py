@@ -0,0 +1,85 @@
+import concurrent.futures
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+import transcriber
+from transcriber import transcribe_local_whisper
+
+
+class FakeModel:
+    loads = 0
+
+    def __init__(self, model, **options):
+        FakeModel.loads += 1
+        self.options = options
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def transcribe(self, file_path, **options):
+        self.calls.append(options)
+
+        def segments():
+            # Decoded lazily, like faster-whisper
+            with self._lock:
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+            time.sleep(0.05)
+            with self._lock:
+                self.active -= 1
+            yield types.SimpleNamespace(words=[
+                types.SimpleNamespace(word=' Hallo', start=0.0, end=0.4, probability=0.9),
+                types.SimpleNamespace(word=' daar.', start=0.5, end=0.8, probability=0.7),
+            ])
+            yield types.SimpleNamespace(words=None)
+        return segments(), None
+
+
+class FakePipeline:
+    def __init__(self, model):
+        self.model = model
+
+    def transcribe(self, file_path, batch_size, **options):
+        return self.model.transcribe(file_path, batch_size=batch_size, **options)
+
+
+@pytest.fixture
+def faster_whisper(monkeypatch):
+    FakeModel.loads = 0
+    module = types.SimpleNamespace(WhisperModel=FakeModel, BatchedInferencePipeline=FakePipeline)
+    monkeypatch.setitem(sys.modules, 'faster_whisper', module)
+    transcriber.config.update({'local_whisper_model': 'small', 'prompt': 'D&D'})
+    return module
+
+
+def test_words_come_back_with_timings_and_probabilities(faster_whisper):
+    result = transcribe_local_whisper('chunk.wav')
+    assert result.ok and result.text == 'Hallo daar.'
+    assert list(result.starts) == [0.0, 0.5] and list(result.confidences) == [0.9, 0.7]
+    options = transcriber.local_whisper().model.calls[0]
+    assert options['language'] == transcriber.LANGUAGE and options['initial_prompt'] == 'D&D'
+    assert options['batch_size'] == transcriber.LOCAL_WHISPER_BATCH
+
+
+def test_the_model_is_loaded_once_and_calls_are_bounded_by_the_workers(faster_whisper):
+    transcriber.config.update({'local_whisper_workers': 2, 'local_whisper_threads': 3, 'local_whisper_batch': 1})
+    with concurrent.futures.ThreadPoolExecutor(max_workers=6) as executor:
+        results = list(executor.map(transcribe_local_whisper, ['chunk.wav'] * 6))
+    whisper = transcriber.local_whisper()
+    assert all(result.ok for result in results)
+    assert FakeModel.loads == 1
+    assert whisper.pipeline is None and 'batch_size' not in whisper.model.calls[0]
+    assert whisper.model.options['num_workers'] == 2 and whisper.model.options['cpu_threads'] == 3
+    assert whisper.model.peak == 2
+
+
+def test_without_faster_whisper_the_call_fails(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'faster_whisper', None)
+    transcriber.config['local_whisper_model'] = 'small'
+    result = transcribe_local_whisper('chunk.wav')
+    assert result.status == 'error' and 'pip install faster-whisper' in result.error
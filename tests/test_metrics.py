@@ -0,0 +1,56 @@
+import json
+import urllib.request
+
+import pytest
+
+import transcriber
+from transcriber import Metrics, span
+
+
+def test_render_in_the_prometheus_text_format():
+    metrics = Metrics(buckets=(1, 5))
+    metrics.inc('transcriber_http_requests_total', provider='A', status=200)
+    metrics.inc('transcriber_http_requests_total', 2, provider='A', status=200)
+    metrics.set('transcriber_upload_bytes_per_second', 1.5)
+    metrics.observe('transcriber_http_request_seconds', 0.5, provider='Quote "A"')
+    metrics.observe('transcriber_http_request_seconds', 3, provider='Quote "A"')
+    lines = metrics.render().splitlines()
+    assert '# TYPE transcriber_http_requests_total counter' in lines
+    assert 'transcriber_http_requests_total{provider="A",status="200"} 3' in lines
+    assert 'transcriber_upload_bytes_per_second 1.5' in lines
+    assert '# TYPE transcriber_http_request_seconds histogram' in lines
+    assert 'transcriber_http_request_seconds_bucket{provider="Quote \\"A\\"",le="1"} 1' in lines
+    assert 'transcriber_http_request_seconds_bucket{provider="Quote \\"A\\"",le="5"} 2' in lines
+    assert 'transcriber_http_request_seconds_bucket{provider="Quote \\"A\\"",le="+Inf"} 2' in lines
+    assert 'transcriber_http_request_seconds_sum{provider="Quote \\"A\\""} 3.5' in lines
+    assert 'transcriber_http_request_seconds_count{provider="Quote \\"A\\""} 2' in lines
+
+
+def test_write_and_serve(tmp_path):
+    metrics = Metrics()
+    metrics.inc('transcriber_job_polls_total', provider='A')
+    metrics.write(str(tmp_path / 'out' / 'metrics.prom'))
+    assert 'transcriber_job_polls_total{provider="A"} 1' in (tmp_path / 'out' / 'metrics.prom').read_text()
+
+    metrics.serve(0, host='127.0.0.1')
+    port = metrics._server.server_address[1]
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics') as response:
+            assert 'transcriber_job_polls_total' in response.read().decode()
+    finally:
+        metrics._server.shutdown()
+
+
+def test_spans_nest_and_record_errors(tmp_path):
+    transcriber.config['trace_file'] = str(tmp_path / 'trace.jsonl')
+    with span('file', file='a.wav') as attributes:
+        attributes['chunks'] = 2
+        with pytest.raises(ValueError):
+            with span('provider_call', provider='A'):
+                raise ValueError('bad response')
+    child, parent = [json.loads(line) for line in (tmp_path / 'trace.jsonl').read_text().splitlines()]
+    assert parent['attributes'] == {'file': 'a.wav', 'chunks': 2}
+    assert parent['parent_span_id'] is None and parent['status'] == {'code': 'OK'}
+    assert (child['trace_id'], child['parent_span_id']) == (parent['trace_id'], parent['span_id'])
+    assert child['status'] == {'code': 'ERROR', 'message': 'ValueError: bad response'}
+    assert 'transcriber_span_seconds_count{span="provider_call"} 1' in transcriber.metrics.render()
@@ -0,0 +1,57 @@
+import shutil
+import wave
+
+import pytest
+
+import transcriber
+from conftest import write_wav
+from transcriber import AudioVariants, prepare_audio, provider_codec
+
+
+def wav_format(path):
+    with wave.open(path) as wf:
+        return wf.getframerate(), wf.getnchannels(), wf.getsampwidth(), wf.getnframes() / wf.getframerate()
+
+
+def test_audio_in_the_target_format_is_used_as_is(tmp_path):
+    path = write_wav(tmp_path / 'a.wav', 1, rate=16000)
+    assert prepare_audio(path, str(tmp_path), 16000, 1) == path
+
+
+def test_stereo_is_downmixed_and_resampled(tmp_path):
+    path = write_wav(tmp_path / 'stereo.wav', 2, rate=44100, channels=2)
+    prepared = prepare_audio(path, str(tmp_path), 16000, 1)
+    assert prepared != path
+    rate, channels, width, seconds = wav_format(prepared)
+    assert (rate, channels, width) == (16000, 1, 2)
+    assert abs(seconds - 2) < 0.01
+
+
+def test_unreadable_audio_is_passed_on(tmp_path, monkeypatch):
+    monkeypatch.setattr(shutil, 'which', lambda name: None)
+    path = tmp_path / 'a.mp3'
+    path.write_bytes(b'ID3 not really')
+    assert prepare_audio(str(path), str(tmp_path), 16000, 1) == str(path)
+
+
+def test_codec_from_config_overrides_the_registered_one():
+    transcriber.config['codecs'] = {'Deepgram': 'opus'}
+    assert provider_codec('Deepgram') == 'opus'
+    assert provider_codec('Unknown provider') == 'wav'
+
+
+def test_variants_without_ffmpeg_use_the_original(tmp_path, monkeypatch):
+    monkeypatch.setattr(shutil, 'which', lambda name: None)
+    path = write_wav(tmp_path / 'a.wav', 1)
+    assert AudioVariants(str(tmp_path)).get(path, 'flac') == path
+
+
+@pytest.mark.skipif(not shutil.which('ffmpeg'), reason="needs ffmpeg")
+def test_each_variant_is_encoded_once(tmp_path):
+    path = write_wav(tmp_path / 'a.wav', 1)
+    variants = AudioVariants(str(tmp_path / 'out'))
+    (tmp_path / 'out').mkdir()
+    flac = variants.get(path, 'flac')
+    assert flac.endswith('.flac')
+    assert variants.get(path, 'flac') == flac
+    assert variants.get(path, 'wav') == path
@@ -0,0 +1,63 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import transcriber
+from transcriber import LazyConfig, enabled_providers, register_provider
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(transcriber, 'PROVIDERS', {})
+
+    @register_provider('First', ['first_key'], {'words'}, codec='opus', limits={'concurrency': 2})
+    def first(path):
+        return 'first'
+
+    @register_provider('Second', ['second_key', 'second_url'])
+    def second(path):
+        return 'second'
+
+    @register_provider('Extra', ['first_key'], default=False)
+    def extra(path):
+        return 'extra'
+
+    return transcriber.PROVIDERS
+
+
+def test_register_provider_keeps_the_function_and_its_spec(registry):
+    assert list(registry) == ['First', 'Second', 'Extra']
+    spec = registry['First']
+    assert spec.func('audio.wav') == 'first'
+    assert (spec.codec, spec.limits, spec.capabilities) == ('opus', {'concurrency': 2}, frozenset({'words'}))
+
+
+def test_only_providers_with_all_their_keys_are_enabled(registry):
+    transcriber.config.update({'first_key': 'x', 'second_key': 'y', 'second_url': ''})
+    assert [name for name, _ in enabled_providers()] == ['First']
+    transcriber.config['second_url'] = 'https://example.com'
+    assert [name for name, _ in enabled_providers()] == ['First', 'Second']
+
+
+def test_providers_setting_limits_the_run_and_enables_non_default_ones(registry):
+    transcriber.config.update({'first_key': 'x', 'second_key': 'y', 'second_url': 'z', 'providers': ['Extra', 'Second']})
+    assert [name for name, _ in enabled_providers()] == ['Second', 'Extra']
+    assert [name for name, _ in enabled_providers(['First', 'Unknown'])] == ['First']
+
+
+def test_config_is_read_on_first_use(tmp_path):
+    lazy = LazyConfig(str(tmp_path / 'config.json'))
+    (tmp_path / 'config.json').write_text(json.dumps({'providers': ['First']}))
+    assert lazy.get('providers') == ['First']
+    assert lazy.get('missing', 'default') == 'default'
+
+
+def test_import_loads_no_sdks_and_no_config(tmp_path):
+    code = ("import sys, transcriber; "
+            "print(sorted(m for m in ('requests', 'pyaudio', 'boto3', 'openai') if m in sys.modules))")
+    output = subprocess.run([sys.executable, '-c', code], cwd=tmp_path, capture_output=True, text=True,
+                            env={'PYTHONPATH': os.path.dirname(transcriber.__file__)}, check=True)
+    assert output.stdout.strip() == '[]'
@@ -0,0 +1,87 @@
+import concurrent.futures
+import threading
+import time
+
+import pytest
+
+from conftest import write_wav
+from transcriber import ProviderStats, race_chunks
+
+
+@pytest.fixture
+def chunks(tmp_path):
+    return [(write_wav(tmp_path / 'chunk.wav', 1), 0.0)]
+
+
+@pytest.fixture
+def executor():
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        yield executor
+
+
+@pytest.fixture
+def release():
+    # Lets the slow providers finish once the test is done with them
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def slow(release, text='slow'):
+    def transcribe(path):
+        release.wait(5)
+        return text
+    return transcribe
+
+
+def fast(text='fast'):
+    return lambda path: text
+
+
+def failing(path):
+    raise RuntimeError('HTTP 500')
+
+
+def finished(results, providers):
+    return [(providers[idx][0], [r.text for r in chunk_results]) for idx, chunk_results in results]
+
+
+def test_stops_at_the_quorum(chunks, executor, release):
+    providers = [('Slow', slow(release)), ('Fast', fast()), ('Faster', fast('faster'))]
+    started = time.monotonic()
+    results = finished(race_chunks(executor, providers, chunks, quorum=2), providers)
+    assert sorted(results) == [('Fast', ['fast']), ('Faster', ['faster'])]
+    assert time.monotonic() - started < 2
+
+
+def test_a_backup_replaces_a_failed_provider(chunks, executor):
+    providers = [('Broken', failing), ('Good', fast()), ('Backup', fast('backup'))]
+    results = list(race_chunks(executor, providers, chunks, quorum=2, backups=['Backup']))
+    names = [providers[idx][0] for idx, _ in results]
+    assert set(names) == {'Broken', 'Good', 'Backup'}
+    assert names[-1] == 'Backup'
+    assert not results[names.index('Broken')][1][0].ok
+
+
+def test_a_late_provider_is_hedged(chunks, executor, release):
+    providers = [('Slow', slow(release)), ('Backup', fast('backup'))]
+    results = race_chunks(executor, providers, chunks, quorum=1, backups=['Backup'], hedge_after=0.05)
+    assert finished(results, providers) == [('Backup', ['backup'])]
+
+
+def test_the_deadline_ends_the_race(chunks, executor, release):
+    providers = [('Slow', slow(release)), ('Slower', slow(release))]
+    started = time.monotonic()
+    assert list(race_chunks(executor, providers, chunks, quorum=1, deadline=0.1)) == []
+    assert time.monotonic() - started < 2
+
+
+def test_hedge_delay_comes_from_the_latency_history(tmp_path):
+    stats = ProviderStats(str(tmp_path / 'stats.json'))
+    assert stats.latency('A', 90, 2.0) is None
+    for seconds in (1, 2, 3, 4, 10):
+        stats.record('A', seconds, 1.0)
+    assert stats.latency('A', 50, 2.0) == 6.0
+    assert stats.latency('A', 90, 1.0) == 10.0
+    stats.save()
+    assert ProviderStats(str(tmp_path / 'stats.json')).latency('A', 50, 1.0) == 3.0
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import transcriber
+from transcriber import AsyncJob, ProviderLimiter, Transcript, _call_provider, job_engine, provider_limiter
+
+
+def test_concurrent_calls_are_capped():
+    limiter = ProviderLimiter('A', concurrent=2)
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def call():
+        with limiter.slot():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+
+
+def test_async_jobs_hold_their_slot_until_they_are_done(monkeypatch):
+    monkeypatch.setattr(transcriber, 'POLL_INITIAL_SECONDS', 0.01)
+    transcriber.config['rate_limits'] = {'A': {'concurrent': 1}}
+    done = threading.Event()
+
+    def submit(path):
+        return AsyncJob('A', lambda: (done.is_set(), Transcript('A', 'klaar'), None))
+    job = _call_provider(submit, 'A', 'chunk.wav', None)
+    second = []
+    thread = threading.Thread(target=lambda: second.append(_call_provider(submit, 'A', 'chunk.wav', None)))
+    thread.start()
+    future = job_engine().submit(job)
+    # The first job is still running at the provider, so the second may not be submitted
+    thread.join(0.2)
+    assert thread.is_alive()
+    done.set()
+    assert future.result(5).text == 'klaar'
+    thread.join(5)
+    assert second
+    assert job_engine().wait(second[0], timeout=5).ok
+    for _ in range(100):
+        if provider_limiter('A')._active == 0:
+            break
+        time.sleep(0.01)
+    assert provider_limiter('A')._active == 0
+
+
+def test_requests_per_minute_over_a_sliding_window():
+    limiter = ProviderLimiter('A', requests_per_minute=2)
+    limiter._requests.extend([100.0, 130.0])
+    assert limiter._wait_time(140.0, 0) == 20.0
+    # The first call left the window
+    assert limiter._wait_time(161.0, 0) <= 0
+
+
+def test_audio_minutes_per_hour():
+    limiter = ProviderLimiter('A', audio_minutes_per_hour=60)
+    limiter._audio.append((1000.0, 50.0))
+    assert limiter._wait_time(1100.0, 5) <= 0
+    assert limiter._wait_time(1100.0, 20) == 3500.0
+
+
+def test_throttled_pauses_new_calls():
+    limiter = ProviderLimiter('A', concurrent=10)
+    limiter.throttled(0.2)
+    started = time.monotonic()
+    with limiter.slot():
+        pass
+    assert time.monotonic() - started >= 0.15
+
+
+def test_limits_from_config_override_the_registered_ones():
+    transcriber.config.update({'rate_limits': {'Deepgram': {'requests_per_minute': 30}},
+                               'provider_concurrency': {'Deepgram': 3}})
+    limiter = provider_limiter('Deepgram')
+    assert (limiter.requests_per_minute, limiter.concurrent) == (30, 3)
+    assert provider_limiter('Deepgram') is limiter
+    transcriber.config['rate_limits'] = {'Unlimited': {}}
+    assert provider_limiter('Unlimited') is None
@@ -0,0 +1,40 @@
+import json
+
+from transcriber import Transcript, as_transcript, load_results, save_result
+
+
+def test_to_dict_and_from_dict_round_trip():
+    result = Transcript.from_words('A', [('Hallo', 0.1, 0.5, 0.9), ('wereld.', 0.6, 1.2, 0.8)])
+    result.timings['request'] = 1.23456
+    entry = result.to_dict()
+    assert entry == {'provider': 'A', 'status': 'ok', 'text': 'Hallo wereld.', 'words': ['Hallo', 'wereld.'],
+                     'start': [0.1, 0.6], 'end': [0.5, 1.2], 'confidence': [0.9, 0.8],
+                     'timings': {'request': 1.235}}
+    copy = Transcript.from_dict(json.loads(json.dumps(entry)))
+    assert (copy.text, copy.words, list(copy.ends), copy.timed) == (result.text, result.words, [0.5, 1.2], True)
+
+
+def test_missing_confidences_are_left_out():
+    result = Transcript.from_words('A', [('een', 0.0, 0.5, 0.9), ('twee', 0.5, 1.0, None), ('', 1.0, 1.1, 1.0)])
+    assert result.words == ['een', 'twee']
+    assert len(result.confidences) == 0
+    assert 'confidence' not in result.to_dict()
+
+
+def test_errors_are_kept_apart_from_the_text():
+    failed = Transcript.failed('A', TimeoutError('timed out'))
+    assert not failed.ok
+    assert failed.to_dict() == {'provider': 'A', 'status': 'error', 'text': '', 'error': 'timed out'}
+    assert as_transcript('B', None).status == 'error'
+    assert as_transcript('B', 'plain text').text == 'plain text'
+    assert as_transcript('B', failed) is failed
+
+
+def test_the_last_result_per_provider_is_loaded(tmp_path):
+    save_result(str(tmp_path), Transcript.failed('A', 'HTTP 500'))
+    save_result(str(tmp_path), Transcript('B', 'tekst'))
+    save_result(str(tmp_path), Transcript('A', 'opnieuw'))
+    results = load_results(str(tmp_path))
+    assert {name: (r.status, r.text) for name, r in results.items()} == {'A': ('ok', 'opnieuw'), 'B': ('ok', 'tekst')}
+    assert load_results(str(tmp_path / 'missing')) == {}
+
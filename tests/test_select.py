@@ -0,0 +1,70 @@
+import concurrent.futures
+
+import pytest
+
+import transcriber
+from conftest import write_wav
+from transcriber import ProviderStats, rank_providers, select_chunks, word_agreement
+
+
+@pytest.fixture
+def chunks(tmp_path):
+    return [(write_wav(tmp_path / 'chunk.wav', 6), 0.0)]
+
+
+@pytest.fixture
+def stats(tmp_path):
+    stats = ProviderStats(str(tmp_path / 'stats.json'))
+    for name, agreement, seconds in (('Good', 0.95, 10), ('Fast', 0.9, 2), ('Poor', 0.5, 1)):
+        for _ in range(transcriber.HEDGE_MIN_SAMPLES):
+            stats.record(name, seconds, 1.0)
+            stats.record_outcome(name, True)
+            stats.record_agreement(name, agreement)
+    return stats
+
+
+def run(providers, chunks, stats, **options):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        return [providers[idx][0] for idx, _ in select_chunks(executor, providers, chunks, stats=stats,
+                                                              explore=0, **options)]
+
+
+def test_word_agreement():
+    assert word_agreement('De kat, zat op de mat.', 'de kat zat op de mat') == 1.0
+    assert word_agreement('de kat zat', 'de hond zat') == pytest.approx(2 / 3)
+    assert word_agreement('', '') == 1.0
+    assert word_agreement('iets', '') == 0.0
+
+
+def test_unmeasured_providers_are_ranked_first(stats):
+    providers = [('Poor', None), ('Good', None), ('New', None), ('Fast', None)]
+    assert [providers[idx][0] for idx, _ in rank_providers(providers, stats, 1.0)] == ['New', 'Good', 'Fast', 'Poor']
+    stats.record_outcome('Good', False)
+    assert stats.failure_rate('Good') == pytest.approx(1 / (transcriber.HEDGE_MIN_SAMPLES + 1))
+    assert stats.agreement('New') is None
+
+
+def test_agreeing_transcripts_end_the_run(chunks, stats):
+    providers = [('Good', lambda path: 'de kat zat op de mat'), ('Fast', lambda path: 'de kat zat op de mat'),
+                 ('Poor', lambda path: 'iets heel anders')]
+    assert sorted(run(providers, chunks, stats, start=2)) == ['Fast', 'Good']
+
+
+def test_disagreement_adds_a_provider(chunks, stats):
+    providers = [('Good', lambda path: 'de kat zat op de mat'), ('Fast', lambda path: 'een hond liep over straat'),
+                 ('Poor', lambda path: 'de kat zat op de mat')]
+    assert run(providers, chunks, stats, start=2)[-1] == 'Poor'
+
+
+def test_budgets_skip_slow_and_expensive_providers(chunks, stats):
+    providers = [('Good', lambda path: 'tekst'), ('Fast', lambda path: 'tekst'), ('Poor', lambda path: 'tekst')]
+    # Good takes about a second for this 6 second chunk
+    assert run(providers, chunks, stats, start=1, budget_seconds=0.5) == ['Fast']
+    assert run(providers, chunks, stats, start=1, budget_cost=0.05, costs={'Good': 1.0, 'Fast': 1.0}) == ['Poor']
+
+
+def test_without_providers_nothing_is_started(chunks, stats):
+    assert run([], chunks, stats) == []
+    # When no provider fits the budgets, the best one still runs
+    providers = [('Good', lambda path: 'tekst'), ('Fast', lambda path: 'tekst')]
+    assert run(providers, chunks, stats, start=1, budget_seconds=0.01) == ['Good']
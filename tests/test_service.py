@@ -0,0 +1,114 @@
+import concurrent.futures
+import http.client
+import json
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import transcriber
+from conftest import write_wav
+from transcriber import TranscriptionService
+
+PROVIDERS = [('A', lambda path: 'de kat zat op de mat'), ('B', lambda path: 'de kat zat op de mat')]
+
+
+@pytest.fixture
+def executor():
+    transcriber.config.update({'combine': 'rover', 'cache': False, 'preprocess': False, 'archive': False,
+                               'stats_file': 'provider_stats.json'})
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        yield executor
+
+
+@pytest.fixture
+def service(executor):
+    service = TranscriptionService(PROVIDERS, executor)
+    service.start('127.0.0.1', 0, workers=1)
+    service.url = f'http://127.0.0.1:{service._server.server_address[1]}'
+    yield service
+    service.stop()
+
+
+def call(method, url, body=None, content_type='application/octet-stream'):
+    if isinstance(body, dict):
+        body, content_type = json.dumps(body).encode(), 'application/json'
+    request = urllib.request.Request(url, body, {'Content-Type': content_type}, method=method)
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def wait_for(service, job_id):
+    for _ in range(100):
+        status, job = call('GET', f'{service.url}/jobs/{job_id}')
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'job still {job["status"]}')
+
+
+def test_uploaded_audio_is_transcribed_and_removed(service, tmp_path):
+    with open(write_wav(tmp_path / 'upload.wav', 1), 'rb') as f:
+        status, reply = call('POST', f'{service.url}/jobs?name=meeting.wav', f.read())
+    assert status == 202 and reply['status_url'] == f'/jobs/{reply["id"]}'
+
+    assert wait_for(service, reply['id'])['status'] == 'done'
+    status, result = call('GET', f'{service.url}{reply["result_url"]}')
+    assert status == 200
+    assert result['combined'].strip() == 'de kat zat op de mat'
+    assert set(result['providers']) == {'A', 'B'}
+    assert not list((tmp_path / 'recordings' / 'incoming').iterdir())
+
+
+def test_a_path_is_queued_with_a_subset_of_the_providers(service, tmp_path):
+    path = write_wav(tmp_path / 'local.wav', 1)
+    status, reply = call('POST', f'{service.url}/jobs', {'path': path, 'providers': ['B']})
+    assert status == 202
+    assert wait_for(service, reply['id'])['providers'] == ['B']
+    status, health = call('GET', f'{service.url}/health')
+    assert health['done'] == 1
+
+
+def test_bad_requests_are_refused(service, tmp_path):
+    assert call('POST', f'{service.url}/jobs', {'priority': 1})[0] == 400
+    assert call('POST', f'{service.url}/jobs', b'[1]', 'application/json')[0] == 400
+    assert call('POST', f'{service.url}/jobs', b'"x"', 'application/json')[0] == 400
+    assert call('POST', f'{service.url}/jobs', {'path': str(tmp_path / 'missing.wav')})[0] == 400
+    path = write_wav(tmp_path / 'local.wav', 1)
+    assert call('POST', f'{service.url}/jobs', {'path': path, 'providers': ['C']})[0] == 400
+    assert call('POST', f'{service.url}/jobs?name=notes.txt', b'text')[0] == 400
+    assert call('GET', f'{service.url}/jobs/unknown')[0] == 404
+    assert call('DELETE', f'{service.url}/jobs/unknown')[0] == 404
+
+
+def test_queue_order_position_cancel_and_limit(executor, tmp_path):
+    transcriber.config['service_queue_size'] = 3
+    service = TranscriptionService(PROVIDERS, executor)
+    path = write_wav(tmp_path / 'local.wav', 1)
+    low = service.submit(path)
+    high = service.submit(path, priority=5)
+    later = service.submit(path, priority=5)
+    assert [service.position(job) for job in (high, later, low)] == [0, 1, 2]
+    with pytest.raises(OverflowError):
+        service.submit(path)
+
+    assert service.cancel(high.id)
+    assert not service.cancel(high.id)
+    assert service.position(later) == 0
+    assert service.submit(path).status == 'queued'
+
+
+def test_a_refused_upload_does_not_leak_into_the_next_request(service):
+    connection = http.client.HTTPConnection(*service._server.server_address)
+    body = b'GET /jobs/unknown HTTP/1.1\r\n\r\n' * 100
+    connection.request('POST', '/jobs?name=notes.txt', body, {'Content-Type': 'application/octet-stream'})
+    response = connection.getresponse()
+    assert response.status == 400 and response.getheader('Connection') == 'close'
+    response.read()
+    connection.request('GET', '/health')
+    assert connection.getresponse().status == 200
+    connection.close()
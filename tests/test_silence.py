@@ -0,0 +1,51 @@
+import json
+import wave
+
+import pytest
+
+from conftest import write_wav
+from transcriber import SpeechMap, Transcript, _regions, remove_silence
+
+
+def test_regions_are_padded_and_short_pauses_kept():
+    flags = [False, True, True, False, True, False, False, False, False, True]
+    # Frames of 10 samples, 5 samples of padding, pauses under 25 samples are kept
+    assert _regions(flags, 10, 5, 25, 100) == [(5, 55), (85, 100)]
+    assert _regions([False] * 4, 10, 5, 25, 40) == []
+
+
+def test_times_move_back_to_the_original_timeline(tmp_path):
+    speech_map = SpeechMap([(0.0, 2.0, 3.0), (3.5, 10.0, 2.0)])
+    assert speech_map.speech_seconds == 5.0
+    assert speech_map.to_original(1.0) == 3.0
+    # In the gap between the parts: snaps to the end of the first
+    assert speech_map.to_original(3.2) == 5.0
+    assert speech_map.to_original(4.0) == 10.5
+    assert SpeechMap([]).to_original(7.0) == 7.0
+
+    result = Transcript.from_words('A', [('een', 0.5, 1.0, None), ('twee', 3.6, 4.1, None)])
+    speech_map.restore(result)
+    assert list(result.starts) == [2.5, 10.1] and list(result.ends) == [3.0, 10.6]
+    speech_map.save(str(tmp_path / 'speech_map.json'))
+    assert json.loads((tmp_path / 'speech_map.json').read_text())['segments'][1] == [3.5, 10.0, 2.0]
+
+
+def test_long_pauses_are_cut(tmp_path):
+    pytest.importorskip('numpy')
+    # Speech in seconds 0-1 and 5-6, silence in between and after
+    path = write_wav(tmp_path / 'pauses.wav', 8, speech=lambda second: second in (0, 1, 5, 6))
+    speech_path, speech_map = remove_silence(path, str(tmp_path))
+    assert speech_path != path
+    with wave.open(speech_path) as wf:
+        seconds = wf.getnframes() / wf.getframerate()
+    assert [round(original, 1) for _, original, _ in speech_map.segments] == [0.0, 4.7]
+    assert abs(seconds - speech_map.speech_seconds - 0.3) < 0.01
+    assert 4.5 < seconds < 5.5
+    # A word at the start of the second part is placed back at 5 seconds, within a frame
+    assert abs(speech_map.to_original(speech_map.segments[1][0] + 0.3) - 5.0) <= 0.03
+
+
+def test_audio_with_little_silence_is_kept(tmp_path):
+    pytest.importorskip('numpy')
+    path = write_wav(tmp_path / 'speech.wav', 4, speech=lambda second: second != 2)
+    assert remove_silence(path, str(tmp_path)) == (path, None)
@@ -0,0 +1,158 @@
+import email.parser
+import io
+import os
+import threading
+import time
+import types
+
+import transcriber
+from transcriber import MultipartFile, TeeFile, UploadScheduler, http_request
+
+
+def parse_form(body, content_type):
+    message = email.parser.BytesParser().parsebytes(
+        f'Content-Type: {content_type}\r\n\r\n'.encode() + body)
+    return {part.get_param('name', header='content-disposition'): part for part in message.get_payload()}
+
+
+def test_multipart_body_is_a_valid_form(tmp_path):
+    path = tmp_path / 'opname "1".wav'
+    data = os.urandom(200_000)
+    path.write_bytes(data)
+    with MultipartFile({'model': 'whisper-1', 'language': 'nl'}, 'file', str(path)) as body:
+        raw = body.read()
+        assert len(raw) == len(body)
+        form = parse_form(raw, body.content_type)
+    assert form['model'].get_payload() == 'whisper-1'
+    assert form['language'].get_payload() == 'nl'
+    assert form['file'].get_payload(decode=True) == data
+    assert form['file'].get_filename() == 'opname 1.wav'
+    assert form['file'].get_content_type() == 'audio/x-wav'
+
+
+def test_multipart_body_reads_in_blocks_and_rewinds(tmp_path):
+    path = tmp_path / 'a.wav'
+    path.write_bytes(os.urandom(100_000))
+    with MultipartFile({}, 'file', str(path)) as body:
+        blocks = list(body)
+        assert all(len(block) <= 1 << 16 for block in blocks)
+        whole = b''.join(blocks)
+        body.seek(0)
+        assert body.read(10) + body.read() == whole
+        body.seek(-5, os.SEEK_END)
+        assert body.read() == whole[-5:]
+
+
+class RecordingSession:
+    """Stands in for the pooled requests.Session; reads the body like requests would."""
+
+    def __init__(self):
+        self.requests = []
+
+    def request(self, method, url, data=None, headers=None, **kwargs):
+        body = b''.join(data) if hasattr(data, 'read') else data
+        self.requests.append((headers, body, kwargs))
+        return types.SimpleNamespace(status_code=200, close=lambda: None)
+
+
+def test_files_uploads_are_streamed_through_the_scheduler(tmp_path, monkeypatch):
+    session = RecordingSession()
+    monkeypatch.setattr(transcriber, 'http_session', lambda url: session)
+    path = tmp_path / 'chunk.wav'
+    data = os.urandom(150_000)
+    path.write_bytes(data)
+    with open(path, 'rb') as f:
+        http_request('POST', 'http://example.com/upload', provider='A', data={'model': 'x'},
+                     files={'file': ('chunk.wav', f, 'audio/wav'), 'language': (None, 'nl')})
+
+    (headers, body, kwargs), = session.requests
+    assert 'files' not in kwargs
+    form = parse_form(body, headers['Content-Type'])
+    assert form['model'].get_payload() == 'x' and form['language'].get_payload() == 'nl'
+    assert form['file'].get_payload(decode=True) == data
+    assert form['file'].get_content_type() == 'audio/wav'
+    rendered = transcriber.metrics.render()
+    assert 'transcriber_upload_wait_seconds_count{provider="A"} 1' in rendered
+    assert f'transcriber_upload_bytes_total{{provider="A"}} {len(body)}' in rendered
+
+
+def test_files_without_a_file_are_sent_as_they_are(monkeypatch):
+    session = RecordingSession()
+    monkeypatch.setattr(transcriber, 'http_session', lambda url: session)
+    http_request('POST', 'http://example.com/jobs', files={'config': (None, '{}')})
+    (_, body, kwargs), = session.requests
+    assert kwargs['files'] == {'config': (None, '{}')} and body is None
+
+
+def test_simultaneous_uploads_share_their_disk_reads(tmp_path):
+    path = tmp_path / 'chunk.wav'
+    data = os.urandom(3 * transcriber.UPLOAD_BLOCK_SIZE + 100)
+    path.write_bytes(data)
+    first, second = TeeFile(str(path), 1 << 20), TeeFile(str(path), 1 << 20)
+    assert transcriber._tee_sources[str(path)].users == 2
+    parts = {id(first): [], id(second): []}
+    while True:
+        blocks = [(f, f.read(50_000)) for f in (first, second)]
+        if not any(block for _, block in blocks):
+            break
+        for f, block in blocks:
+            parts[id(f)].append(block)
+    assert b''.join(parts[id(first)]) == b''.join(parts[id(second)]) == data
+    assert first._own is None and second._own is None
+    # A retry goes back to the start and reads on its own
+    second.seek(0)
+    assert second.read(10) == data[:10]
+    first.close()
+    second.close()
+    assert transcriber._tee_sources == {}
+
+
+def test_waiting_uploads_go_by_priority_then_by_speed(tmp_path):
+    stats = transcriber.ProviderStats(str(tmp_path / 'stats.json'))
+    for _ in range(transcriber.HEDGE_MIN_SAMPLES):
+        stats.record('Quick', 1, 1.0)
+        stats.record('Slow', 10, 1.0)
+    scheduler = UploadScheduler(streams=1, priorities={'Urgent': 5}, stats=stats)
+    order = []
+
+    def upload(provider):
+        with scheduler.slot(provider, io.BytesIO(b'audio')):
+            order.append(provider)
+
+    with scheduler.slot('First', io.BytesIO(b'audio')):
+        threads = [threading.Thread(target=upload, args=(name,)) for name in ('Slow', 'Unknown', 'Quick', 'Urgent')]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.05)
+    for thread in threads:
+        thread.join(5)
+    assert order == ['Urgent', 'Quick', 'Slow', 'Unknown']
+
+
+def test_an_interrupted_wait_gives_up_its_place(monkeypatch):
+    scheduler = UploadScheduler(streams=1)
+    check_cancelled = transcriber.check_cancelled
+
+    def interrupt():
+        if threading.current_thread().name == 'interrupted':
+            raise KeyboardInterrupt
+        check_cancelled()
+    monkeypatch.setattr(transcriber, 'check_cancelled', interrupt)
+    errors = []
+
+    def upload():
+        try:
+            with scheduler.slot('A', io.BytesIO(b'audio')):
+                pass
+        except KeyboardInterrupt as e:
+            errors.append(e)
+
+    with scheduler.slot('First', io.BytesIO(b'audio')):
+        waiting = threading.Thread(target=upload, name='interrupted')
+        waiting.start()
+        waiting.join(5)
+    assert errors and scheduler._waiting == []
+    later = threading.Thread(target=upload)
+    later.start()
+    later.join(5)
+    assert not later.is_alive()
@@ -5,6 +5,9 @@ A Python tool to transcribe audio files using multiple cloud STT providers in pa
 
 Usage:
     python transcriber.py <audiofile.wav>
+    python transcriber.py <directory | glob | files...>   (batch mode)
+    python transcriber.py --live [--replay file.wav]        (live mode)
+    python transcriber.py --coordinator <files...> / --worker (distributed mode)
 
 Configuration:
     - See config.json for API keys and prompt customization.
@@ -21,26 +24,141 @@ import sys
 # Suppress all stderr output (ALSA/JACK and other native warnings)
 # sys.stderr = open(os.devnull, 'w')  # DISABLED for debugging
 import contextlib
-import pyaudio
+import contextvars
+import array
+import collections
+import itertools
+import hashlib
+import heapq
+import importlib
+import asyncio
+import bisect
+import difflib
+import math
+import shutil
+import sqlite3
+import subprocess
+import threading
+import time
+import uuid
+import warnings
 import wave
 import tempfile
-import requests
 import json
+import logging
+import mimetypes
+import random
+import re
 from datetime import datetime
-import boto3
+from urllib.parse import urlsplit, parse_qs
 
 # === CONFIG ===
 CHUNK = 1024
-FORMAT = pyaudio.paInt16
 CHANNELS = 1
 RATE = 16000
 RECORD_SECONDS = 30  # Duration per recording chunk (30 seconds)
+LIVE_BUFFER_SECONDS = 60  # Audio kept in the live ring buffer for slow consumers
+CHUNK_SECONDS = 600  # Default length of a transcription chunk for long files (10 minutes)
+CHUNK_OVERLAP_SECONDS = 2  # Audio shared between neighbouring chunks
+SILENCE_SEARCH_SECONDS = 20  # How far before a chunk boundary to look for a pause
+VAD_FRAME_MS = 30  # Voice activity is decided per frame of this length
+VAD_THRESHOLD_DB = 12  # Energy detector: speech is this much louder than the noise floor
+VAD_AGGRESSIVENESS = 2  # WebRTC detector: 0 (keeps most) to 3 (removes most)
+VAD_MIN_SILENCE_SECONDS = 1.0  # Shorter pauses are kept
+VAD_PADDING_SECONDS = 0.3  # Audio kept around every stretch of speech
+VAD_GAP_SECONDS = 0.3  # Silence left between the kept parts
+VAD_MIN_SAVING = 0.05  # Keep the original when removing silence would save less than this fraction
+POLL_INITIAL_SECONDS = 1  # First status check of an async job
+POLL_MAX_SECONDS = 30  # Polling interval never grows beyond this
+POLL_BACKOFF = 1.5  # Growth factor of the polling interval
+JOB_TIMEOUT_SECONDS = 2 * 3600  # Give up on an async job after this long
+HTTP_POOL_SIZE = 16  # Connections kept open per provider host
+HTTP_RETRIES = 4  # Retries for throttled (429), failed (5xx) or dropped requests
+HTTP_BACKOFF_SECONDS = 1  # Base delay of the jittered exponential retry backoff
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')  # Safe to send again after a dropped or 5xx response
+LANGUAGE = 'nl'  # Language all providers are asked to transcribe
+CACHE_DIR = os.path.join('recordings', 'cache')  # Default location of the transcript cache
+CACHE_MAX_MB = 500  # Evict least recently used cache entries beyond this size
+CACHE_MAX_AGE_DAYS = 30  # Evict cache entries not used for this long
+UPLOAD_STREAMS = 0  # Uploads sending at the same time (0: no limit)
+UPLOAD_TEE_MB = 16  # Audio kept in memory so simultaneous uploads of a file read it once
+UPLOAD_BLOCK_SIZE = 1 << 20  # Block size of those shared reads
+UPLOAD_RATE_SECONDS = 5  # Period the live upload throughput is measured over
+S3_PART_MB = 16  # Part size of S3 multipart uploads
+S3_UPLOAD_CONCURRENCY = 8  # S3 parts uploaded at the same time
+STAGE_PREFIX = 'transcriber/stage/'  # Key prefix of audio staged for URL-capable providers
+STAGE_URL_SECONDS = 3600  # Lifetime of the presigned URLs of staged audio
+ARCHIVE_FILE = os.path.join('recordings', 'archive.db')  # Full-text index of all transcripts
+ARCHIVE_SEGMENT_WORDS = 30  # Longest archive segment, in words
+ARCHIVE_SEGMENT_PAUSE = 1.0  # A pause this long (seconds) starts a new archive segment
+ARCHIVE_LIMIT = 50  # Search results shown
+STATS_FILE = os.path.join('recordings', 'provider_stats.json')  # Provider history across runs
+STATS_SAMPLES = 100  # Latencies, outcomes and agreements kept per provider
+HEDGE_PERCENTILE = 90  # Race mode: start a backup when a provider is slower than this percentile
+HEDGE_MIN_SAMPLES = 5  # Latencies needed before the percentile is trusted
+LOCAL_WHISPER_COMPUTE_TYPE = 'int8'  # Local Whisper: CTranslate2 quantization
+LOCAL_WHISPER_BATCH = 8  # Local Whisper: 30-second windows decoded together
+LOCAL_WHISPER_WORKERS = 1  # Local Whisper: chunks decoded at the same time
+SELECT_START = 2  # Selective mode: providers started per file
+SELECT_AGREEMENT = 0.85  # Selective mode: word agreement at which two transcripts are trusted
+SELECT_EXPLORE = 0.05  # Selective mode: chance of also starting a provider that wasn't chosen
+LOG_FORMAT = '[%(levelname)s] %(message)s'
+HISTOGRAM_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)  # Seconds
+
+CODEC_EXTENSIONS = {'wav': '.wav', 'flac': '.flac', 'opus': '.ogg'}
+FFMPEG_CODEC_ARGS = {
+    'wav': ['-c:a', 'pcm_s16le'],
+    'flac': ['-c:a', 'flac'],
+    'opus': ['-c:a', 'libopus', '-b:a', '32k', '-application', 'voip'],
+}
+AUDIO_CONTENT_TYPES = {
+    '.wav': 'audio/wav',
+    '.flac': 'audio/flac',
+    '.ogg': 'audio/ogg;codecs=opus',
+    '.mp3': 'audio/mp3',
+}
+
+
+class LazyConfig(collections.UserDict):
+    """
+    The settings from config.json, read on first use instead of at import time.
+
+    Behaves like a dict; tools that import this module without transcribing anything
+    don't need a config.json.
+    """
+
+    def __init__(self, path='config.json'):
+        self.path = path
+        self._data = None
 
+    @property
+    def data(self):
+        if self._data is None:
+            with open(self.path) as f:
+                self._data = json.load(f)
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
+
+config = LazyConfig()
+log = logging.getLogger('transcriber')
+_import_lock = threading.Lock()
+
+
+def lazy_import(name):
+    """
+    Import a module on first use and return it.
+
+    Provider threads start together, and threads importing a package like requests for
+    the first time at the same moment can get it half initialised; the lock prevents that.
+    """
+    with _import_lock:
+        return importlib.import_module(name)
 
-# Load OpenAI API key from config.json
-with open('config.json') as f:
-    config = json.load(f)
-assemblyai_api_key = config['assemblyai_api_key']
 
 def record_to_file(filename, duration):
     """
@@ -50,10 +168,11 @@ def record_to_file(filename, duration):
         filename (str): Output filename for the WAV file.
         duration (int): Duration of the recording in seconds.
     """
+    import pyaudio
     # Suppress ALSA/JACK and other audio backend warnings
     with open(os.devnull, 'w') as devnull, contextlib.redirect_stderr(devnull):
         audio = pyaudio.PyAudio()
-        stream = audio.open(format=FORMAT, channels=CHANNELS,
+        stream = audio.open(format=pyaudio.paInt16, channels=CHANNELS,
                             rate=RATE, input=True,
                             frames_per_buffer=CHUNK)
 
@@ -69,7 +188,7 @@ def record_to_file(filename, duration):
 
         with wave.open(filename, 'wb') as wf:
             wf.setnchannels(CHANNELS)
-            wf.setsampwidth(audio.get_sample_size(FORMAT))
+            wf.setsampwidth(audio.get_sample_size(pyaudio.paInt16))
             wf.setframerate(RATE)
             wf.writeframes(b''.join(frames))
 
@@ -81,607 +200,6011 @@ def ensure_recordings_dir():
     if not os.path.exists('recordings'):
         os.makedirs('recordings')
 
-def transcribe_assemblyai(file_path):
+
+# === INSTRUMENTATION ===
+
+def setup_logging(level=None):
     """
-    Transcribe audio using AssemblyAI API.
+    Log to stderr as '[LEVEL] message'.
 
     Args:
-        file_path (str): Path to the audio file.
-    Returns:
-        str: The transcribed text or an error message.
+        level (str): DEBUG, INFO, WARNING or ERROR; defaults to 'log_level' (else INFO).
     """
-    headers = {'authorization': assemblyai_api_key}
-    with open(file_path, 'rb') as f:
-        upload_response = requests.post('https://api.assemblyai.com/v2/upload', headers=headers, data=f)
-    if upload_response.status_code != 200:
-        return f"AssemblyAI upload failed: {upload_response.text}"
-    upload_url = upload_response.json().get('upload_url')
-    transcript_request = {'audio_url': upload_url, 'language_code': 'nl'}
-    transcript_response = requests.post('https://api.assemblyai.com/v2/transcript', headers=headers, json=transcript_request)
-    response_json = transcript_response.json()
-    if 'id' not in response_json:
-        return f"AssemblyAI error: {response_json}"
-    transcript_id = response_json['id']
-    while True:
-        poll_response = requests.get(f'https://api.assemblyai.com/v2/transcript/{transcript_id}', headers=headers)
-        status = poll_response.json()['status']
-        if status == 'completed':
-            return poll_response.json()['text']
-        elif status == 'failed':
-            return f"AssemblyAI transcription failed: {poll_response.json().get('error', 'Unknown error')}"
-        import time; time.sleep(3)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    log.handlers[:] = [handler]
+    log.setLevel((level or config.get('log_level') or 'INFO').upper())
+    log.propagate = False
 
-def transcribe_speechmatics(file_path):
+
+METRICS = {
+    'transcriber_http_requests_total': ('counter', "Provider HTTP requests by status code"),
+    'transcriber_http_request_seconds': ('histogram', "Duration of provider HTTP requests"),
+    'transcriber_http_retries_total': ('counter', "Provider HTTP requests that were retried, by reason"),
+    'transcriber_upload_bytes_total': ('counter', "Audio bytes uploaded to providers"),
+    'transcriber_upload_wait_seconds': ('histogram', "Time uploads waited for their turn on the uplink"),
+    'transcriber_upload_bytes_per_second': ('gauge', "Upload throughput over all providers, over the last 5 seconds"),
+    'transcriber_upload_seconds': ('histogram', "Duration of audio uploads (for providers that answer directly, including the transcription)"),
+    'transcriber_job_polls_total': ('counter', "Status checks of async jobs"),
+    'transcriber_provider_selected_total': ('counter', "Providers started in selective mode, by reason"),
+    'transcriber_provider_results_total': ('counter', "Provider results by status"),
+    'transcriber_provider_seconds': ('histogram', "Time per provider call by stage (queue, request, job, total)"),
+    'transcriber_combine_seconds': ('histogram', "Duration of ChatGPT combine calls"),
+    'transcriber_combine_tokens_total': ('counter', "ChatGPT tokens used to combine, by kind"),
+    'transcriber_span_seconds': ('histogram', "Duration of pipeline stages"),
+    'transcriber_vad_seconds_total': ('counter', "Seconds of audio kept as speech or removed as silence"),
+    'transcriber_service_jobs_total': ('counter', "Service jobs by what happened to them"),
+    'transcriber_service_queue_seconds': ('histogram', "Time service jobs waited in the queue"),
+    'transcriber_service_queued': ('gauge', "Service jobs waiting in the queue"),
+    'transcriber_service_running': ('gauge', "Service jobs being transcribed"),
+    'transcriber_worker_jobs_total': ('counter', "Queue jobs done or failed on this worker, by kind"),
+    'transcriber_worker_job_seconds': ('histogram', "Duration of queue jobs done on this worker, by kind"),
+    'transcriber_queue_jobs': ('gauge', "Jobs of this coordinator's run in the queue, by status"),
+}
+
+
+class Metrics:
     """
-    Transcribe audio using Speechmatics API.
+    Counters and histograms of the running process, rendered in the Prometheus text format.
+
+    Metrics are identified by a name from METRICS and keyword labels. The text can be
+    written to 'metrics_file' (for node_exporter's textfile collector) or served on
+    'metrics_port'.
+    """
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._values = {}
+        self._server = None
+
+    def inc(self, name, amount=1, **labels):
+        """Add to a counter (or a gauge)."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        """Set a gauge."""
+        with self._lock:
+            self._values[name, tuple(sorted(labels.items()))] = value
+
+    def observe(self, name, value, **labels):
+        """Add a value to a histogram."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = self._values[key] = [0] * (len(self.buckets) + 2)
+            for k, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[k] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        def labels_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ''
+            escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+            return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+        with self._lock:
+            values = sorted((key, list(value) if isinstance(value, list) else value)
+                            for key, value in self._values.items())
+        lines = []
+        for name, group in itertools.groupby(values, key=lambda item: item[0][0]):
+            kind, help_text = METRICS.get(name, ('untyped', name))
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            for (_, labels), value in group:
+                if kind != 'histogram':
+                    lines.append(f'{name}{labels_text(labels)} {value!r}')
+                    continue
+                for bound, count in zip(self.buckets, value):
+                    lines.append(f'{name}_bucket{labels_text(labels, [("le", f"{bound:g}")])} {count}')
+                lines.append(f'{name}_bucket{labels_text(labels, [("le", "+Inf")])} {value[-1]}')
+                lines.append(f'{name}_sum{labels_text(labels)} {value[-2]!r}')
+                lines.append(f'{name}_count{labels_text(labels)} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Write the metrics to a file, replacing it in one step so readers never see half of it."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def serve(self, port, host='0.0.0.0'):
+        """Serve the metrics on http://host:port/metrics from a background thread."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True).start()
+        log.info(f"Serving metrics on http://{host}:{port}/metrics")
+
+
+metrics = Metrics()
+
+
+def write_metrics():
+    """Write the metrics to 'metrics_file', if one is configured."""
+    path = config.get('metrics_file')
+    if path:
+        try:
+            metrics.write(path)
+        except OSError as e:
+            log.error(f"Could not write metrics to {path}: {e}")
+
+
+_current_span = contextvars.ContextVar('span', default=None)
+_trace_lock = threading.Lock()
+
+
+def new_span(parent=None):
+    """Return the IDs of a new span: in the trace of its parent, or of a new trace."""
+    return {'trace_id': parent['trace_id'] if parent else uuid.uuid4().hex, 'span_id': uuid.uuid4().hex[:16]}
+
+
+def record_span(name, start_ns, end_ns, parent=None, attributes=None, error=None, ids=None):
+    """
+    Add one finished span to 'trace_file' (one JSON object per line, in the layout of
+    OpenTelemetry spans) and its duration to the transcriber_span_seconds metric.
 
     Args:
-        file_path (str): Path to the audio file.
-    Returns:
-        str: The transcribed text or an error message.
+        name (str): Name of the stage.
+        start_ns, end_ns (int): Wall clock start and end in nanoseconds since the epoch.
+        parent (dict): IDs of the enclosing span; a span without one starts a new trace.
+        attributes (dict): Details such as the provider or file.
+        error (str): Set when the stage failed.
+        ids (dict): IDs from new_span(), if children already refer to them.
     """
-    import json as _json
-    api_key = config.get('speechmatics_api_key')
-    if not api_key:
-        return "Speechmatics API key missing."
-    url = "https://asr.api.speechmatics.com/v2/jobs/"
-    headers = {"Authorization": f"Bearer {api_key}"}
-    files = {"data_file": open(file_path, "rb")}
-    data = {
-        "config": _json.dumps({
-            "type": "transcription",
-            "transcription_config": {
-                "language": "nl"
-            }
-        })
+    ids = ids or new_span(parent)
+    record = {
+        'trace_id': ids['trace_id'],
+        'span_id': ids['span_id'],
+        'parent_span_id': parent['span_id'] if parent else None,
+        'name': name,
+        'start_time_unix_nano': start_ns,
+        'end_time_unix_nano': end_ns,
+        'attributes': attributes or {},
+        'status': {'code': 'ERROR', 'message': error} if error else {'code': 'OK'},
     }
-    job_resp = requests.post(url, headers=headers, files=files, data=data)
-    if job_resp.status_code != 201:
-        return f"Speechmatics job error: {job_resp.text}"
-    job_id = job_resp.json().get('id')
-    import time
-    while True:
-        status_resp = requests.get(f"{url}{job_id}/", headers=headers)
-        status = status_resp.json().get('job', {}).get('job_status')
-        if status == 'done':
-            transcript_url = f"{url}{job_id}/transcript?format=txt"
-            transcript_resp = requests.get(transcript_url, headers=headers)
-            return transcript_resp.text.strip()
-        elif status == 'failed':
-            return f"Speechmatics failed: {status_resp.text}"
-        time.sleep(3)
+    metrics.observe('transcriber_span_seconds', (end_ns - start_ns) / 1e9, span=name)
+    path = config.get('trace_file')
+    if path:
+        line = json.dumps(record, default=str) + '\n'
+        with _trace_lock:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line)
 
-def transcribe_openai_whisper(file_path):
+
+@contextlib.contextmanager
+def span(name, **attributes):
     """
-    Transcribe audio using OpenAI Whisper API.
+    Time a pipeline stage as a span, nested in the span that is current in this context.
 
-    Args:
-        file_path (str): Path to the audio file.
-    Returns:
-        str: The transcribed text or an error message.
+    Yields the attributes dict, so details found during the stage can be added. Provider
+    calls run with a copy of the submitting context (see ChunkDispatch), so they nest in
+    the span of their file.
     """
+    parent = _current_span.get()
+    ids = new_span(parent)
+    ids['attributes'] = attributes
+    token = _current_span.set(ids)
+    start = time.time_ns()
+    error = None
     try:
-        import openai
-        api_key = config.get('openai_api_key')
-        if not api_key:
-            return "OpenAI API key missing."
-        prompt = config.get('prompt')
-        try:
-            from openai import OpenAI
-            client = OpenAI(api_key=api_key)
-            with open(file_path, "rb") as audio_file:
-                transcript = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    language="nl",
-                    prompt=prompt if prompt else None
-                )
-            return transcript.text
-        except ImportError:
-            openai.api_key = api_key
-            with open(file_path, "rb") as audio_file:
-                transcript = openai.Audio.transcribe(
-                    model="whisper-1",
-                    file=audio_file,
-                    language="nl",
-                    prompt=prompt if prompt else None
-                )
-            return transcript['text']
-        except Exception as e:
-            return f"OpenAI Whisper error: {e}"
-    except Exception as e:
-        return f"OpenAI Whisper error: {e}"
+        yield attributes
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        record_span(name, start, time.time_ns(), parent, attributes, error, ids)
 
-def transcribe_groq_whisper(file_path):
+
+class Transcript:
     """
-    Transcribe audio using Groq Whisper API.
+    The result of one provider call: the text, its words and how the call went.
+
+    Words are stored column-wise: words is a list of strings, and starts, ends and
+    confidences are array('d') columns of the same length (times in seconds from the
+    start of the audio, confidences from 0 to 1). Providers that return no word timings or
+    confidences leave those columns empty. A failed call has status 'error' and its
+    message in error, never in text.
 
     Args:
-        file_path (str): Path to the audio file.
-    Returns:
-        str: The transcribed text or an error message.
+        provider (str): Provider name.
+        text (str): The transcript.
+        words (list): Optional words (with their punctuation).
+        starts, ends, confidences (iterable): Optional columns, one value per word.
+        status (str): 'ok', 'partial' (some chunks failed) or 'error'.
+        error (str): What went wrong, if the status is not 'ok'.
+        timings (dict): Seconds spent per stage: 'queue' (waiting for a worker), 'request'
+            (the provider call; for synchronous providers this includes the transcription),
+            'job' (waiting for an async job after the upload) and 'total'.
     """
-    api_key = config.get('groq_api_key')
-    endpoint = config.get('groq_whisper_endpoint')
-    if not api_key or not endpoint:
-        return "Groq config missing."
-    headers = {
-        'Authorization': f'Bearer {api_key}'
-    }
-    files = {
-        'file': open(file_path, 'rb')
-    }
-    data = {
-        'model': 'whisper-large-v3',
-        'language': 'nl'
-    }
-    prompt = config.get('prompt')
-    if prompt:
-        data['prompt'] = prompt
-    try:
-        resp = requests.post(endpoint, headers=headers, files=files, data=data)
-        if resp.status_code != 200:
-            return f"Groq Whisper error: {resp.text}"
-        return resp.json().get('text', str(resp.json()))
-    except Exception as e:
-        return f"Groq Whisper error: {e}"
 
-def transcribe_aws(file_path):
+    __slots__ = ('provider', 'text', 'words', 'starts', 'ends', 'confidences', 'status', 'error', 'timings')
+
+    def __init__(self, provider, text='', words=None, starts=None, ends=None, confidences=None,
+                 status='ok', error=None, timings=None):
+        self.provider = provider
+        self.text = text or ''
+        self.words = list(words or ())
+        self.starts = array.array('d', starts or ())
+        self.ends = array.array('d', ends or ())
+        self.confidences = array.array('d', confidences or ())
+        self.status = status
+        self.error = error
+        self.timings = dict(timings or {})
+
+    @classmethod
+    def failed(cls, provider, error):
+        """A result for a call that failed with this error message."""
+        return cls(provider, status='error', error=str(error))
+
+    @classmethod
+    def from_words(cls, provider, items, text=None):
+        """
+        Build a result from (word, start, end, confidence) tuples.
+
+        Confidence may be None for providers that don't return it. The text is the words
+        joined with spaces unless given.
+        """
+        items = [item for item in items if item[0]]
+        words = [item[0] for item in items]
+        confidences = [item[3] for item in items]
+        if any(c is None for c in confidences):
+            confidences = ()
+        return cls(provider, ' '.join(words) if text is None else text, words,
+                   [item[1] for item in items], [item[2] for item in items], confidences)
+
+    @property
+    def ok(self):
+        return self.status == 'ok'
+
+    @property
+    def timed(self):
+        """True if every word has a start and end time."""
+        return bool(self.words) and len(self.starts) == len(self.words) == len(self.ends)
+
+    def to_dict(self):
+        """Return the result as a compact JSON-serializable dict (see from_dict)."""
+        entry = {'provider': self.provider, 'status': self.status, 'text': self.text}
+        if self.error:
+            entry['error'] = self.error
+        if self.words:
+            entry['words'] = self.words
+        if self.timed:
+            entry['start'] = [round(t, 3) for t in self.starts]
+            entry['end'] = [round(t, 3) for t in self.ends]
+        if self.words and len(self.confidences) == len(self.words):
+            entry['confidence'] = [round(c, 3) for c in self.confidences]
+        if self.timings:
+            entry['timings'] = {stage: round(seconds, 3) for stage, seconds in self.timings.items()}
+        return entry
+
+    @classmethod
+    def from_dict(cls, entry):
+        return cls(entry.get('provider'), entry.get('text', ''), entry.get('words'), entry.get('start'),
+                   entry.get('end'), entry.get('confidence'), entry.get('status', 'ok'), entry.get('error'),
+                   entry.get('timings'))
+
+
+def as_transcript(provider, value):
+    """Wrap whatever a provider function returned in a Transcript (a plain string is taken as text)."""
+    if isinstance(value, Transcript):
+        return value
+    if value is None:
+        return Transcript.failed(provider, "no result")
+    return Transcript(provider, str(value))
+
+
+# === HTTP TRANSPORT ===
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def http_session(url):
     """
-    Transcribe audio using AWS Transcribe.
+    Return the pooled requests.Session for the host of a URL, creating it on first use.
+
+    Sessions keep connections alive, so polling and repeated uploads skip the TCP and
+    TLS handshake. The pool size is bounded by 'http_pool_size'.
     """
-    # ... (existing code unchanged)
+    host = urlsplit(url).netloc
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            requests = lazy_import('requests')
+            HTTPAdapter = lazy_import('requests.adapters').HTTPAdapter
+            pool_size = int(config.get('http_pool_size', HTTP_POOL_SIZE))
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[host] = session
+    return session
 
 
-def transcribe_deepgram(file_path):
+def provider_endpoint(name, default):
     """
-    Transcribe audio using Deepgram API.
+    Return the base URL of a provider's API: 'endpoints'[name] if set, else the default.
+
+    Lets a provider be pointed at a proxy or at the mock servers of benchmark.py.
     """
-    api_key = config.get('deepgram_api_key')
-    if not api_key:
-        return "Deepgram API key missing."
-    url = "https://api.deepgram.com/v1/listen"
-    headers = {
-        "Authorization": f"Token {api_key}"
-    }
-    with open(file_path, 'rb') as f:
-        audio = f.read()
-    params = {
-        "language": "nl"
-    }
-    try:
-        resp = requests.post(url, headers=headers, params=params, data=audio)
-        if resp.status_code != 200:
-            return f"Deepgram error: {resp.text}"
-        return resp.json()['results']['channels'][0]['alternatives'][0]['transcript']
-    except Exception as e:
-        return f"Deepgram error: {e}"
+    url = (config.get('endpoints') or {}).get(name) or default
+    return url.rstrip('/') if url else url
 
 
-def transcribe_ibm(file_path):
+def request_timeout(provider=None):
     """
-    Transcribe audio using IBM Watson Speech to Text.
+    Return the request timeout in seconds for a provider.
+
+    Uses 'timeouts'[provider] if set, else the global 'timeout', else None (no timeout).
     """
-    api_key = config.get('ibm_api_key')
-    url = config.get('ibm_url')
-    if not api_key or not url:
-        return "IBM Watson config missing."
-    from requests.auth import HTTPBasicAuth
-    with open(file_path, 'rb') as f:
-        audio = f.read()
-    headers = {
-        'Content-Type': 'audio/wav',
-    }
-    params = {
-        'model': 'nl-NL_BroadbandModel'
-    }
-    try:
-        resp = requests.post(
-            f"{url}/v1/recognize",
-            headers=headers,
-            params=params,
-            data=audio,
-            auth=HTTPBasicAuth('apikey', api_key)
-        )
-        if resp.status_code != 200:
-            return f"IBM Watson error: {resp.text}"
-        results = resp.json().get('results', [])
-        transcript = ' '.join([alt['transcript'] for r in results for alt in r.get('alternatives', [])])
-        return transcript.strip()
-    except Exception as e:
-        return f"IBM Watson error: {e}"
+    timeouts = config.get('timeouts') or {}
+    if provider in timeouts:
+        return timeouts[provider]
+    return config.get('timeout')
 
 
-def transcribe_revai(file_path):
+def _rewind(kwargs):
     """
-    Transcribe audio using Rev AI API.
+    Seek all file bodies of a request back to the start so it can be sent again.
+
+    Returns:
+        bool: False if a body cannot be rewound (e.g. a generator), True otherwise.
     """
-    api_key = config.get('revai_api_key')
-    if not api_key:
-        return "Rev AI API key missing."
-    url = "https://api.rev.ai/speechtotext/v1/jobs"
-    headers = {
-        "Authorization": f"Bearer {api_key}"
-    }
-    # Upload file
-    try:
-        with open(file_path, 'rb') as f:
-            upload_resp = requests.post(url, headers=headers, files={"media": f})
-        if upload_resp.status_code not in [200, 201]:
-            return f"Rev AI upload error: {upload_resp.text}"
-        job_id = upload_resp.json()['id']
-        # Poll for completion
-        import time
-        while True:
-            status_resp = requests.get(f"https://api.rev.ai/speechtotext/v1/jobs/{job_id}", headers=headers)
-            status = status_resp.json()['status']
-            if status == 'transcribed':
-                break
-            elif status == 'failed':
-                return f"Rev AI transcription failed: {status_resp.text}"
-            time.sleep(5)
-        # Get transcript
-        transcript_resp = requests.get(f"https://api.rev.ai/speechtotext/v1/jobs/{job_id}/transcript?accept=application/json", headers=headers)
-        if transcript_resp.status_code != 200:
-            return f"Rev AI transcript error: {transcript_resp.text}"
-        try:
-            data = transcript_resp.json()
-            # Rev AI returns monologues -> elements (type: text/punct)
-            monologues = data.get('monologues', [])
-            transcript = ''
-            for mono in monologues:
-                for el in mono.get('elements', []):
-                    if el.get('type') in ('text', 'punct'):
-                        transcript += el.get('value', '')
-            return transcript.strip()
-        except Exception:
-            return transcript_resp.text.strip()
-    except Exception as e:
-        return f"Rev AI error: {e}"
+    bodies = [kwargs.get('data')]
+    for value in (kwargs.get('files') or {}).values():
+        bodies.append(value[1] if isinstance(value, tuple) else value)
+    for body in bodies:
+        if hasattr(body, 'seek'):
+            body.seek(0)
+        elif body is not None and not isinstance(body, (bytes, str, dict, list, tuple)):
+            return False
+    return True
 
 
-def transcribe_vatis(file_path):
+def _not_sent(e):
+    """True if a request error means the request never reached the server (a failed connect)."""
+    requests = lazy_import('requests')
+    if isinstance(e, requests.ConnectTimeout):
+        return True
+    if not isinstance(e, requests.ConnectionError) or isinstance(e, requests.Timeout):
+        return False
+    # requests wraps urllib3's MaxRetryError, whose reason is the error of the last try
+    reason = getattr(e.args[0], 'reason', e.args[0]) if e.args else None
+    return isinstance(reason, lazy_import('urllib3').exceptions.NewConnectionError)
+
+
+def _stream_files(kwargs):
     """
-    Transcribe audio using Vatis Tech API.
+    Replace a file in the files= of a request by a MultipartFile body in data=, so it is
+    streamed from disk and paced by the upload scheduler instead of built in memory.
+
+    The plain fields of files= and a dict in data= become form fields. Requests with no
+    file, or more than one, in files= are left as they are.
+
+    Returns:
+        MultipartFile: The new body, to be closed after the request, or None.
     """
-    api_key = config.get('vatis_api_key')
-    if not api_key:
-        return "Vatis Tech API key missing."
-    url = "https://vatis.tech/api/v1/speech-to-text/asr"
-    headers = {
-        "x-api-key": api_key
-    }
-    files = {
-        'file': open(file_path, 'rb')
-    }
-    data = {
-        'language': 'nl'
-    }
-    try:
-        resp = requests.post(url, headers=headers, files=files, data=data)
-        if resp.status_code != 200:
-            return f"Vatis Tech error: {resp.text}"
-        return resp.json()['result']['text']
-    except Exception as e:
-        return f"Vatis Tech error: {e}"
+    files = kwargs.get('files')
+    data = kwargs.get('data') or {}
+    if not files or not isinstance(data, dict):
+        return None
+    fields, uploads = dict(data), []
+    for name, value in (files.items() if isinstance(files, dict) else files):
+        parts = value if isinstance(value, tuple) else (None, value)
+        if hasattr(parts[1], 'read'):
+            uploads.append((name, parts))
+        else:
+            fields[name] = parts[1].decode('utf-8') if isinstance(parts[1], bytes) else parts[1]
+    if len(uploads) != 1 or not isinstance(getattr(uploads[0][1][1], 'name', None), str):
+        return None
+    name, parts = uploads[0]
+    body = MultipartFile(fields, name, parts[1].name, parts[2] if len(parts) > 2 else None)
+    del kwargs['files']
+    kwargs['data'] = body
+    kwargs['headers'] = {**(kwargs.get('headers') or {}), 'Content-Type': body.content_type}
+    return body
 
 
-def transcribe(file_path):
-    # Transcription logic for AssemblyAI, with Dutch language and DND prompt
-    headers = {
-        'authorization': assemblyai_api_key,
-    }
-    # Upload audio file
-    with open(file_path, 'rb') as f:
-        upload_response = requests.post('https://api.assemblyai.com/v2/upload',
-                                       headers=headers, data=f)
-    if upload_response.status_code != 200:
-        print(f"Upload failed with status code {upload_response.status_code}")
-        print(f"Response text: {upload_response.text}")
-        sys.exit(1)
+def _body_size(body):
+    """Size in bytes of a request body that is read from a file (0 if unknown)."""
+    if hasattr(body, '__len__'):
+        return len(body)
     try:
-        upload_url = upload_response.json()['upload_url']
-    except Exception as e:
-        print(f"Failed to decode upload response as JSON: {e}")
-        print(f"Raw response: {upload_response.text}")
-        sys.exit(1)
+        return os.fstat(body.fileno()).st_size
+    except (AttributeError, OSError, ValueError):
+        return 0
 
-    # Start transcription
-    transcript_request = {
-        'audio_url': upload_url,
-        'language_code': 'nl'
-    }
-    transcript_response = requests.post('https://api.assemblyai.com/v2/transcript',
-                                        json=transcript_request, headers=headers)
-    response_json = transcript_response.json()
-    if 'id' not in response_json:
-        print("Error: Unexpected response from AssemblyAI when requesting transcription.")
-        print("Status code:", transcript_response.status_code)
-        print("Response JSON:", response_json)
-        sys.exit(1)
-    transcript_id = response_json['id']
 
-    # Poll for completion
-    while True:
-        poll_response = requests.get(f'https://api.assemblyai.com/v2/transcript/{transcript_id}', headers=headers)
-        status = poll_response.json()['status']
-        if status == 'completed':
-            return poll_response.json()['text']
-        elif status == 'failed':
-            raise Exception('Transcription failed: ' + poll_response.json().get('error', 'Unknown error'))
-        import time; time.sleep(3)
+class JobCancelled(Exception):
+    """Raised inside a provider call whose result is no longer needed (see race mode)."""
 
 
+_call_state = threading.local()
 
-import shutil
 
+def check_cancelled():
+    """Raise JobCancelled if the provider call running in this thread has been abandoned."""
+    cancel = getattr(_call_state, 'cancel', None)
+    if cancel is not None and cancel.is_set():
+        raise JobCancelled("job cancelled")
 
 
+def http_request(method, url, provider=None, retries=None, idempotent=None, **kwargs):
+    """
+    Send a request over the pooled session of the URL's host.
 
+    Failures are retried with jittered exponential backoff ('http_retries',
+    'http_backoff'), waiting for Retry-After when the provider sends it. Idempotent
+    requests are retried after connection errors, timeouts and RETRY_STATUSES responses.
+    Other requests (a POST that creates a job or uploads a file) may have been done by the
+    server even when the response was lost or a 5xx, and sending them again would start a
+    second, paid job; they are only retried when the connection could not be made or the
+    provider answered 429. The timeout from 'timeouts'/'timeout' is applied unless one is passed.
+    File bodies, including a file in files= (sent as a MultipartFile), are streamed from
+    disk and wait for their turn in the upload scheduler. Requests, retries and uploaded
+    file bodies are counted in the metrics.
 
-def ensure_recordings_dir():
-    if not os.path.exists('recordings'):
-        os.makedirs('recordings')
+    Args:
+        method (str): HTTP method.
+        url (str): Request URL.
+        provider (str): Provider name, used for the timeout and messages.
+        retries (int): Override the number of retries (0 disables retrying).
+        idempotent (bool): Whether the request may be sent twice; by default true for
+            the IDEMPOTENT_METHODS.
+        **kwargs: Passed on to requests.Session.request.
+    Returns:
+        requests.Response: The last response (which may still be an error status).
+    """
+    requests = lazy_import('requests')
+    if 'timeout' not in kwargs:
+        kwargs['timeout'] = request_timeout(provider)
+    if retries is None:
+        retries = int(config.get('http_retries', HTTP_RETRIES))
+    backoff = float(config.get('http_backoff', HTTP_BACKOFF_SECONDS))
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+    session = http_session(url)
+    label = provider or urlsplit(url).netloc
+    streamed = _stream_files(kwargs)
+    body = kwargs.get('data')
+    upload_size = _body_size(body) if hasattr(body, 'read') else 0
+    with streamed or contextlib.nullcontext():
+        attempt = 0
+        while True:
+            check_cancelled()
+            started = time.monotonic()
+            try:
+                if upload_size:
+                    with upload_scheduler().slot(label, body) as paced:
+                        response = session.request(method, url, **{**kwargs, 'data': paced})
+                else:
+                    response = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.inc('transcriber_http_requests_total', provider=label, status='error')
+                if attempt >= retries or not (idempotent or _not_sent(e)) or not _rewind(kwargs):
+                    raise
+                delay = backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                metrics.inc('transcriber_http_retries_total', provider=label, reason=type(e).__name__)
+                log.debug(f"{label}: {e}, retrying in {delay:.1f}s")
+            else:
+                elapsed = time.monotonic() - started
+                metrics.inc('transcriber_http_requests_total', provider=label, status=str(response.status_code))
+                metrics.observe('transcriber_http_request_seconds', elapsed, provider=label)
+                if upload_size and response.status_code < 400:
+                    metrics.inc('transcriber_upload_bytes_total', upload_size, provider=label)
+                    metrics.observe('transcriber_upload_seconds', elapsed, provider=label)
+                if response.status_code not in RETRY_STATUSES or not (idempotent or response.status_code == 429):
+                    return response
+                delay = retry_after_seconds(response)
+                if delay is None:
+                    delay = backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                if response.status_code == 429 and provider and provider_limiter(provider) is not None:
+                    # Hold back the provider's other calls too
+                    provider_limiter(provider).throttled(delay)
+                if attempt >= retries or not _rewind(kwargs):
+                    return response
+                metrics.inc('transcriber_http_retries_total', provider=label, reason=str(response.status_code))
+                log.debug(f"{label}: HTTP {response.status_code}, retrying in {delay:.1f}s")
+                response.close()
+            attempt += 1
+            cancel = getattr(_call_state, 'cancel', None)
+            if cancel is not None:
+                cancel.wait(delay)
+            else:
+                time.sleep(delay)
 
-def transcribe_assemblyai(file_path):
-    headers = {'authorization': assemblyai_api_key}
-    with open(file_path, 'rb') as f:
-        upload_response = requests.post('https://api.assemblyai.com/v2/upload', headers=headers, data=f)
-    if upload_response.status_code != 200:
-        return f"AssemblyAI upload failed: {upload_response.text}"
-    upload_url = upload_response.json().get('upload_url')
-    transcript_request = {'audio_url': upload_url, 'language_code': 'nl'}
-    # Do NOT send prompt: Universal model does not support it
-    transcript_response = requests.post('https://api.assemblyai.com/v2/transcript', json=transcript_request, headers=headers)
-    response_json = transcript_response.json()
-    if 'id' not in response_json:
-        return f"AssemblyAI error: {response_json}"
-    transcript_id = response_json['id']
-    while True:
-        poll_response = requests.get(f'https://api.assemblyai.com/v2/transcript/{transcript_id}', headers=headers)
-        status = poll_response.json()['status']
-        if status == 'completed':
-            return poll_response.json()['text']
-        elif status == 'failed':
-            return f"AssemblyAI transcription failed: {poll_response.json().get('error', 'Unknown error')}"
-        import time; time.sleep(3)
 
+class MultipartFile:
+    """
+    A multipart/form-data request body that streams one file from disk.
 
-def transcribe_speechmatics(file_path):
-    import json as _json
-    api_key = config.get('speechmatics_api_key')
-    if not api_key:
-        return "Speechmatics API key missing."
-    url = "https://asr.api.speechmatics.com/v2/jobs/"
-    headers = {"Authorization": f"Bearer {api_key}"}
-    files = {"data_file": open(file_path, "rb")}
-    # Speechmatics v2 expects 'config' as a JSON string
-    data = {
-        "config": _json.dumps({
-            "type": "transcription",
-            "transcription_config": {
-                "language": "nl"
-            }
-        })
-    }
-    job_resp = requests.post(url, headers=headers, files=files, data=data)
-    if job_resp.status_code != 201:
-        return f"Speechmatics job error: {job_resp.text}"
-    job_id = job_resp.json().get('id')
-    # Poll for completion
-    import time
-    while True:
-        status_resp = requests.get(f"{url}{job_id}/", headers=headers)
-        status = status_resp.json().get('job', {}).get('job_status')
-        if status == 'done':
-            # Get transcript
-            transcript_url = f"{url}{job_id}/transcript?format=txt"
-            transcript_resp = requests.get(transcript_url, headers=headers)
-            return transcript_resp.text.strip()
-        elif status == 'failed':
-            return f"Speechmatics failed: {status_resp.text}"
-        time.sleep(3)
+    requests builds files= bodies completely in memory; passing a MultipartFile as data=
+    instead sends the form fields and the file in blocks, with a correct Content-Length,
+    so memory use does not grow with the file size (http_request does this for a file in
+    files= too). Use it as a context manager so the file is always closed.
+
+    Args:
+        fields (dict): Plain form fields (values are converted to str).
+        file_field (str): Name of the file field.
+        file_path (str): Path of the file to upload.
+        content_type (str): MIME type of the file, guessed from its name if omitted.
+    """
+
+    def __init__(self, fields, file_field, file_path, content_type=None):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={self.boundary}'
+        parts = []
+        for name, value in fields.items():
+            parts.append(f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n')
+        file_type = content_type or mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+        filename = os.path.basename(file_path).replace('"', '')
+        parts.append(f'--{self.boundary}\r\nContent-Disposition: form-data; name="{file_field}"; '
+                     f'filename="{filename}"\r\nContent-Type: {file_type}\r\n\r\n')
+        self._prefix = ''.join(parts).encode('utf-8')
+        self._suffix = f'\r\n--{self.boundary}--\r\n'.encode('utf-8')
+        self._file = open_audio(file_path)
+        self._file_size = len(self._file) if isinstance(self._file, TeeFile) else os.fstat(self._file.fileno()).st_size
+        self._pos = 0
+
+    def __len__(self):
+        return len(self._prefix) + self._file_size + len(self._suffix)
+
+    def __iter__(self):
+        while True:
+            block = self.read(1 << 16)
+            if not block:
+                return
+            yield block
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += len(self)
+        self._pos = max(0, min(offset, len(self)))
+        return self._pos
+
+    def read(self, size=-1):
+        check_cancelled()
+        if size is None or size < 0:
+            size = len(self) - self._pos
+        out = []
+        file_start = len(self._prefix)
+        file_end = file_start + self._file_size
+        while size > 0 and self._pos < len(self):
+            if self._pos < file_start:
+                block = self._prefix[self._pos:self._pos + size]
+            elif self._pos < file_end:
+                self._file.seek(self._pos - file_start)
+                block = self._file.read(min(size, file_end - self._pos))
+                if not block:
+                    raise IOError(f"{self._file.name} was truncated during upload")
+            else:
+                start = self._pos - file_end
+                block = self._suffix[start:start + size]
+            out.append(block)
+            self._pos += len(block)
+            size -= len(block)
+        return b''.join(out)
+
+
+class _TeeSource:
+    """The blocks of one file, read from disk once and shared by the TeeFiles open on it."""
+
+    def __init__(self, path, window):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.users = 0
+        self._readers = set()
+        self._file = open(path, 'rb')
+        self._blocks = {}
+        self._next = 0  # Next block to read from disk
+        self._max_blocks = max(2, window // UPLOAD_BLOCK_SIZE)
+        self._lock = threading.Lock()
+
+    def attach(self, reader):
+        """Share the reads with reader if the start of the file is still kept."""
+        with self._lock:
+            if self._next == 0 or 0 in self._blocks:
+                self._readers.add(reader)
+
+    def detach(self, reader):
+        with self._lock:
+            self._readers.discard(reader)
+
+    def read(self, reader, pos):
+        """
+        Return the data from pos to the end of its block, reading ahead from disk if needed.
+
+        Returns:
+            bytes: The data (empty at the end of the file), or None if reader has to read
+            the file itself: it fell more than the window behind, or went back to a block
+            that is no longer kept.
+        """
+        if pos >= self.size:
+            return b''
+        index = pos // UPLOAD_BLOCK_SIZE
+        with self._lock:
+            if reader not in self._readers:
+                return None
+            while self._next <= index:
+                self._blocks[self._next] = self._file.read(UPLOAD_BLOCK_SIZE)
+                self._next += 1
+            block = self._blocks.get(index)
+            if block is None:
+                self._readers.discard(reader)
+                return None
+            # Drop what every reader is past; readers too far behind read on their own
+            while self._readers:
+                slowest = min(self._readers, key=lambda r: r.tell())
+                first = slowest.tell() // UPLOAD_BLOCK_SIZE
+                for old in [k for k in self._blocks if k < min(first, index)]:
+                    del self._blocks[old]
+                if len(self._blocks) <= self._max_blocks or slowest is reader:
+                    break
+                self._readers.discard(slowest)
+        return block[pos - index * UPLOAD_BLOCK_SIZE:]
+
+    def close(self):
+        self._file.close()
+        self._blocks.clear()
+
+
+_tee_sources = {}
+_tee_lock = threading.Lock()
+
+
+class TeeFile:
+    """
+    A read-only file for uploads that shares its disk reads with the other TeeFiles open
+    on the same file at the same time.
+
+    When several providers upload the same audio at once, every block is read from disk
+    once and handed to all of them. Only a window of blocks is kept in memory: an upload
+    that falls further behind, starts after the first block was dropped, or goes back to
+    retry, reads the file on its own from then on.
+
+    Args:
+        file_path (str): Path of the file.
+        window (int): Bytes kept in memory for the uploads that are behind.
+    """
+
+    def __init__(self, file_path, window):
+        self.name = file_path
+        self._key = os.path.abspath(file_path)
+        self._pos = 0
+        self._own = None
+        with _tee_lock:
+            source = _tee_sources.get(self._key)
+            if source is None:
+                source = _tee_sources[self._key] = _TeeSource(file_path, window)
+            source.users += 1
+        self._source = source
+        self._size = source.size
+        source.attach(self)
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        while True:
+            block = self.read(1 << 16)
+            if not block:
+                return
+            yield block
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self._size
+        self._pos = max(0, offset)
+        return self._pos
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._size - self._pos
+        out = []
+        while size > 0:
+            if self._own is None:
+                block = self._source.read(self, self._pos)
+                if block is None:
+                    self._own = open(self.name, 'rb')
+                    continue
+                block = block[:size]
+            else:
+                self._own.seek(self._pos)
+                block = self._own.read(size)
+            if not block:
+                break
+            out.append(block)
+            self._pos += len(block)
+            size -= len(block)
+        return b''.join(out)
+
+    def close(self):
+        source, self._source = self._source, None
+        if source is None:
+            return
+        source.detach(self)
+        if self._own is not None:
+            self._own.close()
+        with _tee_lock:
+            source.users -= 1
+            if not source.users:
+                if _tee_sources.get(self._key) is source:
+                    del _tee_sources[self._key]
+                source.close()
+
+
+def open_audio(file_path):
+    """
+    Open audio to upload it. Returns a TeeFile, so uploads of the same file at the same
+    time read it from disk once, unless 'upload_tee_mb' is 0.
+    """
+    window = int(float(config.get('upload_tee_mb', UPLOAD_TEE_MB)) * 1024 * 1024)
+    if window <= 0:
+        return open(file_path, 'rb')
+    return TeeFile(file_path, window)
+
+
+class PacedBody:
+    """
+    A request body sent within an UploadScheduler slot: paced to its share of the
+    bandwidth and counted towards the live throughput. The slot is given up as soon as
+    the body has been read to the end, not when the response arrives.
+    """
+
+    def __init__(self, scheduler, provider, body):
+        self.scheduler = scheduler
+        self.provider = provider
+        self.body = body
+        self.rate = None
+        self.sent = 0
+        self.started = None
+        self.done = False
+        self._due = 0.0
+
+    def __len__(self):
+        return _body_size(self.body)
+
+    def __iter__(self):
+        while True:
+            block = self.read(1 << 16)
+            if not block:
+                return
+            yield block
+
+    def tell(self):
+        return self.body.tell()
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self.body.seek(offset, whence)
+
+    def read(self, size=-1):
+        data = self.body.read(size)
+        if not data:
+            self.scheduler.finish(self)
+            return data
+        now = time.monotonic()
+        if self.started is None:
+            self.started = self._due = now
+        self.sent += len(data)
+        self.scheduler.count(len(data))
+        rate = self.rate
+        if rate:
+            self._due = max(self._due, now) + len(data) / rate
+            delay = self._due - now
+            if delay > 0:
+                cancel = getattr(_call_state, 'cancel', None)
+                if cancel is not None:
+                    cancel.wait(delay)
+                else:
+                    time.sleep(delay)
+                check_cancelled()
+        return data
+
+
+class UploadScheduler:
+    """
+    Decides when the providers' uploads send and how fast, so they don't all slow each
+    other down on a shared uplink.
+
+    At most streams uploads send at the same time (0 is no limit). Waiting uploads go
+    first by their weight in priorities (default 1, higher first), then by how fast the
+    provider usually returns its transcript (the median in ProviderStats), so the first
+    usable transcript arrives as early as possible. With bandwidth set, the uploads that
+    are sending are paced to share it in proportion to their weights. The total upload
+    throughput is measured over the last UPLOAD_RATE_SECONDS.
+
+    Args:
+        streams (int): Uploads sending at the same time (0 is no limit).
+        bandwidth (float): Bytes per second to share, or None to not pace.
+        priorities (dict): Weight per provider name.
+        stats (ProviderStats): Optional provider history for the order.
+    """
+
+    def __init__(self, streams=0, bandwidth=None, priorities=None, stats=None):
+        self.streams = streams
+        self.bandwidth = bandwidth
+        self.priorities = priorities or {}
+        self.stats = stats
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._active = set()
+        self._seq = itertools.count()
+        self._recent = collections.deque()
+        self._recent_bytes = 0
+
+    def weight(self, provider):
+        return float(self.priorities.get(provider, 1.0))
+
+    @contextlib.contextmanager
+    def slot(self, provider, body):
+        """
+        Wait for this upload's turn, then yield body wrapped as a PacedBody.
+
+        Raises:
+            JobCancelled: If the provider call was abandoned while waiting.
+        """
+        paced = PacedBody(self, provider, body)
+        waited = time.monotonic()
+        with self._cond:
+            if self.streams:
+                latency = self.stats.latency(provider, 50, 1.0) if self.stats else None
+                entry = (-self.weight(provider), latency if latency is not None else math.inf,
+                         next(self._seq), paced)
+                heapq.heappush(self._waiting, entry)
+                try:
+                    while len(self._active) >= self.streams or self._waiting[0] is not entry:
+                        self._cond.wait(0.5)
+                        check_cancelled()
+                except BaseException:
+                    # Also on KeyboardInterrupt: a stale head would block every later upload
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                    raise
+                heapq.heappop(self._waiting)
+            self._active.add(paced)
+            self._rebalance()
+        waited = time.monotonic() - waited
+        metrics.observe('transcriber_upload_wait_seconds', waited, provider=provider)
+        if waited >= 1:
+            log.debug(f"{provider}: waited {waited:.1f}s for its upload slot")
+        try:
+            yield paced
+        finally:
+            self.finish(paced)
+
+    def finish(self, paced):
+        """Give up the slot of an upload (called when its body is read to the end)."""
+        with self._cond:
+            if paced.done:
+                return
+            paced.done = True
+            self._active.discard(paced)
+            self._rebalance()
+            self._cond.notify_all()
+        if paced.started is not None and paced.sent:
+            seconds = max(time.monotonic() - paced.started, 1e-6)
+            log.debug(f"{paced.provider}: uploaded {paced.sent / 1e6:.1f} MB at {paced.sent * 8 / seconds / 1e6:.1f} Mbit/s")
+
+    def _rebalance(self):
+        if not self.bandwidth or not self._active:
+            return
+        total = sum(self.weight(paced.provider) for paced in self._active)
+        for paced in self._active:
+            paced.rate = self.bandwidth * self.weight(paced.provider) / total
+
+    def count(self, size):
+        """Add sent bytes to the live throughput."""
+        now = time.monotonic()
+        with self._cond:
+            self._recent.append((now, size))
+            self._recent_bytes += size
+            while self._recent and self._recent[0][0] < now - UPLOAD_RATE_SECONDS:
+                self._recent_bytes -= self._recent.popleft()[1]
+            rate = self._recent_bytes / UPLOAD_RATE_SECONDS
+        metrics.set('transcriber_upload_bytes_per_second', round(rate))
+
+    def throughput(self):
+        """Bytes per second sent over the last UPLOAD_RATE_SECONDS."""
+        now = time.monotonic()
+        with self._cond:
+            return sum(size for at, size in self._recent if at >= now - UPLOAD_RATE_SECONDS) / UPLOAD_RATE_SECONDS
+
+
+_upload_scheduler = None
+_upload_scheduler_lock = threading.Lock()
+
+
+def upload_scheduler():
+    """Return the shared UploadScheduler, set up from 'upload_streams', 'upload_mbps' and 'upload_priorities'."""
+    global _upload_scheduler
+    with _upload_scheduler_lock:
+        if _upload_scheduler is None:
+            mbps = config.get('upload_mbps')
+            _upload_scheduler = UploadScheduler(int(config.get('upload_streams', UPLOAD_STREAMS)),
+                                                float(mbps) * 125000 if mbps else None,
+                                                config.get('upload_priorities'), provider_stats())
+        return _upload_scheduler
+
+
+_openai_clients = {}
+
+
+def openai_client(api_key):
+    """
+    Return a cached OpenAI client (openai>=1.0.0) so its connection pool is reused across calls.
+
+    Raises:
+        ImportError: With the legacy openai package, which has no client class.
+    """
+    lazy_import('openai')
+    from openai import OpenAI
+    with _sessions_lock:
+        client = _openai_clients.get(api_key)
+        if client is None:
+            kwargs = {'max_retries': int(config.get('http_retries', HTTP_RETRIES))}
+            if provider_endpoint('OpenAI', None):
+                kwargs['base_url'] = provider_endpoint('OpenAI', None)
+            if request_timeout('OpenAI') is not None:
+                kwargs['timeout'] = request_timeout('OpenAI')
+            client = OpenAI(api_key=api_key, **kwargs)
+            _openai_clients[api_key] = client
+    return client
+
+
+# === ASYNC JOB ENGINE ===
+
+class AsyncJob:
+    """
+    A transcription job that has been submitted to a provider and must be polled for its result.
+
+    Args:
+        name (str): Provider name, used in messages.
+        poll (callable): Called without arguments from a worker thread. Returns a
+            (done, result, retry_after) tuple: done is True once result holds the final
+            Transcript, retry_after is the number of seconds the provider asked us to
+            wait (or None).
+        job_id (str): The provider's job ID, for messages.
+        token (str): Identifier used in webhook callback URLs.
+        cancel (callable): Optional; called without arguments to cancel the remote job
+            when its result is no longer needed.
+    """
+
+    def __init__(self, name, poll, job_id=None, token=None, cancel=None):
+        self.name = name
+        self.poll = poll
+        self.job_id = job_id
+        self.token = token or uuid.uuid4().hex
+        self.cancel = cancel
+        self.timings = {}
+        self.release = None  # Gives back the provider's concurrency slot (see _call_provider)
+
+    def finish(self):
+        """Give back the job's provider slot once it is over; later calls do nothing."""
+        release, self.release = self.release, None
+        if release is not None:
+            release()
+
+
+def webhook_url(token):
+    """
+    Build the callback URL a provider should notify when the job with this token is done.
+
+    Returns:
+        str: The URL, or None when no 'webhook_url' is configured.
+    """
+    base = config.get('webhook_url')
+    if not base:
+        return None
+    return f"{base.rstrip('/')}/jobs/{token}"
+
+
+def retry_after_seconds(response):
+    """
+    Parse the Retry-After header of a response.
+
+    Returns:
+        float: Seconds to wait, or None if the header is missing or invalid.
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class JobEngine:
+    """
+    Polls all in-flight async jobs from a single asyncio event loop.
+
+    Every job gets its own coroutine that sleeps between status checks with a growing
+    interval (POLL_INITIAL_SECONDS up to POLL_MAX_SECONDS), honours Retry-After and gives
+    up after the job timeout. The blocking status requests run on a small shared pool,
+    so waiting jobs cost no thread. A webhook callback wakes the job up immediately.
+    Cancelling the future returned by submit(), the timeout and repeated polling failures
+    stop the polling and cancel the remote job if the provider supports it.
+    """
+
+    def __init__(self, poll_workers=4):
+        import concurrent.futures
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='job-engine', daemon=True)
+        self._thread.start()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=poll_workers,
+                                                               thread_name_prefix='job-poll')
+        self._wakeups = {}
+        self._early = set()
+        self._server = None
+
+    def submit(self, job, timeout=None):
+        """
+        Start polling a job.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the job's final Transcript.
+        """
+        if timeout is None:
+            timeout = config.get('job_timeout', JOB_TIMEOUT_SECONDS)
+        future = asyncio.run_coroutine_threadsafe(self._run(job, timeout), self._loop)
+        future.add_done_callback(lambda _: job.finish())
+        return future
+
+    def wait(self, job, timeout=None):
+        """Poll a job and block until it is done. Returns the final Transcript."""
+        return self.submit(job, timeout).result()
+
+    def notify(self, token):
+        """Wake up the job with this token (called from the webhook listener)."""
+        self._loop.call_soon_threadsafe(self._wake, token)
+
+    def _wake(self, token):
+        wakeup = self._wakeups.get(token)
+        if wakeup is not None:
+            wakeup.set()
+        else:
+            # The callback beat us to registering the job
+            self._early.add(token)
+
+    async def _run(self, job, timeout):
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        self._wakeups[job.token] = wakeup
+        if job.token in self._early:
+            self._early.discard(job.token)
+            wakeup.set()
+        deadline = loop.time() + timeout
+        interval = POLL_INITIAL_SECONDS
+        failures = 0
+        try:
+            while True:
+                try:
+                    metrics.inc('transcriber_job_polls_total', provider=job.name)
+                    done, result, retry_after = await loop.run_in_executor(self._executor, job.poll)
+                    failures = 0
+                except Exception as e:
+                    failures += 1
+                    log.error(f"Polling {job.name} job {job.job_id} failed: {e}")
+                    if failures >= 5:
+                        # Don't leave a job we gave up on running (and billing) at the provider
+                        self._executor.submit(self.cancel_remote, job)
+                        return Transcript.failed(job.name, f"polling failed: {e}")
+                    done, result, retry_after = False, None, None
+                if done:
+                    return result
+                delay = retry_after if retry_after is not None else interval
+                interval = min(interval * POLL_BACKOFF, POLL_MAX_SECONDS)
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self._executor.submit(self.cancel_remote, job)
+                    return Transcript.failed(job.name, f"timed out after {timeout}s (job {job.job_id})")
+                try:
+                    await asyncio.wait_for(wakeup.wait(), min(delay, remaining))
+                except asyncio.TimeoutError:
+                    pass
+                wakeup.clear()
+        except asyncio.CancelledError:
+            self._executor.submit(self.cancel_remote, job)
+            raise
+        finally:
+            self._wakeups.pop(job.token, None)
+
+    @staticmethod
+    def cancel_remote(job):
+        """Cancel a job at the provider (best effort; the result is dropped either way)."""
+        if job.cancel is None:
+            log.debug(f"Stopped polling {job.name} job {job.job_id}")
+            return
+        try:
+            job.cancel()
+            log.debug(f"Cancelled {job.name} job {job.job_id}")
+        except Exception as e:
+            log.error(f"Cancelling {job.name} job {job.job_id} failed: {e}")
+
+    def start_webhook_listener(self, port, host='0.0.0.0'):
+        """
+        Listen for provider callbacks on POST /jobs/<token>.
+
+        The providers must be able to reach this listener through the configured
+        'webhook_url' (e.g. a port forward or tunnel).
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        engine = self
 
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    self.rfile.read(length)
+                parts = self.path.split('?')[0].strip('/').split('/')
+                if len(parts) == 2 and parts[0] == 'jobs':
+                    engine.notify(parts[1])
+                    self.send_response(200)
+                else:
+                    self.send_response(404)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name='job-webhooks', daemon=True).start()
+        log.info(f"Listening for provider webhooks on port {port}")
+
+
+_job_engine = None
+_job_engine_lock = threading.Lock()
+
+
+def job_engine():
+    """Return the shared JobEngine, starting it (and the webhook listener, if configured) on first use."""
+    global _job_engine
+    with _job_engine_lock:
+        if _job_engine is None:
+            _job_engine = JobEngine()
+            if config.get('webhook_port'):
+                _job_engine.start_webhook_listener(int(config['webhook_port']))
+        return _job_engine
+
+
+def wait_for_job(job):
+    """Resolve the result of a submit_* function: poll it if it is an AsyncJob, else return it as is (a Transcript)."""
+    if isinstance(job, AsyncJob):
+        return job_engine().wait(job)
+    return job
+
+
+# === PROVIDERS ===
+
+class ProviderSpec:
+    """
+    A registered provider: its function and what it needs and can do.
+
+    Args:
+        name (str): Display name; also the key of its per-provider settings ('timeouts',
+            'rate_limits', 'codecs', ...).
+        func (callable): Takes the path of an audio file and returns a Transcript, or an
+            AsyncJob that the job engine polls.
+        config_keys (tuple): Keys that must be set in config.json to use the provider.
+        capabilities (frozenset): What the provider supports: 'async' (returns an
+            AsyncJob), 'webhook', 'prompt', 'words' (word timings), 'confidence',
+            'offline' (runs on this machine), 'url' (can fetch the audio from a staged
+            URL, see AudioStage).
+        codec (str): Upload codec after preprocessing ('wav', 'flac' or 'opus').
+        limits (dict): Default 'rate_limits' entry (see ProviderLimiter).
+        default (bool): False if the provider is only used when named in 'providers'.
+    """
+
+    def __init__(self, name, func, config_keys=(), capabilities=(), codec='flac', limits=None, default=True):
+        self.name = name
+        self.func = func
+        self.config_keys = tuple(config_keys)
+        self.capabilities = frozenset(capabilities)
+        self.codec = codec
+        self.limits = dict(limits or {})
+        self.default = default
+
+    def missing_keys(self):
+        """Return the config keys the provider needs that are not set."""
+        return [key for key in self.config_keys if not not_empty(config.get(key))]
+
+
+PROVIDERS = {}
+
+
+def register_provider(name, config_keys=(), capabilities=(), codec='flac', limits=None, default=True):
+    """
+    Decorator that adds a provider function to PROVIDERS (see ProviderSpec for the arguments).
+
+    Providers are offered in the order they are registered. SDKs a provider needs are
+    imported inside its function, so they only load when the provider is used.
+    """
+    def register(func):
+        PROVIDERS[name] = ProviderSpec(name, func, config_keys, capabilities, codec, limits, default)
+        return func
+    return register
+
+
+@register_provider("AssemblyAI", ['assemblyai_api_key'], {'async', 'webhook', 'words', 'confidence', 'url'})
+def submit_assemblyai(file_path):
+    """
+    Upload audio to AssemblyAI (or pass its staged URL) and start a transcription job.
+
+    Args:
+        file_path (str): Path to the audio file.
+    Returns:
+        AsyncJob: The running job, or a failed Transcript.
+    """
+    headers = {'authorization': config.get('assemblyai_api_key')}
+    base = provider_endpoint("AssemblyAI", 'https://api.assemblyai.com')
+    upload_url = staged_url(file_path)
+    if not upload_url:
+        with open_audio(file_path) as f:
+            upload_response = http_request('POST', f'{base}/v2/upload', provider="AssemblyAI", headers=headers, data=f)
+        if upload_response.status_code != 200:
+            return Transcript.failed("AssemblyAI", f"upload failed: {upload_response.text}")
+        upload_url = upload_response.json().get('upload_url')
+    token = uuid.uuid4().hex
+    transcript_request = {'audio_url': upload_url, 'language_code': 'nl'}
+    # Do NOT send prompt: Universal model does not support it
+    if webhook_url(token):
+        transcript_request['webhook_url'] = webhook_url(token)
+    transcript_response = http_request('POST', f'{base}/v2/transcript', provider="AssemblyAI", json=transcript_request, headers=headers)
+    response_json = transcript_response.json()
+    if 'id' not in response_json:
+        return Transcript.failed("AssemblyAI", response_json)
+    transcript_id = response_json['id']
+
+    def poll():
+        poll_response = http_request('GET', f'{base}/v2/transcript/{transcript_id}', provider="AssemblyAI", retries=0, headers=headers)
+        if poll_response.status_code != 200:
+            return False, None, retry_after_seconds(poll_response)
+        status = poll_response.json()['status']
+        if status == 'completed':
+            result = poll_response.json()
+            # AssemblyAI times are in milliseconds
+            return True, Transcript.from_words("AssemblyAI", [
+                (w['text'], w['start'] / 1000.0, w['end'] / 1000.0, w.get('confidence'))
+                for w in result.get('words') or []
+            ], result['text']), None
+        elif status in ('failed', 'error'):
+            return True, Transcript.failed("AssemblyAI", f"transcription failed: {poll_response.json().get('error', 'Unknown error')}"), None
+        return False, None, retry_after_seconds(poll_response)
+
+    def cancel():
+        http_request('DELETE', f'{base}/v2/transcript/{transcript_id}', provider="AssemblyAI", retries=0, headers=headers)
+
+    return AsyncJob("AssemblyAI", poll, transcript_id, token, cancel)
+
+
+def transcribe_assemblyai(file_path):
+    """
+    Transcribe audio using AssemblyAI API.
+    """
+    return wait_for_job(submit_assemblyai(file_path))
+
+
+@register_provider("OpenAI Whisper", ['openai_api_key'], {'prompt', 'words'})
 def transcribe_openai_whisper(file_path):
+    """
+    Transcribe audio using OpenAI Whisper API.
+
+    Args:
+        file_path (str): Path to the audio file.
+    Returns:
+        Transcript: The transcription, with word timings.
+    """
     try:
-        import openai
+        openai = lazy_import('openai')
         api_key = config.get('openai_api_key')
         if not api_key:
-            return "OpenAI API key missing."
+            return Transcript.failed("OpenAI Whisper", "API key missing")
         prompt = config.get('prompt')
         try:
             # Try new openai>=1.0.0 interface
-            from openai import OpenAI
-            client = OpenAI(api_key=api_key)
-            with open(file_path, "rb") as audio_file:
+            client = openai_client(api_key)
+            with open_audio(file_path) as audio_file:
+                # As a (name, file) tuple, the SDK accepts a TeeFile like a real file
                 transcript = client.audio.transcriptions.create(
                     model="whisper-1",
-                    file=audio_file,
+                    file=(os.path.basename(file_path), audio_file),
                     language="nl",
-                    prompt=prompt if prompt else None
+                    prompt=prompt if prompt else None,
+                    response_format="verbose_json",
+                    timestamp_granularities=["word"]
                 )
-            return transcript.text
+            return Transcript.from_words("OpenAI Whisper", [
+                (w.word, w.start, w.end, None) for w in getattr(transcript, 'words', None) or []
+            ], transcript.text)
         except ImportError:
             # Fallback to legacy
             openai.api_key = api_key
-            with open(file_path, "rb") as audio_file:
+            with open_audio(file_path) as audio_file:
                 transcript = openai.Audio.transcribe(
                     model="whisper-1",
                     file=audio_file,
                     language="nl",
                     prompt=prompt if prompt else None
                 )
-            return transcript['text']
+            return Transcript("OpenAI Whisper", transcript['text'])
         except Exception as e:
-            return f"OpenAI Whisper error: {e}"
+            return Transcript.failed("OpenAI Whisper", e)
     except Exception as e:
-        return f"OpenAI Whisper error: {e}"
+        return Transcript.failed("OpenAI Whisper", e)
+
 
+# Free tier quota; a 'rate_limits' entry in config.json replaces it
+@register_provider("Groq Whisper Large-v3 Turbo", ['groq_api_key', 'groq_whisper_endpoint'], {'prompt', 'words'},
+                   limits={'requests_per_minute': 20})
 def transcribe_groq_whisper(file_path):
+    """
+    Transcribe audio using Groq Whisper API.
+
+    Args:
+        file_path (str): Path to the audio file.
+    Returns:
+        Transcript: The transcription, with word timings.
+    """
     api_key = config.get('groq_api_key')
     endpoint = config.get('groq_whisper_endpoint')
     if not api_key or not endpoint:
-        return "Groq config missing."
+        return Transcript.failed("Groq Whisper Large-v3 Turbo", "config missing")
     headers = {
         'Authorization': f'Bearer {api_key}'
     }
-    files = {
-        'file': open(file_path, 'rb')
-    }
     data = {
         'model': 'whisper-large-v3',
-        'language': 'nl'
+        'language': 'nl',
+        'response_format': 'verbose_json',
+        'timestamp_granularities[]': 'word'
     }
     prompt = config.get('prompt')
     if prompt:
         data['prompt'] = prompt
     try:
-        resp = requests.post(endpoint, headers=headers, files=files, data=data)
+        with MultipartFile(data, 'file', file_path) as body:
+            resp = http_request('POST', endpoint, provider="Groq Whisper Large-v3 Turbo",
+                                headers={**headers, 'Content-Type': body.content_type}, data=body)
         if resp.status_code != 200:
-            return f"Groq Whisper error: {resp.text}"
-        return resp.json().get('text', str(resp.json()))
+            return Transcript.failed("Groq Whisper Large-v3 Turbo", resp.text)
+        result = resp.json()
+        return Transcript.from_words("Groq Whisper Large-v3 Turbo", [
+            (w['word'].strip(), w['start'], w['end'], None) for w in result.get('words') or []
+        ], result.get('text', ''))
     except Exception as e:
-        return f"Groq Whisper error: {e}"
+        return Transcript.failed("Groq Whisper Large-v3 Turbo", e)
 
-if __name__ == "__main__":
-    import sys
-    import time
-    import concurrent.futures
-    from datetime import datetime
-    import os
 
-    if len(sys.argv) != 2:
-        print("Usage: python transcriber.py <audiofile.wav>")
-        sys.exit(1)
-    audio_filename = sys.argv[1]
-    if not os.path.isfile(audio_filename):
-        print(f"File not found: {audio_filename}")
-        sys.exit(1)
+@register_provider("Speechmatics", ['speechmatics_api_key'], {'async', 'webhook', 'words', 'confidence', 'url'})
+def submit_speechmatics(file_path):
+    """
+    Upload audio to Speechmatics (or pass its staged URL) and start a transcription job.
 
-    # Create a new subfolder in 'recordings' for this run
-    ensure_recordings_dir()
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    run_dir = os.path.join('recordings', f'run_{timestamp}')
-    os.makedirs(run_dir, exist_ok=True)
+    Args:
+        file_path (str): Path to the audio file.
+    Returns:
+        AsyncJob: The running job, or a failed Transcript.
+    """
+    import json as _json
+    api_key = config.get('speechmatics_api_key')
+    if not api_key:
+        return Transcript.failed("Speechmatics", "API key missing")
+    url = provider_endpoint("Speechmatics", "https://asr.api.speechmatics.com") + "/v2/jobs/"
+    headers = {"Authorization": f"Bearer {api_key}"}
+    token = uuid.uuid4().hex
+    job_config = {
+        "type": "transcription",
+        "transcription_config": {
+            "language": "nl"
+        }
+    }
+    if webhook_url(token):
+        job_config["notification_config"] = [{"url": webhook_url(token)}]
+    media_url = staged_url(file_path)
+    if media_url:
+        job_config["fetch_data"] = {"url": media_url}
+        job_resp = http_request('POST', url, provider="Speechmatics", headers=headers,
+                                files={"config": (None, _json.dumps(job_config))})
+    else:
+        # Speechmatics v2 expects 'config' as a JSON string
+        data = {
+            "config": _json.dumps(job_config)
+        }
+        with MultipartFile(data, 'data_file', file_path) as body:
+            job_resp = http_request('POST', url, provider="Speechmatics",
+                                    headers={**headers, 'Content-Type': body.content_type}, data=body)
+    if job_resp.status_code != 201:
+        return Transcript.failed("Speechmatics", f"job error: {job_resp.text}")
+    job_id = job_resp.json().get('id')
 
-    providers = []
-    def not_empty(val):
-        return val is not None and str(val).strip() != ''
+    def poll():
+        status_resp = http_request('GET', f"{url}{job_id}/", provider="Speechmatics", retries=0, headers=headers)
+        if status_resp.status_code != 200:
+            return False, None, retry_after_seconds(status_resp)
+        status = status_resp.json().get('job', {}).get('job_status')
+        if status == 'done':
+            # Get transcript, with word timings
+            transcript_url = f"{url}{job_id}/transcript?format=json-v2"
+            transcript_resp = http_request('GET', transcript_url, provider="Speechmatics", headers=headers)
+            if transcript_resp.status_code != 200:
+                return True, Transcript.failed("Speechmatics", f"transcript error: {transcript_resp.text}"), None
+            words = []
+            for item in transcript_resp.json().get('results', []):
+                alternative = (item.get('alternatives') or [{}])[0]
+                content = alternative.get('content', '')
+                if item.get('type') == 'punctuation' and words:
+                    words[-1][0] += content
+                elif content:
+                    words.append([content, item.get('start_time', 0.0), item.get('end_time', 0.0),
+                                  alternative.get('confidence')])
+            return True, Transcript.from_words("Speechmatics", words), None
+        elif status in ('failed', 'rejected'):
+            return True, Transcript.failed("Speechmatics", status_resp.text), None
+        return False, None, retry_after_seconds(status_resp)
 
-    providers = []
-    if not_empty(config.get('assemblyai_api_key')):
-        print("[INFO] Using AssemblyAI provider")
-        providers.append(("AssemblyAI", transcribe_assemblyai))
-    else:
-        print("[INFO] Skipping AssemblyAI (no API key)")
-    if not_empty(config.get('openai_api_key')):
-        print("[INFO] Using OpenAI Whisper provider")
-        providers.append(("OpenAI Whisper", transcribe_openai_whisper))
-    else:
-        print("[INFO] Skipping OpenAI Whisper (no API key)")
-    if not_empty(config.get('groq_api_key')) and not_empty(config.get('groq_whisper_endpoint')):
-        print("[INFO] Using Groq Whisper provider")
-        providers.append(("Groq Whisper Large-v3 Turbo", transcribe_groq_whisper))
-    else:
-        print("[INFO] Skipping Groq Whisper (missing API key or endpoint)")
-    if not_empty(config.get('speechmatics_api_key')):
-        print("[INFO] Using Speechmatics provider")
-        providers.append(("Speechmatics", transcribe_speechmatics))
-    else:
-        print("[INFO] Skipping Speechmatics (no API key)")
-    if not_empty(config.get('aws_access_key_id')) and not_empty(config.get('aws_secret_access_key')) and not_empty(config.get('aws_region')):
-        print("[INFO] Using AWS Transcribe provider")
-        providers.append(("AWS Transcribe", transcribe_aws))
-    else:
-        print("[INFO] Skipping AWS Transcribe (missing credentials)")
-    if not_empty(config.get('deepgram_api_key')):
-        print("[INFO] Using Deepgram provider")
-        providers.append(("Deepgram", transcribe_deepgram))
-    else:
-        print("[INFO] Skipping Deepgram (no API key)")
-    if not_empty(config.get('ibm_api_key')) and not_empty(config.get('ibm_url')):
-        print("[INFO] Using IBM Watson provider")
-        providers.append(("IBM Watson Speech to Text", transcribe_ibm))
-    else:
-        print("[INFO] Skipping IBM Watson (missing API key or URL)")
-    # if not_empty(config.get('revai_api_key')):
-    #     print("[INFO] Using Rev AI provider")
-    #     providers.append(("Rev AI", transcribe_revai))
-    # else:
-    #     print("[INFO] Skipping Rev AI (no API key)")
-    # Rev AI disabled: output format not currently usable for Dutch transcription.
-    if not_empty(config.get('vatis_api_key')):
-        print("[INFO] Using Vatis Tech provider")
-        providers.append(("Vatis Tech", transcribe_vatis))
-    else:
-        print("[INFO] Skipping Vatis Tech (no API key)")
-    if not providers:
-        print("[ERROR] No providers enabled. Please add at least one API key to config.json.")
-        sys.exit(1)
-    results = [None] * len(providers)
-    print(f"Transcribing {audio_filename} with all providers asynchronously...")
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        future_to_idx = {}
-        for idx, (name, func) in enumerate(providers):
-            print(f"[DEBUG] Starting transcription with {name}...")
-            future = executor.submit(func, audio_filename)
-            future_to_idx[future] = idx
-        any_results = False
-        for future in concurrent.futures.as_completed(future_to_idx):
-            idx = future_to_idx[future]
-            name, _ = providers[idx]
-            try:
-                result = future.result()
-                print(f"[DEBUG] {name} finished. Result: {result[:100] if isinstance(result, str) else result}")
-                any_results = True
-            except Exception as exc:
-                result = f"Exception: {exc}"
-                print(f"[ERROR] Exception from {name}: {exc}")
-            results[idx] = (name, result)
-            print(f"\n---\n- {name}\n- {result}\n")
-            output_file = os.path.join(run_dir, f"{name.replace(' ', '_')}.txt")
-            with open(output_file, 'w', encoding='utf-8') as out_f:
-                out_f.write(result if isinstance(result, str) else str(result))
-        if not any_results:
-            print("[ERROR] No transcription results returned from any provider.")
-
-    print(f"\nAll transcriptions saved in {run_dir}\n")
-
-    # Combine all results and send to OpenAI ChatGPT
-    openai_api_key = config.get('openai_api_key')
-    if not openai_api_key:
-        print("OpenAI API key missing in config.json, cannot combine transcriptions.")
-        sys.exit(1)
-    try:
-        import openai
-        combine_prompt = config.get('combine_prompt') or "dit zijn verschillende transcripties van 1 opname van een DND sessie. maak er 1 coherente transcriptie van"
-        transcript_texts = "\n\n".join([
-            f"{name}:\n{text}" for name, text in results
-        ])
-        system_message = {"role": "system", "content": combine_prompt}
-        user_message = {"role": "user", "content": transcript_texts}
-        try:
-            # Try new openai>=1.0.0 interface
-            from openai import OpenAI
-            client = OpenAI(api_key=openai_api_key)
-            chat_response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[system_message, user_message]
-            )
-            combined = chat_response.choices[0].message.content.strip()
-        except ImportError:
-            # Legacy fallback
-            openai.api_key = openai_api_key
-            chat_response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[system_message, user_message]
-            )
-            combined = chat_response["choices"][0]["message"]["content"].strip()
-        print("\n======\nGecombineerde transcriptie (OpenAI GPT):\n======\n")
-        print(combined)
-        combined_path = os.path.join(run_dir, "Combined_OpenAI.txt")
-        with open(combined_path, 'w') as f:
-            f.write(combined)
-        print(f"\nCombined transcript saved as {combined_path}\n")
-    except Exception as e:
-        print(f"Error combining transcripts with OpenAI: {e}")
+    def cancel():
+        http_request('DELETE', f"{url}{job_id}?force=true", provider="Speechmatics", retries=0, headers=headers)
+
+    return AsyncJob("Speechmatics", poll, job_id, token, cancel)
+
+
+def transcribe_speechmatics(file_path):
+    """
+    Transcribe audio using Speechmatics API.
+    """
+    return wait_for_job(submit_speechmatics(file_path))
+
+
+AWS_MEDIA_FORMATS = {'.flac': 'flac', '.wav': 'wav', '.ogg': 'ogg', '.mp3': 'mp3',
+                     '.mp4': 'mp4', '.m4a': 'm4a', '.webm': 'webm', '.amr': 'amr'}
+_aws_clients = {}
+_aws_clients_lock = threading.Lock()
+
+
+def aws_client(service, endpoint_url=None):
+    """
+    Return the shared boto3 client for an AWS service, creating it on first use.
+
+    'aws_endpoint_url' (or endpoint_url) sends the calls to another endpoint, such as a
+    moto server or LocalStack when testing, or an S3-compatible store like MinIO.
+    Timeouts and retries follow 'timeouts'/'timeout' and 'http_retries'.
+    """
+    endpoint_url = endpoint_url or config.get('aws_endpoint_url') or None
+    with _aws_clients_lock:
+        client = _aws_clients.get((service, endpoint_url))
+        if client is None:
+            boto3 = lazy_import('boto3')
+            Config = lazy_import('botocore.config').Config
+            timeout = request_timeout("AWS Transcribe") or 60
+            concurrency = int(config.get('aws_upload_concurrency', S3_UPLOAD_CONCURRENCY))
+            client = boto3.client(
+                service,
+                region_name=config.get('aws_region'),
+                aws_access_key_id=config.get('aws_access_key_id'),
+                aws_secret_access_key=config.get('aws_secret_access_key'),
+                endpoint_url=endpoint_url,
+                config=Config(connect_timeout=timeout, read_timeout=timeout,
+                              max_pool_connections=max(10, concurrency * 2),
+                              retries={'max_attempts': int(config.get('http_retries', HTTP_RETRIES)) + 1,
+                                       'mode': 'adaptive'},
+                              # Presigned URLs need SigV4 on every S3-compatible store
+                              signature_version='s3v4' if service == 's3' else None))
+            _aws_clients[service, endpoint_url] = client
+        return client
+
+
+def parse_aws_transcript(data):
+    """Turn the JSON output of an AWS Transcribe job into a Transcript."""
+    results = data.get('results', {})
+    words = []
+    for item in results.get('items', []):
+        alternative = (item.get('alternatives') or [{}])[0]
+        content = alternative.get('content', '')
+        if item.get('type') == 'punctuation' and words:
+            words[-1][0] += content
+        elif content and item.get('type') != 'punctuation':
+            confidence = alternative.get('confidence')
+            words.append([content, float(item.get('start_time', 0.0)), float(item.get('end_time', 0.0)),
+                          float(confidence) if confidence not in (None, '') else None])
+    text = ' '.join(t.get('transcript', '') for t in results.get('transcripts', []))
+    return Transcript.from_words("AWS Transcribe", words, text.strip())
+
+
+@register_provider("AWS Transcribe", ['aws_access_key_id', 'aws_secret_access_key', 'aws_region', 'aws_s3_bucket'],
+                   {'async', 'words', 'confidence'})
+def submit_aws(file_path):
+    """
+    Upload audio to S3 and start an AWS Transcribe job.
+
+    The file is sent to 'aws_s3_bucket' as a multipart upload, with up to
+    'aws_upload_concurrency' parts of 'aws_part_mb' MB in flight at once, so large
+    session files use the full uplink. The job writes its result next to the audio;
+    both are deleted once the job is over, and the job too when it is given up on.
+
+    Args:
+        file_path (str): Path to the audio file.
+    Returns:
+        AsyncJob: The running job, or a failed Transcript.
+    """
+    S3UploadFailedError = lazy_import('boto3.exceptions').S3UploadFailedError
+    TransferConfig = lazy_import('boto3.s3.transfer').TransferConfig
+    botocore_exceptions = lazy_import('botocore.exceptions')
+    BotoCoreError, ClientError = botocore_exceptions.BotoCoreError, botocore_exceptions.ClientError
+    name = "AWS Transcribe"
+    media_format = AWS_MEDIA_FORMATS.get(os.path.splitext(file_path)[1].lower())
+    if not media_format:
+        return Transcript.failed(name, f"unsupported audio format: {os.path.basename(file_path)}")
+    bucket = config['aws_s3_bucket']
+    prefix = config.get('aws_s3_prefix', 'transcriber/')
+    job_name = f"transcriber-{uuid.uuid4().hex}"
+    media_key = f"{prefix}{job_name}{os.path.splitext(file_path)[1].lower()}"
+    output_key = f"{prefix}{job_name}.json"
+    part_size = int(float(config.get('aws_part_mb', S3_PART_MB)) * 1024 * 1024)
+    transfer = TransferConfig(multipart_threshold=part_size, multipart_chunksize=part_size,
+                              max_concurrency=int(config.get('aws_upload_concurrency', S3_UPLOAD_CONCURRENCY)))
+    s3 = aws_client('s3')
+    transcribe = aws_client('transcribe')
+    cancel = getattr(_call_state, 'cancel', None)
+
+    def progress(_):
+        # Runs in the transfer threads; stops the upload once the job is abandoned
+        if cancel is not None and cancel.is_set():
+            raise JobCancelled("job cancelled")
+
+    def remove(*keys):
+        for key in keys:
+            try:
+                s3.delete_object(Bucket=bucket, Key=key)
+            except (BotoCoreError, ClientError) as e:
+                log.error(f"Could not delete s3://{bucket}/{key}: {e}")
+
+    try:
+        started = time.monotonic()
+        s3.upload_file(file_path, bucket, media_key, Config=transfer, Callback=progress,
+                       ExtraArgs={'ContentType': audio_content_type(file_path)})
+        metrics.inc('transcriber_upload_bytes_total', os.path.getsize(file_path), provider=name)
+        metrics.observe('transcriber_upload_seconds', time.monotonic() - started, provider=name)
+        check_cancelled()
+        transcribe.start_transcription_job(
+            TranscriptionJobName=job_name,
+            LanguageCode='nl-NL',
+            MediaFormat=media_format,
+            Media={'MediaFileUri': f"s3://{bucket}/{media_key}"},
+            OutputBucketName=bucket,
+            OutputKey=output_key,
+        )
+    except (BotoCoreError, ClientError, S3UploadFailedError, JobCancelled) as e:
+        remove(media_key)
+        if isinstance(e, JobCancelled):
+            raise
+        return Transcript.failed(name, e)
+
+    def poll():
+        job = transcribe.get_transcription_job(TranscriptionJobName=job_name)['TranscriptionJob']
+        status = job['TranscriptionJobStatus']
+        if status == 'FAILED':
+            remove(media_key)
+            return True, Transcript.failed(name, job.get('FailureReason', 'transcription failed')), None
+        if status != 'COMPLETED':
+            return False, None, None
+        try:
+            data = json.loads(s3.get_object(Bucket=bucket, Key=output_key)['Body'].read())
+        except ClientError as e:
+            remove(media_key, output_key)
+            return True, Transcript.failed(name, f"could not read s3://{bucket}/{output_key}: {e}"), None
+        remove(media_key, output_key)
+        return True, parse_aws_transcript(data), None
+
+    def cancel_job():
+        try:
+            transcribe.delete_transcription_job(TranscriptionJobName=job_name)
+        finally:
+            remove(media_key, output_key)
+
+    return AsyncJob(name, poll, job_name, cancel=cancel_job)
+
+
+def transcribe_aws(file_path):
+    """
+    Transcribe audio using AWS Transcribe.
+    """
+    return wait_for_job(submit_aws(file_path))
+
+
+class AudioStage:
+    """
+    Uploads the audio of one file once to an S3-compatible bucket and hands out presigned
+    URLs, so providers that can fetch media by URL don't each need their own upload.
+
+    Every audio file (one per upload codec and chunk) is uploaded by the first provider
+    that asks for it; providers asking at the same time wait for that upload. If it fails,
+    url() returns None and the providers upload the audio themselves. close() deletes
+    everything staged.
+
+    Args:
+        bucket (str): Bucket to stage the audio in.
+        prefix (str): Key prefix of the staged audio.
+        endpoint_url (str): Optional S3-compatible endpoint (MinIO, moto, ...).
+        expires (int): Lifetime of the URLs in seconds.
+    """
+
+    def __init__(self, bucket, prefix=STAGE_PREFIX, endpoint_url=None, expires=STAGE_URL_SECONDS):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url
+        self.expires = expires
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def url(self, file_path):
+        """
+        Return a presigned URL of the audio, uploading it on first use.
+
+        Returns:
+            str: The URL, or None if the audio could not be staged.
+        """
+        with self._lock:
+            entry = self._entries.get(file_path)
+            owner = entry is None
+            if owner:
+                entry = self._entries[file_path] = {'done': threading.Event(), 'key': None, 'url': None}
+        if not owner:
+            entry['done'].wait()
+            return entry['url']
+        try:
+            TransferConfig = lazy_import('boto3.s3.transfer').TransferConfig
+            s3 = aws_client('s3', self.endpoint_url)
+            key = f"{self.prefix}{uuid.uuid4().hex}{os.path.splitext(file_path)[1].lower()}"
+            part_size = int(float(config.get('aws_part_mb', S3_PART_MB)) * 1024 * 1024)
+            started = time.monotonic()
+            with span('stage', file=os.path.basename(file_path)):
+                s3.upload_file(file_path, self.bucket, key, ExtraArgs={'ContentType': audio_content_type(file_path)},
+                               Config=TransferConfig(multipart_threshold=part_size, multipart_chunksize=part_size,
+                                                     max_concurrency=int(config.get('aws_upload_concurrency',
+                                                                                    S3_UPLOAD_CONCURRENCY))))
+            entry['key'] = key
+            metrics.inc('transcriber_upload_bytes_total', os.path.getsize(file_path), provider='stage')
+            metrics.observe('transcriber_upload_seconds', time.monotonic() - started, provider='stage')
+            entry['url'] = s3.generate_presigned_url('get_object', Params={'Bucket': self.bucket, 'Key': key},
+                                                     ExpiresIn=self.expires)
+            log.debug(f"Staged {file_path} as s3://{self.bucket}/{key}")
+        except Exception as e:
+            log.error(f"Could not stage {file_path} in {self.bucket}, providers upload it themselves: {e}")
+        finally:
+            entry['done'].set()
+        return entry['url']
+
+    def close(self):
+        """Delete the staged audio."""
+        with self._lock:
+            keys = [entry['key'] for entry in self._entries.values() if entry['key']]
+            self._entries.clear()
+        for key in keys:
+            try:
+                aws_client('s3', self.endpoint_url).delete_object(Bucket=self.bucket, Key=key)
+            except Exception as e:
+                log.error(f"Could not delete s3://{self.bucket}/{key}: {e}")
+
+
+_current_stage = contextvars.ContextVar('stage', default=None)
+
+
+def staged_url(file_path):
+    """
+    Return a presigned URL for the audio when staging is on for this file (see
+    AudioStage), else None. Only providers registered with the 'url' capability use it.
+    """
+    stage = _current_stage.get()
+    return stage.url(file_path) if stage else None
+
+
+@contextlib.contextmanager
+def staging(providers):
+    """
+    Stage audio for the providers with the 'url' capability while the block runs, if
+    'stage_bucket' is set, and delete it afterwards.
+
+    Args:
+        providers (list): (name, function) tuples that will be called in the block.
+    """
+    stage = None
+    if config.get('stage_bucket') and any('url' in PROVIDERS[name].capabilities
+                                          for name, _ in providers if name in PROVIDERS):
+        stage = AudioStage(config['stage_bucket'], config.get('stage_prefix', STAGE_PREFIX),
+                           config.get('stage_endpoint_url'), int(config.get('stage_url_seconds', STAGE_URL_SECONDS)))
+    token = _current_stage.set(stage)
+    try:
+        yield stage
+    finally:
+        _current_stage.reset(token)
+        if stage:
+            stage.close()
+
+
+@register_provider("Deepgram", ['deepgram_api_key'], {'words', 'confidence', 'url'}, codec='opus')
+def transcribe_deepgram(file_path):
+    """
+    Transcribe audio using Deepgram API.
+    """
+    api_key = config.get('deepgram_api_key')
+    if not api_key:
+        return Transcript.failed("Deepgram", "API key missing")
+    url = provider_endpoint("Deepgram", "https://api.deepgram.com") + "/v1/listen"
+    headers = {
+        "Authorization": f"Token {api_key}",
+        "Content-Type": audio_content_type(file_path)
+    }
+    params = {
+        "language": "nl"
+    }
+    try:
+        media_url = staged_url(file_path)
+        if media_url:
+            resp = http_request('POST', url, provider="Deepgram", params=params,
+                                headers={**headers, "Content-Type": "application/json"}, json={"url": media_url})
+        else:
+            with open_audio(file_path) as audio:
+                resp = http_request('POST', url, provider="Deepgram", headers=headers, params=params, data=audio)
+        if resp.status_code != 200:
+            return Transcript.failed("Deepgram", resp.text)
+        alternative = resp.json()['results']['channels'][0]['alternatives'][0]
+        return Transcript.from_words("Deepgram", [
+            (w.get('punctuated_word', w['word']), w['start'], w['end'], w.get('confidence'))
+            for w in alternative.get('words', [])
+        ], alternative['transcript'])
+    except Exception as e:
+        return Transcript.failed("Deepgram", e)
+
+
+@register_provider("IBM Watson Speech to Text", ['ibm_api_key', 'ibm_url'], {'words', 'confidence'}, codec='opus')
+def transcribe_ibm(file_path):
+    """
+    Transcribe audio using IBM Watson Speech to Text.
+    """
+    api_key = config.get('ibm_api_key')
+    url = config.get('ibm_url')
+    if not api_key or not url:
+        return Transcript.failed("IBM Watson Speech to Text", "config missing")
+    HTTPBasicAuth = lazy_import('requests.auth').HTTPBasicAuth
+    headers = {
+        'Content-Type': audio_content_type(file_path),
+    }
+    params = {
+        'model': 'nl-NL_BroadbandModel',
+        'timestamps': 'true',
+        'word_confidence': 'true'
+    }
+    try:
+        with open_audio(file_path) as audio:
+            resp = http_request(
+                'POST',
+                f"{url}/v1/recognize",
+                provider="IBM Watson Speech to Text",
+                headers=headers,
+                params=params,
+                data=audio,
+                auth=HTTPBasicAuth('apikey', api_key)
+            )
+        if resp.status_code != 200:
+            return Transcript.failed("IBM Watson Speech to Text", resp.text)
+        results = resp.json().get('results', [])
+        transcript = ' '.join([alt['transcript'] for r in results for alt in r.get('alternatives', [])])
+        words = []
+        for r in results:
+            for alt in r.get('alternatives', [])[:1]:
+                confidences = [c for _, c in alt.get('word_confidence', [])]
+                for k, (word, start, end) in enumerate(alt.get('timestamps', [])):
+                    words.append((word, start, end, confidences[k] if k < len(confidences) else None))
+        return Transcript.from_words("IBM Watson Speech to Text", words, transcript.strip())
+    except Exception as e:
+        return Transcript.failed("IBM Watson Speech to Text", e)
+
+
+# Not used unless named in 'providers': output format not currently usable for Dutch transcription
+@register_provider("Rev AI", ['revai_api_key'], {'async', 'webhook', 'words', 'confidence', 'url'}, default=False)
+def submit_revai(file_path):
+    """
+    Upload audio to Rev AI (or pass its staged URL) and start a transcription job.
+
+    Args:
+        file_path (str): Path to the audio file.
+    Returns:
+        AsyncJob: The running job, or a failed Transcript.
+    """
+    api_key = config.get('revai_api_key')
+    if not api_key:
+        return Transcript.failed("Rev AI", "API key missing")
+    url = provider_endpoint("Rev AI", "https://api.rev.ai") + "/speechtotext/v1/jobs"
+    headers = {
+        "Authorization": f"Bearer {api_key}"
+    }
+    token = uuid.uuid4().hex
+    data = {}
+    if webhook_url(token):
+        data['options'] = json.dumps({'notification_config': {'url': webhook_url(token)}})
+    # Upload file
+    try:
+        media_url = staged_url(file_path)
+        if media_url:
+            options = json.loads(data.get('options', '{}'))
+            upload_resp = http_request('POST', url, provider="Rev AI", headers=headers,
+                                       json={**options, 'source_config': {'url': media_url}})
+        else:
+            with MultipartFile(data, 'media', file_path) as body:
+                upload_resp = http_request('POST', url, provider="Rev AI",
+                                           headers={**headers, 'Content-Type': body.content_type}, data=body)
+        if upload_resp.status_code not in [200, 201]:
+            return Transcript.failed("Rev AI", f"upload error: {upload_resp.text}")
+        job_id = upload_resp.json()['id']
+    except Exception as e:
+        return Transcript.failed("Rev AI", e)
+
+    def poll():
+        status_resp = http_request('GET', f"{url}/{job_id}", provider="Rev AI", retries=0, headers=headers)
+        if status_resp.status_code != 200:
+            return False, None, retry_after_seconds(status_resp)
+        status = status_resp.json()['status']
+        if status == 'failed':
+            return True, Transcript.failed("Rev AI", f"transcription failed: {status_resp.text}"), None
+        if status != 'transcribed':
+            return False, None, retry_after_seconds(status_resp)
+        # Get transcript
+        transcript_resp = http_request('GET', f"{url}/{job_id}/transcript?accept=application/json", provider="Rev AI", headers=headers)
+        if transcript_resp.status_code != 200:
+            return True, Transcript.failed("Rev AI", f"transcript error: {transcript_resp.text}"), None
+        try:
+            data = transcript_resp.json()
+            # Rev AI returns monologues -> elements (type: text/punct)
+            monologues = data.get('monologues', [])
+            transcript = ''
+            words = []
+            for mono in monologues:
+                for el in mono.get('elements', []):
+                    if el.get('type') in ('text', 'punct'):
+                        transcript += el.get('value', '')
+                    if el.get('type') == 'text':
+                        words.append([el.get('value', ''), el.get('ts'), el.get('end_ts'), el.get('confidence')])
+                    elif el.get('type') == 'punct' and el.get('value', '').strip() and words:
+                        words[-1][0] += el['value'].strip()
+            if any(w[1] is None or w[2] is None for w in words):
+                return True, Transcript("Rev AI", transcript.strip()), None
+            return True, Transcript.from_words("Rev AI", words, transcript.strip()), None
+        except Exception:
+            return True, Transcript("Rev AI", transcript_resp.text.strip()), None
+
+    def cancel():
+        http_request('DELETE', f"{url}/{job_id}", provider="Rev AI", retries=0, headers=headers)
+
+    return AsyncJob("Rev AI", poll, job_id, token, cancel)
+
+
+def transcribe_revai(file_path):
+    """
+    Transcribe audio using Rev AI API.
+    """
+    return wait_for_job(submit_revai(file_path))
+
+
+@register_provider("Vatis Tech", ['vatis_api_key'], codec='wav')
+def transcribe_vatis(file_path):
+    """
+    Transcribe audio using Vatis Tech API.
+    """
+    api_key = config.get('vatis_api_key')
+    if not api_key:
+        return Transcript.failed("Vatis Tech", "API key missing")
+    url = provider_endpoint("Vatis Tech", "https://vatis.tech") + "/api/v1/speech-to-text/asr"
+    headers = {
+        "x-api-key": api_key
+    }
+    data = {
+        'language': 'nl'
+    }
+    try:
+        with MultipartFile(data, 'file', file_path) as body:
+            resp = http_request('POST', url, provider="Vatis Tech",
+                                headers={**headers, 'Content-Type': body.content_type}, data=body)
+        if resp.status_code != 200:
+            return Transcript.failed("Vatis Tech", resp.text)
+        return Transcript("Vatis Tech", resp.json()['result']['text'])
+    except Exception as e:
+        return Transcript.failed("Vatis Tech", e)
+
+
+class LocalWhisper:
+    """
+    A faster-whisper (CTranslate2) model that stays loaded between calls.
+
+    The model is loaded once and shared by every chunk of every file. A call decodes the
+    speech of its chunk in 30-second windows, batch_size windows at a time
+    (BatchedInferencePipeline, faster-whisper 1.1 and later). Up to workers calls run at
+    the same time, each on its own CTranslate2 worker with threads CPU threads; further
+    calls wait for a free worker.
+
+    Args:
+        model (str): Model size (e.g. 'large-v3') or path of a converted model.
+        compute_type (str): CTranslate2 quantization; 'int8' is the fastest on CPU.
+        threads (int): CPU threads per worker.
+        workers (int): Calls decoded at the same time.
+        batch_size (int): Windows decoded together.
+    """
+
+    def __init__(self, model, compute_type=LOCAL_WHISPER_COMPUTE_TYPE, threads=None,
+                 workers=LOCAL_WHISPER_WORKERS, batch_size=LOCAL_WHISPER_BATCH):
+        faster_whisper = lazy_import('faster_whisper')
+        threads = threads or max(1, (os.cpu_count() or 1) // workers)
+        log.info(f"Loading Whisper model {model} ({compute_type}, {workers} x {threads} threads)")
+        self.model = faster_whisper.WhisperModel(model, device='cpu', compute_type=compute_type,
+                                                 cpu_threads=threads, num_workers=workers)
+        pipeline = getattr(faster_whisper, 'BatchedInferencePipeline', None)
+        self.pipeline = pipeline(model=self.model) if pipeline and batch_size > 1 else None
+        self.batch_size = batch_size
+        self._slots = threading.BoundedSemaphore(workers)
+
+    def transcribe(self, file_path, prompt=None):
+        """
+        Returns:
+            list: (word, start, end, probability) tuples.
+        """
+        options = {'language': LANGUAGE, 'word_timestamps': True, 'initial_prompt': prompt or None}
+        with self._slots:
+            if self.pipeline:
+                segments, _ = self.pipeline.transcribe(file_path, batch_size=self.batch_size, **options)
+            else:
+                segments, _ = self.model.transcribe(file_path, **options)
+            # Segments are decoded lazily, so read them while holding the worker
+            return [(w.word.strip(), w.start, w.end, w.probability)
+                    for segment in segments for w in segment.words or ()]
+
+
+_local_whisper = None
+_local_whisper_lock = threading.Lock()
+
+
+def local_whisper():
+    """Return the shared LocalWhisper for 'local_whisper_model', loading it on first use."""
+    global _local_whisper
+    with _local_whisper_lock:
+        if _local_whisper is None:
+            threads = config.get('local_whisper_threads')
+            _local_whisper = LocalWhisper(config.get('local_whisper_model'),
+                                          config.get('local_whisper_compute_type', LOCAL_WHISPER_COMPUTE_TYPE),
+                                          int(threads) if threads else None,
+                                          int(config.get('local_whisper_workers', LOCAL_WHISPER_WORKERS)),
+                                          int(config.get('local_whisper_batch', LOCAL_WHISPER_BATCH)))
+        return _local_whisper
+
+
+@register_provider("Local Whisper", ['local_whisper_model'], {'prompt', 'words', 'confidence', 'offline'}, codec='wav')
+def transcribe_local_whisper(file_path):
+    """
+    Transcribe audio on this machine with faster-whisper, without any network access.
+
+    Args:
+        file_path (str): Path to the audio file.
+    Returns:
+        Transcript: The transcription, with word timings and probabilities.
+    """
+    try:
+        return Transcript.from_words("Local Whisper", local_whisper().transcribe(file_path, config.get('prompt')))
+    except ImportError:
+        return Transcript.failed("Local Whisper", "faster-whisper is not installed (pip install faster-whisper)")
+    except Exception as e:
+        return Transcript.failed("Local Whisper", e)
+
+
+# === TRANSCRIPT CACHE ===
+
+_hash_memo = {}
+
+
+def audio_hash(file_path, block_size=1 << 20):
+    """
+    Compute the SHA-256 of a file without reading it into memory at once.
+
+    The hash is remembered per (path, size, modification time), so hashing the same
+    file again in one run is free.
+
+    Returns:
+        str: The hex digest.
+    """
+    st = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), st.st_size, st.st_mtime_ns)
+    digest = _hash_memo.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                h.update(block)
+        digest = h.hexdigest()
+        _hash_memo[memo_key] = digest
+    return digest
+
+
+class TranscriptCache:
+    """
+    On-disk cache of transcription and combine results, addressed by content hashes.
+
+    Every entry is one small JSON file named after the SHA-256 of its key, so entries
+    survive crashes and can be shared between runs. Reading an entry refreshes its
+    modification time; eviction removes entries older than max_age and then the least
+    recently used ones until the cache is below max_bytes.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024,
+                 max_age=CACHE_MAX_AGE_DAYS * 86400):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(*parts):
+        """Build a cache key from JSON-serializable parts."""
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """Return the cached value for a key, or None."""
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                value = json.load(f)['value']
+            os.utime(path)
+            return value
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key, value):
+        """Store a JSON-serializable value under a key."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'value': value, 'stored': time.time()}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        """Remove expired entries, then the least recently used ones above max_bytes."""
+        with self._lock:
+            entries = []
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            now = time.time()
+            removed = 0
+            for mtime, size, path in entries:
+                if now - mtime <= self.max_age and total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            if removed:
+                log.debug(f"Evicted {removed} cache entries")
+
+
+def transcript_cache():
+    """Return a TranscriptCache configured from config.json, or None if 'cache' is false."""
+    if not config.get('cache', True):
+        return None
+    return TranscriptCache(config.get('cache_dir', CACHE_DIR),
+                           int(config.get('cache_max_mb', CACHE_MAX_MB)) * 1024 * 1024,
+                           float(config.get('cache_max_age_days', CACHE_MAX_AGE_DAYS)) * 86400)
+
+
+def provider_cache_key(audio_digest, provider):
+    """Cache key of one provider's transcript of one piece of audio."""
+    return TranscriptCache.key('transcript', audio_digest, provider, LANGUAGE, config.get('prompt'))
+
+
+# === PREPROCESSING ===
+
+def audio_content_type(file_path):
+    """Return the Content-Type for an audio file, based on its extension."""
+    ext = os.path.splitext(file_path)[1].lower()
+    return AUDIO_CONTENT_TYPES.get(ext) or mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+
+
+def _resample_wav(src, dst, sample_rate, channels):
+    """
+    Downmix and resample a PCM WAV file without ffmpeg, block by block.
+
+    Uses the audioop module (part of the standard library up to Python 3.12).
+
+    Returns:
+        bool: True on success, False if audioop is unavailable or the file is not supported.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            import audioop
+    except ImportError:
+        return False
+    with wave.open(src, 'rb') as wf:
+        width, in_channels, in_rate = wf.getsampwidth(), wf.getnchannels(), wf.getframerate()
+        if in_channels > 2 or (channels == 2 and in_channels == 1) or width not in (1, 2, 3, 4):
+            return False
+        with wave.open(dst, 'wb') as out:
+            out.setnchannels(channels)
+            out.setsampwidth(2)
+            out.setframerate(sample_rate)
+            state = None
+            while True:
+                data = wf.readframes(in_rate)
+                if not data:
+                    break
+                if width == 1:
+                    # 8-bit WAV is unsigned
+                    data = audioop.bias(data, 1, -128)
+                if width != 2:
+                    data = audioop.lin2lin(data, width, 2)
+                if in_channels == 2 and channels == 1:
+                    data = audioop.tomono(data, 2, 0.5, 0.5)
+                data, state = audioop.ratecv(data, 2, channels, in_rate, sample_rate, state)
+                out.writeframes(data)
+    return True
+
+
+def prepare_audio(file_path, out_dir, sample_rate=RATE, channels=CHANNELS):
+    """
+    Downmix and resample a recording once, before it is split and sent to the providers.
+
+    Args:
+        file_path (str): Path to the audio file.
+        out_dir (str): Directory the prepared file is written to.
+        sample_rate (int): Target sample rate.
+        channels (int): Target number of channels.
+    Returns:
+        str: Path of a 16-bit PCM WAV file at the target rate, or the original path if it
+        already is one or cannot be converted.
+    """
+    try:
+        with wave.open(file_path, 'rb') as wf:
+            if (wf.getframerate(), wf.getnchannels(), wf.getsampwidth()) == (sample_rate, channels, 2):
+                return file_path
+    except (wave.Error, EOFError):
+        pass
+    base = os.path.splitext(os.path.basename(file_path))[0]
+    prepared = os.path.join(out_dir, f"{base}_{sample_rate // 1000}k.wav")
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg:
+        try:
+            subprocess.run([ffmpeg, '-nostdin', '-loglevel', 'error', '-y', '-i', file_path,
+                            '-ac', str(channels), '-ar', str(sample_rate)] + FFMPEG_CODEC_ARGS['wav'] + [prepared],
+                           check=True)
+            return prepared
+        except (OSError, subprocess.CalledProcessError) as e:
+            log.error(f"ffmpeg could not convert {file_path}: {e}")
+            return file_path
+    try:
+        if _resample_wav(file_path, prepared, sample_rate, channels):
+            return prepared
+    except (wave.Error, EOFError) as e:
+        log.error(f"Could not convert {file_path}: {e}")
+    log.info(f"Not preprocessing {file_path}: install ffmpeg to convert this file")
+    return file_path
+
+
+def provider_codec(name):
+    """Return the upload codec for a provider: 'codecs'[name] from config.json, else the registered codec."""
+    spec = PROVIDERS.get(name)
+    return (config.get('codecs') or {}).get(name) or (spec.codec if spec else 'wav')
+
+
+class AudioVariants:
+    """
+    Encodes each audio file once per codec, on first use, and shares the result between providers.
+
+    Encoding needs ffmpeg; without it (or if encoding fails) the original file is used.
+    Several providers asking for the same variant at the same time wait for one encode.
+
+    Args:
+        out_dir (str): Directory the encoded files are written to.
+        sample_rate (int): Sample rate of the encoded files.
+        channels (int): Number of channels of the encoded files.
+    """
+
+    def __init__(self, out_dir, sample_rate=RATE, channels=CHANNELS):
+        self.out_dir = out_dir
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self._ffmpeg = shutil.which('ffmpeg')
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def get(self, file_path, codec):
+        """Return the path of file_path encoded with codec ('wav', 'flac' or 'opus')."""
+        if codec not in CODEC_EXTENSIONS or not self._ffmpeg:
+            return file_path
+        if codec == 'wav' and file_path.lower().endswith('.wav'):
+            return file_path
+        import concurrent.futures
+        with self._lock:
+            future = self._futures.get((file_path, codec))
+            owner = future is None
+            if owner:
+                future = self._futures[file_path, codec] = concurrent.futures.Future()
+        if owner:
+            future.set_result(self._encode(file_path, codec))
+        return future.result()
+
+    def _encode(self, file_path, codec):
+        base = os.path.splitext(os.path.basename(file_path))[0]
+        encoded = os.path.join(self.out_dir, f"{base}{CODEC_EXTENSIONS[codec]}")
+        try:
+            subprocess.run([self._ffmpeg, '-nostdin', '-loglevel', 'error', '-y', '-i', file_path,
+                            '-ac', str(self.channels), '-ar', str(self.sample_rate)]
+                           + FFMPEG_CODEC_ARGS[codec] + [encoded], check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            log.error(f"Could not encode {file_path} as {codec}: {e}")
+            return file_path
+        log.debug(f"Encoded {os.path.basename(encoded)}: "
+                  f"{os.path.getsize(file_path) // 1024} KB -> {os.path.getsize(encoded) // 1024} KB")
+        return encoded
+
+
+# === VOICE ACTIVITY ===
+
+class SpeechMap:
+    """
+    Where the parts of the speech-only audio made by remove_silence come from in the
+    original recording, to move times back to the original timeline.
+
+    Args:
+        segments (list): (start in the speech audio, start in the original, duration)
+            tuples in seconds, in order.
+    """
+
+    def __init__(self, segments):
+        self.segments = [tuple(segment) for segment in segments]
+        self._starts = [segment[0] for segment in self.segments]
+
+    @property
+    def speech_seconds(self):
+        return sum(duration for _, _, duration in self.segments)
+
+    def to_original(self, seconds):
+        """Map a time in the speech audio to the original recording (times in a gap snap back)."""
+        k = max(0, bisect.bisect_right(self._starts, seconds) - 1)
+        if not self.segments:
+            return seconds
+        start, original, duration = self.segments[k]
+        return original + min(max(seconds - start, 0.0), duration)
+
+    def restore(self, transcript):
+        """Move the word times of a Transcript from the speech audio to the original timeline, in place."""
+        for column in (transcript.starts, transcript.ends):
+            for k, value in enumerate(column):
+                column[k] = self.to_original(value)
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'segments': self.segments}, f)
+
+
+def _regions(flags, frame, padding, min_silence, total):
+    """
+    Turn per-frame speech flags into (start frame, end frame) regions of audio to keep:
+    padded on both sides, with pauses shorter than min_silence (in frames) kept too.
+    """
+    regions = []
+    start = None
+    for k, speech in enumerate(itertools.chain(flags, [False])):
+        if speech and start is None:
+            start = k
+        elif not speech and start is not None:
+            lo, hi = max(0, start * frame - padding), min(total, k * frame + padding)
+            if regions and lo - regions[-1][1] < min_silence:
+                regions[-1] = (regions[-1][0], hi)
+            else:
+                regions.append((lo, hi))
+            start = None
+    return regions
+
+
+def _energy_flags(wf, frame, threshold_db):
+    """
+    Mark frames louder than the noise floor (10th percentile of the frame levels) plus
+    threshold_db as speech. Needs NumPy; returns None without it.
+    """
+    try:
+        np = lazy_import('numpy')
+    except ImportError:
+        log.info("numpy is not installed; not removing silence")
+        return None
+    channels = wf.getnchannels()
+    levels = []
+    wf.setpos(0)
+    while True:
+        data = wf.readframes(frame * 1000)
+        if not data:
+            break
+        samples = np.frombuffer(data, dtype='<i2').reshape(-1, channels).mean(axis=1)
+        usable = len(samples) // frame * frame
+        if usable < len(samples):
+            # The last, short frame
+            samples = np.concatenate([samples, np.zeros(frame - len(samples) + usable)])
+        rms = np.sqrt(np.mean(np.square(samples.reshape(-1, frame)), axis=1))
+        levels.append(20 * np.log10(rms + 1.0))
+    if not levels:
+        return []
+    levels = np.concatenate(levels)
+    threshold = np.percentile(levels, 10) + threshold_db
+    return (levels > threshold).tolist()
+
+
+def _webrtc_flags(wf, frame, aggressiveness):
+    """Mark frames as speech with webrtcvad; None if it is not installed or can't read this audio."""
+    if wf.getnchannels() != 1 or wf.getframerate() not in (8000, 16000, 32000, 48000):
+        log.info("webrtcvad needs mono 8, 16, 32 or 48 kHz audio; using the energy detector")
+        return None
+    try:
+        webrtcvad = lazy_import('webrtcvad')
+    except ImportError:
+        log.info("webrtcvad is not installed; using the energy detector")
+        return None
+    vad = webrtcvad.Vad(int(aggressiveness))
+    flags = []
+    wf.setpos(0)
+    while True:
+        data = wf.readframes(frame)
+        if len(data) < frame * 2:
+            if data:
+                flags.append(True)
+            return flags
+        flags.append(vad.is_speech(data, wf.getframerate()))
+
+
+def remove_silence(file_path, out_dir, method='energy'):
+    """
+    Cut the silences out of a recording before it is uploaded, so providers neither
+    process nor bill them.
+
+    Frames of VAD_FRAME_MS are classified as speech by their level ('energy', with NumPy)
+    or by WebRTC's voice activity detector ('webrtc', with webrtcvad). Speech is kept with
+    'vad_padding' seconds around it, and only pauses of at least 'vad_min_silence' seconds
+    are removed; 'vad_gap' seconds of silence stay between the parts so sentences remain
+    separate.
+
+    Args:
+        file_path (str): Path to the audio file (16-bit PCM WAV, else converted with ffmpeg).
+        out_dir (str): Directory the speech-only file is written to.
+        method (str): 'energy' or 'webrtc'.
+    Returns:
+        tuple: (path of the speech-only WAV, SpeechMap), or (file_path, None) if there is
+        too little silence to be worth it or the audio can't be analysed.
+    """
+    wav_path = file_path
+    if not file_path.lower().endswith('.wav'):
+        wav_path = _convert_to_wav(file_path, out_dir)
+        if wav_path is None:
+            log.info(f"Not removing silence from {file_path}: only WAV can be analysed without ffmpeg")
+            return file_path, None
+    try:
+        wf = wave.open(wav_path, 'rb')
+    except (wave.Error, EOFError) as e:
+        log.info(f"Not removing silence from {file_path}: {e}")
+        return file_path, None
+    with wf:
+        if wf.getsampwidth() != 2:
+            log.info(f"Not removing silence from {file_path}: only 16-bit audio is supported")
+            return file_path, None
+        rate = wf.getframerate()
+        total = wf.getnframes()
+        frame = rate * VAD_FRAME_MS // 1000
+        flags = None
+        if method == 'webrtc':
+            flags = _webrtc_flags(wf, frame, config.get('vad_aggressiveness', VAD_AGGRESSIVENESS))
+        if flags is None:
+            flags = _energy_flags(wf, frame, float(config.get('vad_threshold_db', VAD_THRESHOLD_DB)))
+        if flags is None:
+            return file_path, None
+        regions = _regions(flags, frame,
+                           int(float(config.get('vad_padding', VAD_PADDING_SECONDS)) * rate),
+                           int(float(config.get('vad_min_silence', VAD_MIN_SILENCE_SECONDS)) * rate), total)
+        gap = int(float(config.get('vad_gap', VAD_GAP_SECONDS)) * rate)
+        kept = sum(hi - lo for lo, hi in regions) + gap * max(0, len(regions) - 1)
+        if not regions or total - kept < total * VAD_MIN_SAVING:
+            log.debug(f"Not removing silence from {file_path}: too little of it")
+            return file_path, None
+        base = os.path.splitext(os.path.basename(file_path))[0]
+        speech_path = os.path.join(out_dir, f"{base}_speech.wav")
+        frame_size = wf.getsampwidth() * wf.getnchannels()
+        segments = []
+        with wave.open(speech_path, 'wb') as out:
+            out.setnchannels(wf.getnchannels())
+            out.setsampwidth(wf.getsampwidth())
+            out.setframerate(rate)
+            position = 0
+            for k, (lo, hi) in enumerate(regions):
+                if k:
+                    out.writeframes(bytes(gap * frame_size))
+                    position += gap
+                segments.append((position / rate, lo / rate, (hi - lo) / rate))
+                wf.setpos(lo)
+                remaining = hi - lo
+                while remaining > 0:
+                    data = wf.readframes(min(remaining, rate * 10))
+                    if not data:
+                        break
+                    out.writeframes(data)
+                    remaining -= len(data) // frame_size
+                position += hi - lo
+    speech_map = SpeechMap(segments)
+    removed = (total - kept) / rate
+    metrics.inc('transcriber_vad_seconds_total', round(speech_map.speech_seconds, 3), kind='speech')
+    metrics.inc('transcriber_vad_seconds_total', round(removed, 3), kind='removed')
+    log.info(f"Removed {removed:.0f}s of silence from {file_path} ({removed * rate / total:.0%}), "
+             f"{len(segments)} parts left")
+    return speech_path, speech_map
+
+
+# === CHUNKING ===
+
+def _frame_energies(wf, start, count, window):
+    """
+    Measure the loudness of consecutive windows of an open WAV file.
+
+    Args:
+        wf (wave.Wave_read): The open WAV file.
+        start (int): First frame to analyse.
+        count (int): Number of frames to analyse.
+        window (int): Window length in frames.
+    Returns:
+        list: (frame offset, RMS) tuples, one per window. Empty for unsupported sample widths.
+    """
+    typecodes = {1: 'B', 2: 'h', 4: 'i'}
+    width = wf.getsampwidth()
+    if width not in typecodes:
+        return []
+    channels = wf.getnchannels()
+    wf.setpos(start)
+    energies = []
+    pos, end = start, start + count
+    while pos < end:
+        data = wf.readframes(min(window, end - pos))
+        if not data:
+            break
+        samples = array.array(typecodes[width], data)
+        if sys.byteorder == 'big' and width > 1:
+            samples.byteswap()
+        # Only the first channel, and at most ~2000 samples per window: plenty to find a pause
+        step = channels * max(1, len(samples) // channels // 2000)
+        picked = samples[::step]
+        offset = 128 if width == 1 else 0
+        rms = math.sqrt(sum((x - offset) * (x - offset) for x in picked) / len(picked))
+        energies.append((pos, rms))
+        pos += len(data) // (width * channels)
+    return energies
+
+
+def _convert_to_wav(file_path, out_dir):
+    """
+    Convert a non-WAV file to WAV with ffmpeg so it can be split.
+
+    Returns:
+        str: Path of the converted file, or None if ffmpeg is not available or fails.
+    """
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        return None
+    base = os.path.splitext(os.path.basename(file_path))[0]
+    wav_path = os.path.join(out_dir, f"{base}.wav")
+    try:
+        subprocess.run([ffmpeg, '-nostdin', '-loglevel', 'error', '-y', '-i', file_path, wav_path], check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        log.error(f"ffmpeg could not convert {file_path}: {e}")
+        return None
+    return wav_path
+
+
+def split_audio(file_path, out_dir, chunk_seconds=CHUNK_SECONDS, overlap_seconds=CHUNK_OVERLAP_SECONDS):
+    """
+    Split a long recording into overlapping WAV chunks, cutting in pauses where possible.
+
+    Each boundary is placed at the quietest 100 ms in the SILENCE_SEARCH_SECONDS before the
+    nominal chunk end, and the next chunk starts overlap_seconds before that boundary so words
+    cut in half are still heard completely by one of the two chunks.
+
+    Args:
+        file_path (str): Path to the audio file.
+        out_dir (str): Directory the chunk files are written to.
+        chunk_seconds (float): Nominal chunk length. 0 disables splitting.
+        overlap_seconds (float): Audio shared between neighbouring chunks.
+    Returns:
+        list: (chunk path, start offset in seconds) tuples. A single entry with the original
+        file is returned when it is short enough or cannot be split.
+    """
+    if not chunk_seconds or chunk_seconds <= 0:
+        return [(file_path, 0.0)]
+    wav_path = file_path
+    if not file_path.lower().endswith('.wav'):
+        wav_path = _convert_to_wav(file_path, out_dir)
+        if wav_path is None:
+            log.info(f"Not splitting {file_path}: only WAV can be split without ffmpeg")
+            return [(file_path, 0.0)]
+    try:
+        wf = wave.open(wav_path, 'rb')
+    except (wave.Error, EOFError) as e:
+        log.info(f"Not splitting {file_path}: {e}")
+        return [(file_path, 0.0)]
+    with wf:
+        rate = wf.getframerate()
+        total = wf.getnframes()
+        chunk_frames = int(chunk_seconds * rate)
+        if total <= chunk_frames:
+            return [(file_path, 0.0)]
+        overlap = int(overlap_seconds * rate)
+        window = max(1, rate // 10)
+        search = int(SILENCE_SEARCH_SECONDS * rate)
+        base = os.path.splitext(os.path.basename(file_path))[0]
+        chunks = []
+        start = 0
+        while True:
+            end = start + chunk_frames
+            if total - end < chunk_frames // 10:
+                # Fold a short remainder into the last chunk
+                end = total
+            else:
+                lo = max(start + overlap + window, end - search)
+                energies = _frame_energies(wf, lo, end - lo, window)
+                if energies:
+                    # Quietest window, preferring the one closest to the nominal end
+                    quietest = min(reversed(energies), key=lambda e: e[1])[0]
+                    end = min(quietest + window // 2, total)
+            chunk_path = os.path.join(out_dir, f"{base}_chunk{len(chunks):03d}.wav")
+            with wave.open(chunk_path, 'wb') as out:
+                out.setnchannels(wf.getnchannels())
+                out.setsampwidth(wf.getsampwidth())
+                out.setframerate(rate)
+                wf.setpos(start)
+                remaining = end - start
+                while remaining > 0:
+                    data = wf.readframes(min(remaining, rate * 10))
+                    if not data:
+                        break
+                    out.writeframes(data)
+                    remaining -= len(data) // (wf.getsampwidth() * wf.getnchannels())
+            chunks.append((chunk_path, start / rate))
+            if end >= total:
+                break
+            start = end - overlap
+    return chunks
+
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def _normalize_word(word):
+    return _NON_WORD.sub('', word.lower())
+
+
+def find_overlap(tail, head, max_overlap_words=30):
+    """
+    Find the words repeated between the end of one text and the start of the next.
+
+    The longest common run of (normalized) words that touches both edges is taken as the
+    overlap.
+
+    Args:
+        tail (list): Last words of the earlier text (at most max_overlap_words).
+        head (list): First words of the later text (at most max_overlap_words).
+        max_overlap_words (int): Size of the compared edges.
+    Returns:
+        tuple: (words of tail to keep, words of head to skip), or None if there is no overlap.
+    """
+    tail = [_normalize_word(w) for w in tail]
+    head = [_normalize_word(w) for w in head]
+    match = difflib.SequenceMatcher(None, tail, head, autojunk=False).find_longest_match(
+        0, len(tail), 0, len(head))
+    slack = max_overlap_words // 3
+    at_edges = match.b == 0 and match.a + match.size == len(tail)
+    near_edges = match.b <= slack and len(tail) - (match.a + match.size) <= slack
+    if match.size and (at_edges or (match.size >= 2 and near_edges)):
+        return match.a + match.size, match.b + match.size
+    return None
+
+
+def stitch_transcripts(texts, max_overlap_words=30):
+    """
+    Join per-chunk transcripts into one, dropping the words repeated in the chunk overlaps.
+
+    The end of the text so far is matched against the start of the next chunk; the longest
+    common run of words that touches both edges is treated as the overlap and kept once.
+
+    Args:
+        texts (list): Transcripts of consecutive chunks, in order.
+        max_overlap_words (int): How many words at each edge to compare.
+    Returns:
+        str: The stitched transcript.
+    """
+    words = []
+    for text in texts:
+        if not text:
+            continue
+        new = text.split()
+        if words:
+            tail = words[-max_overlap_words:]
+            overlap = find_overlap(tail, new[:max_overlap_words], max_overlap_words)
+            if overlap:
+                keep, skip = overlap
+                words = words[:len(words) - len(tail) + keep]
+                new = new[skip:]
+        words.extend(new)
+    return ' '.join(words)
+
+
+def stitch_results(parts, chunks, overlap_seconds=CHUNK_OVERLAP_SECONDS, max_overlap_words=30):
+    """
+    Join the per-chunk Transcripts of one provider into one for the whole recording.
+
+    The text is stitched with stitch_transcripts. Word times are moved to the timeline of
+    the recording; in each overlap the earlier chunk keeps the words that start in its
+    first half and the later chunk the rest. Failed chunks are left out, making the
+    result 'partial' (or 'error' if every chunk failed). Stage timings are added up,
+    except 'total', which is that of the slowest chunk.
+
+    Args:
+        parts (list): Transcripts of consecutive chunks, in order.
+        chunks (list): (chunk path, start offset) tuples from split_audio.
+        overlap_seconds (float): Audio shared between neighbouring chunks.
+        max_overlap_words (int): How many words at each edge to compare.
+    Returns:
+        Transcript: The stitched result.
+    """
+    provider = parts[0].provider if parts else None
+    errors = '; '.join(dict.fromkeys(part.error or 'failed' for part in parts if not part.ok)) or None
+    timings = {}
+    for part in parts:
+        for stage, seconds in part.timings.items():
+            timings[stage] = max(timings.get(stage, 0.0), seconds) if stage == 'total' else timings.get(stage, 0.0) + seconds
+    good = [(k, part) for k, part in enumerate(parts) if part.ok]
+    if not good:
+        result = Transcript.failed(provider, errors or "no result")
+        result.timings = timings
+        return result
+    if len(parts) == 1:
+        return parts[0]
+    text = stitch_transcripts([part.text for _, part in good], max_overlap_words)
+    words, starts, ends, confidences = [], [], [], []
+    if all(part.timed for _, part in good if part.words):
+        scored = all(len(part.confidences) == len(part.words) for _, part in good)
+        for k, part in good:
+            offset = chunks[k][1]
+            low = offset + overlap_seconds / 2 if k > 0 else float('-inf')
+            high = chunks[k + 1][1] + overlap_seconds / 2 if k + 1 < len(chunks) else float('inf')
+            for n, word in enumerate(part.words):
+                start = part.starts[n] + offset
+                if low <= start < high:
+                    words.append(word)
+                    starts.append(start)
+                    ends.append(part.ends[n] + offset)
+                    if scored:
+                        confidences.append(part.confidences[n])
+    return Transcript(provider, text, words, starts, ends, confidences,
+                      'partial' if errors else 'ok', errors, timings)
+
+
+# === ROVER ===
+
+def _longest_increasing(pairs):
+    """Longest subsequence of (i, j) pairs (sorted by i) whose j also increases."""
+    tails, tail_idx, prev = [], [], [None] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        pos = bisect.bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_idx.append(k)
+        else:
+            tails[pos] = j
+            tail_idx[pos] = k
+        prev[k] = tail_idx[pos - 1] if pos else None
+    out = []
+    k = tail_idx[-1] if tail_idx else None
+    while k is not None:
+        out.append(pairs[k])
+        k = prev[k]
+    return out[::-1]
+
+
+def align_words(a, b, anchor=3):
+    """
+    Align two word sequences, like difflib.SequenceMatcher.get_opcodes but fast on long texts.
+
+    Word n-grams that occur exactly once in both sequences are used as anchors (the
+    longest run of them in the same order); only the short gaps between anchors are
+    aligned with difflib.
+
+    Args:
+        a (list): First sequence.
+        b (list): Second sequence.
+        anchor (int): Length of the anchoring n-grams.
+    Returns:
+        list: (tag, i1, i2, j1, j2) opcodes as returned by get_opcodes.
+    """
+    def unique_ngrams(seq):
+        seen = {}
+        for i in range(len(seq) - anchor + 1):
+            gram = tuple(seq[i:i + anchor])
+            seen[gram] = None if gram in seen else i
+        return seen
+
+    grams_a, grams_b = unique_ngrams(a), unique_ngrams(b)
+    pairs = sorted((i, grams_b[g]) for g, i in grams_a.items()
+                   if i is not None and grams_b.get(g) is not None)
+    opcodes = []
+
+    def add(tag, i1, i2, j1, j2):
+        if i1 == i2 and j1 == j2:
+            return
+        if opcodes and opcodes[-1][0] == tag == 'equal' and opcodes[-1][2] == i1 and opcodes[-1][4] == j1:
+            opcodes[-1] = (tag, opcodes[-1][1], i2, opcodes[-1][3], j2)
+        else:
+            opcodes.append((tag, i1, i2, j1, j2))
+
+    def gap(i1, i2, j1, j2):
+        if i1 == i2 or j1 == j2:
+            add('delete' if i1 < i2 else 'insert', i1, i2, j1, j2)
+            return
+        for tag, x1, x2, y1, y2 in difflib.SequenceMatcher(None, a[i1:i2], b[j1:j2], autojunk=False).get_opcodes():
+            add(tag, i1 + x1, i1 + x2, j1 + y1, j1 + y2)
+
+    pi = pj = 0
+    for i, j in _longest_increasing(pairs):
+        if i < pi or j < pj:
+            # Overlaps the previous anchor: extend the match if it continues it
+            if i - pi == j - pj and i + anchor > pi:
+                add('equal', pi, i + anchor, pj, j + anchor)
+                pi, pj = i + anchor, j + anchor
+            continue
+        gap(pi, i, pj, j)
+        add('equal', i, i + anchor, j, j + anchor)
+        pi, pj = i + anchor, j + anchor
+    gap(pi, len(a), pj, len(b))
+    return opcodes
+
+
+def word_agreement(a, b):
+    """
+    Share of the words two texts have in common after alignment, from 0 to 1.
+
+    Args:
+        a (str): First text.
+        b (str): Second text.
+    Returns:
+        float: Matched words times two over the total number of words.
+    """
+    a = [w for w in map(_normalize_word, a.split()) if w]
+    b = [w for w in map(_normalize_word, b.split()) if w]
+    if not a or not b:
+        return 1.0 if a == b else 0.0
+    matched = sum(i2 - i1 for tag, i1, i2, _, _ in align_words(a, b) if tag == 'equal')
+    return 2.0 * matched / (len(a) + len(b))
+
+
+def rover_combine(transcripts, weights=None):
+    """
+    Combine transcripts offline by word-level voting (ROVER).
+
+    The transcripts are aligned one by one into a word transition network: a list of
+    slots, each holding the words the providers put at that position. Each transcript is
+    aligned against the network's current best path with align_words, which is close to
+    linear for similar texts, so hours of text take about a second. Every slot is
+    then decided by a weighted vote in which "no word" is a candidate too, so words
+    only a minority of providers heard are dropped.
+
+    Args:
+        transcripts (list): (provider name, text) tuples, or (provider name, words,
+            confidences) tuples when word confidences are known.
+        weights (dict): Optional vote weight per provider name (default 1.0).
+    Returns:
+        str: The consensus transcript.
+    """
+    weights = weights or {}
+    hypotheses = []
+    for item in transcripts:
+        name, words = item[0], item[1]
+        if isinstance(words, str):
+            words = words.split()
+        confidences = item[2] if len(item) > 2 and item[2] is not None else [1.0] * len(words)
+        if words:
+            hypotheses.append((name, list(words), list(confidences)))
+    if not hypotheses:
+        return ''
+    # Start from the most trusted, longest hypothesis
+    hypotheses.sort(key=lambda h: (weights.get(h[0], 1.0), len(h[1])), reverse=True)
+    total_weight = 0.0
+    # Each slot: {normalized word: [score, {surface form: score}]}
+    slots = []
+    for name, words, confidences in hypotheses:
+        weight = float(weights.get(name, 1.0))
+        total_weight += weight
+        norm = [_normalize_word(w) for w in words]
+        reference = [max(slot, key=lambda k: slot[k][0]) for slot in slots]
+        opcodes = align_words(reference, norm)
+        new_slots = []
+
+        def vote(slot, j):
+            entry = slot.setdefault(norm[j], [0.0, {}])
+            score = weight * confidences[j]
+            entry[0] += score
+            entry[1][words[j]] = entry[1].get(words[j], 0.0) + score
+
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == 'equal':
+                for i, j in zip(range(i1, i2), range(j1, j2)):
+                    vote(slots[i], j)
+                    new_slots.append(slots[i])
+            elif tag == 'delete':
+                new_slots.extend(slots[i1:i2])
+            elif tag == 'insert':
+                for j in range(j1, j2):
+                    slot = {}
+                    vote(slot, j)
+                    new_slots.append(slot)
+            else:
+                # replace: pair up in order, extra words become new slots
+                paired = min(i2 - i1, j2 - j1)
+                for k in range(paired):
+                    vote(slots[i1 + k], j1 + k)
+                    new_slots.append(slots[i1 + k])
+                new_slots.extend(slots[i1 + paired:i2])
+                for j in range(j1 + paired, j2):
+                    slot = {}
+                    vote(slot, j)
+                    new_slots.append(slot)
+        slots = new_slots
+    out = []
+    for slot in slots:
+        word, (score, forms) = max(slot.items(), key=lambda item: item[1][0])
+        # "No word" gets the weight of everyone who did not put a word here
+        if score >= total_weight - sum(entry[0] for entry in slot.values()):
+            out.append(max(forms, key=forms.get))
+    return ' '.join(out)
+
+
+def rover_hypothesis(result):
+    """
+    Return a Transcript as a rover_combine input: its words with their confidences, where
+    the provider returned them, so they scale its votes; else its text.
+    """
+    if not result.words:
+        return result.provider, result.text
+    return result.provider, result.words, result.confidences if len(result.confidences) == len(result.words) else None
+
+
+class ProviderLimiter:
+    """
+    Paces calls to one provider so they stay under its quotas instead of running into them.
+
+    Requests per minute and audio minutes per hour are enforced over sliding windows, so
+    the provider gets the highest rate its quota allows; concurrent caps the number of
+    calls in progress. When the provider still answers 429, throttled() pauses new calls.
+
+    Args:
+        name (str): Provider name, used in messages.
+        requests_per_minute (float): Maximum calls started in any 60 seconds.
+        concurrent (int): Maximum calls in progress at once.
+        audio_minutes_per_hour (float): Maximum minutes of audio sent in any hour.
+    """
+
+    def __init__(self, name, requests_per_minute=None, concurrent=None, audio_minutes_per_hour=None):
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.concurrent = concurrent
+        self.audio_minutes_per_hour = audio_minutes_per_hour
+        self._cond = threading.Condition()
+        self._requests = collections.deque()
+        self._audio = collections.deque()
+        self._active = 0
+        self._paused_until = 0.0
+
+    def _wait_time(self, now, minutes):
+        """Seconds until a call with this much audio may start; None means until a call ends."""
+        while self._requests and self._requests[0] <= now - 60:
+            self._requests.popleft()
+        while self._audio and self._audio[0][0] <= now - 3600:
+            self._audio.popleft()
+        if self.concurrent and self._active >= self.concurrent:
+            return None
+        wait = self._paused_until - now
+        if self.requests_per_minute and len(self._requests) >= self.requests_per_minute:
+            wait = max(wait, self._requests[0] + 60 - now)
+        if self.audio_minutes_per_hour and self._audio:
+            used = sum(m for _, m in self._audio)
+            if used + minutes > self.audio_minutes_per_hour:
+                wait = max(wait, self._audio[0][0] + 3600 - now)
+        return wait
+
+    @contextlib.contextmanager
+    def slot(self, audio_minutes=0.0):
+        """Block until a call may start, and hold its place while the with-block runs."""
+        self.acquire(audio_minutes)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self, audio_minutes=0.0):
+        """Block until a call may start and count it as in progress until release()."""
+        announced = False
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = self._wait_time(now, audio_minutes)
+                if wait is not None and wait <= 0:
+                    break
+                if not announced and (wait is None or wait > 1):
+                    log.debug(f"{self.name}: pacing to stay within rate limits")
+                    announced = True
+                self._cond.wait(wait)
+            self._active += 1
+            self._requests.append(now)
+            if audio_minutes:
+                self._audio.append((now, audio_minutes))
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def throttled(self, delay):
+        """Pause new calls for delay seconds (the provider answered 429)."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def provider_limiter(name):
+    """
+    Return the ProviderLimiter of a provider, configured from 'rate_limits'[name] (else the
+    limits it was registered with) and 'provider_concurrency'[name].
+
+    Returns:
+        ProviderLimiter: The shared limiter, or None if the provider has no limits.
+    """
+    with _limiters_lock:
+        if name not in _limiters:
+            rate_limits = config.get('rate_limits') or {}
+            spec = PROVIDERS.get(name)
+            limits = dict(rate_limits[name] if name in rate_limits else spec.limits if spec else {})
+            limits = {key: value for key, value in limits.items() if value}
+            concurrency = (config.get('provider_concurrency') or {}).get(name)
+            if concurrency and not limits.get('concurrent'):
+                limits['concurrent'] = concurrency
+            _limiters[name] = ProviderLimiter(name, **limits) if any(limits.values()) else None
+        return _limiters[name]
+
+
+def audio_minutes(file_path):
+    """Return the length of a WAV file in minutes, or 0.0 if it cannot be read."""
+    try:
+        with wave.open(file_path, 'rb') as wf:
+            return wf.getnframes() / float(wf.getframerate()) / 60
+    except (wave.Error, EOFError, OSError):
+        return 0.0
+
+
+class ProviderStats:
+    """
+    History of the providers across runs, kept in a small JSON file.
+
+    For every successful call the seconds it took per minute of audio are stored, for
+    every call whether it succeeded, and for every file how well the provider's transcript
+    agreed with the combined one; the last STATS_SAMPLES of each per provider. Race mode
+    uses it to decide when a provider is late, selective mode to choose providers.
+
+    Args:
+        path (str): Location of the JSON file.
+    """
+
+    def __init__(self, path=STATS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError) as e:
+                log.error(f"Could not read provider stats {path}: {e}")
+
+    def record(self, name, seconds, minutes):
+        """Store the latency of one successful call with this many minutes of audio."""
+        if minutes <= 0:
+            return
+        with self._lock:
+            samples = self._data.setdefault(name, {}).setdefault('latency_per_minute', [])
+            samples.append(round(seconds / minutes, 3))
+            del samples[:-STATS_SAMPLES]
+
+    def record_outcome(self, name, ok):
+        """Store whether a call succeeded."""
+        self._append(name, 'outcomes', 1 if ok else 0)
+
+    def record_agreement(self, name, agreement):
+        """Store the word agreement (0 to 1) of a provider's transcript with the combined one."""
+        self._append(name, 'agreement', round(agreement, 3))
+
+    def _append(self, name, key, value):
+        with self._lock:
+            samples = self._data.setdefault(name, {}).setdefault(key, [])
+            samples.append(value)
+            del samples[:-STATS_SAMPLES]
+
+    def _mean(self, name, key):
+        with self._lock:
+            samples = list(self._data.get(name, {}).get(key, []))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return sum(samples) / len(samples)
+
+    def failure_rate(self, name):
+        """Fraction of the provider's calls that failed, or None while there are fewer than HEDGE_MIN_SAMPLES."""
+        success = self._mean(name, 'outcomes')
+        return None if success is None else 1.0 - success
+
+    def agreement(self, name):
+        """Average agreement with the combined transcripts, or None while there are fewer than HEDGE_MIN_SAMPLES."""
+        return self._mean(name, 'agreement')
+
+    def latency(self, name, percentile, minutes):
+        """
+        Estimate a percentile of the provider's latency for this many minutes of audio.
+
+        Returns:
+            float: Seconds, or None while there are fewer than HEDGE_MIN_SAMPLES latencies.
+        """
+        with self._lock:
+            samples = sorted(self._data.get(name, {}).get('latency_per_minute', []))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        rank = min(len(samples), max(1, math.ceil(percentile / 100 * len(samples))))
+        return samples[rank - 1] * minutes
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._data, f)
+            os.replace(tmp_path, self.path)
+
+
+_provider_stats = None
+_provider_stats_lock = threading.Lock()
+
+
+def provider_stats():
+    """Return the shared ProviderStats, stored in 'stats_file'."""
+    global _provider_stats
+    with _provider_stats_lock:
+        if _provider_stats is None:
+            _provider_stats = ProviderStats(config.get('stats_file') or STATS_FILE)
+        return _provider_stats
+
+
+def _call_provider(func, name, file_path, variants, cancel=None, submitted=None):
+    started = time.monotonic()
+    _call_state.cancel = cancel
+    try:
+        with span('provider_call', provider=name, chunk=os.path.basename(file_path)) as attributes:
+            check_cancelled()
+            limiter = provider_limiter(name)
+            minutes = audio_minutes(file_path) if limiter else 0.0
+            if variants is not None:
+                file_path = variants.get(file_path, provider_codec(name))
+            if limiter is None:
+                result = func(file_path)
+            else:
+                limiter.acquire(minutes)
+                try:
+                    check_cancelled()
+                    result = func(file_path)
+                except BaseException:
+                    limiter.release()
+                    raise
+                if isinstance(result, AsyncJob):
+                    # A submitted job is in progress at the provider until the job engine is done with it
+                    result.release = limiter.release
+                else:
+                    limiter.release()
+            attributes['status'] = 'submitted' if isinstance(result, AsyncJob) else getattr(result, 'status', 'ok')
+    finally:
+        _call_state.cancel = None
+    if not isinstance(result, AsyncJob):
+        result = as_transcript(name, result)
+    result.timings['queue'] = started - (submitted or started)
+    result.timings['request'] = time.monotonic() - started
+    return result
+
+
+def _abandon(future):
+    # Done callback of a provider call that finished after it was cancelled
+    try:
+        result = future.result()
+    except Exception:
+        return
+    if isinstance(result, AsyncJob):
+        JobEngine.cancel_remote(result)
+        result.finish()
+
+
+class ChunkDispatch:
+    """
+    Runs the (provider, chunk) jobs of one file and reports every provider once all of its
+    chunks are done.
+
+    Providers are started one at a time with start(), so some can be held back (see
+    race_chunks). Provider functions may return an AsyncJob (see the submit_* functions);
+    those are handed to the job engine, so the executor thread is free again as soon as
+    the upload is done. Every result is a Transcript with its stage timings. Pairs found
+    in the cache are not submitted at all, and successful results are stored, with their
+    latency in stats. Calls run in a copy of the caller's context, so their spans nest in
+    the caller's, and the wait for async jobs is recorded as a span of its own. cancel() abandons the jobs that are
+    still running: queued calls are dropped, running calls stop at their next request
+    and remote jobs are cancelled.
+
+    Args:
+        executor (concurrent.futures.Executor): Executor to run the jobs on.
+        providers (list): (name, function) tuples.
+        chunks (list): (chunk path, start offset) tuples from split_audio.
+        cache (TranscriptCache): Optional cache of earlier results.
+        variants (AudioVariants): Optional; if given, every provider gets the chunk encoded
+            with its codec (see provider_codec).
+        on_chunk (callable): Optional; called with (provider index, chunk index, result)
+            for every finished chunk, including cached ones.
+        stats (ProviderStats): Optional latency history to add to.
+    """
+
+    def __init__(self, executor, providers, chunks, cache=None, variants=None, on_chunk=None, stats=None):
+        self.executor = executor
+        self.providers = providers
+        self.chunks = chunks
+        self.cache = cache
+        self.variants = variants
+        self.on_chunk = on_chunk
+        self.stats = stats
+        self.running = set()
+        self._pending = {}
+        self._job_spans = {}
+        self._cancels = {}
+        self._results = [[None] * len(chunks) for _ in providers]
+        self._remaining = [len(chunks)] * len(providers)
+        self._ready = []
+        self._cache_keys = {}
+        self._hashes = [audio_hash(chunk_path) for chunk_path, _ in chunks] if cache else []
+
+    def start(self, idx):
+        """Submit all chunks of a provider."""
+        name, func = self.providers[idx]
+        log.debug(f"Starting transcription with {name}...")
+        self.running.add(idx)
+        cancel = self._cancels[idx] = threading.Event()
+        submitted = time.monotonic()
+        cached_all = True
+        for chunk_idx, (chunk_path, _) in enumerate(self.chunks):
+            if self.cache:
+                key = self._cache_keys[idx, chunk_idx] = provider_cache_key(self._hashes[chunk_idx], name)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    result = Transcript.from_dict(cached) if isinstance(cached, dict) else Transcript(name, cached)
+                    result.provider = name
+                    metrics.inc('transcriber_provider_results_total', provider=name, status='cached')
+                    self._finish(idx, chunk_idx, result)
+                    continue
+            cached_all = False
+            future = self.executor.submit(contextvars.copy_context().run, _call_provider,
+                                          func, name, chunk_path, self.variants, cancel, submitted)
+            self._pending[future] = (idx, chunk_idx, submitted, None)
+        if cached_all and self.chunks:
+            log.debug(f"{name}: using cached result")
+
+    def _finish(self, idx, chunk_idx, result):
+        self._results[idx][chunk_idx] = result
+        if self.on_chunk:
+            self.on_chunk(idx, chunk_idx, result)
+        self._remaining[idx] -= 1
+        if self._remaining[idx] == 0:
+            self.running.discard(idx)
+            self._ready.append(idx)
+
+    def wait(self, timeout=None):
+        """
+        Wait until at least one more provider is done.
+
+        Returns:
+            list: (provider index, list of per-chunk Transcripts) tuples; empty when the
+            timeout passed or nothing is running. Exceptions are turned into failed results.
+        """
+        import concurrent.futures
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._ready and self._pending:
+            left = None if deadline is None else deadline - time.monotonic()
+            if left is not None and left <= 0:
+                break
+            done, _ = concurrent.futures.wait(self._pending, timeout=left,
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                idx, chunk_idx, submitted, job = self._pending.pop(future)
+                name = self.providers[idx][0]
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    result = Transcript.failed(name, f"Exception: {exc}")
+                    log.error(f"Exception from {name}: {exc}")
+                if isinstance(result, AsyncJob):
+                    log.debug(f"{name} job {result.job_id} submitted, waiting for completion...")
+                    job_future = job_engine().submit(result)
+                    self._pending[job_future] = (idx, chunk_idx, submitted, result)
+                    self._job_spans[job_future] = (time.time_ns(), _current_span.get())
+                    continue
+                result = as_transcript(name, result)
+                result.provider = name
+                if job is not None:
+                    result.timings.update(job.timings)
+                result.timings['total'] = time.monotonic() - submitted
+                if job is not None:
+                    result.timings['job'] = result.timings['total'] - sum(job.timings.values())
+                    start_ns, parent = self._job_spans.pop(future)
+                    record_span('provider_job', start_ns, time.time_ns(), parent,
+                                {'provider': name, 'job_id': job.job_id, 'status': result.status}, result.error)
+                metrics.inc('transcriber_provider_results_total', provider=name, status=result.status)
+                if self.stats:
+                    self.stats.record_outcome(name, result.ok)
+                for stage, seconds in result.timings.items():
+                    metrics.observe('transcriber_provider_seconds', seconds, provider=name, stage=stage)
+                if len(self.chunks) > 1:
+                    log.debug(f"{name} finished chunk {chunk_idx + 1}/{len(self.chunks)}")
+                if result.ok:
+                    if self.cache:
+                        entry = result.to_dict()
+                        entry.pop('timings', None)
+                        self.cache.put(self._cache_keys[idx, chunk_idx], entry)
+                    if self.stats:
+                        self.stats.record(name, time.monotonic() - submitted,
+                                          audio_minutes(self.chunks[chunk_idx][0]))
+                self._finish(idx, chunk_idx, result)
+        ready, self._ready = self._ready, []
+        return [(idx, self._results[idx]) for idx in ready]
+
+    def cancel(self):
+        """Abandon every provider that is still running."""
+        for idx in self.running:
+            self._cancels[idx].set()
+        for future in self._pending:
+            if not future.cancel():
+                future.add_done_callback(_abandon)
+        self._pending.clear()
+        self._job_spans.clear()
+        self.running.clear()
+
+
+def transcribe_chunks(executor, providers, chunks, cache=None, variants=None, on_chunk=None, stats=None):
+    """
+    Submit every (provider, chunk) pair to the executor as its own job (see ChunkDispatch).
+
+    Yields:
+        tuple: (provider index, list of per-chunk Transcripts), as soon as every chunk of
+        that provider is done.
+    """
+    dispatch = ChunkDispatch(executor, providers, chunks, cache, variants, on_chunk, stats)
+    try:
+        for idx in range(len(providers)):
+            dispatch.start(idx)
+        while True:
+            finished = dispatch.wait()
+            if not finished:
+                return
+            yield from finished
+    finally:
+        dispatch.cancel()
+
+
+def race_chunks(executor, providers, chunks, quorum, deadline=None, backups=(),
+                hedge_percentile=HEDGE_PERCENTILE, hedge_after=None,
+                cache=None, variants=None, on_chunk=None, stats=None):
+    """
+    Like transcribe_chunks, but stop as soon as quorum providers returned a good transcript.
+
+    The providers named in backups are held back. One of them is started when too few
+    providers are left to reach the quorum (e.g. one failed), or when a provider is still
+    running after its hedge delay: the hedge_percentile of its past latencies in stats for
+    this much audio, or hedge_after seconds while there is no history yet. At the deadline
+    the race ends with whatever has finished. Everything still running at the end is
+    cancelled, so the run takes as long as the fastest providers, not the slowest.
+
+    Args:
+        quorum (int): Number of successful providers to wait for.
+        deadline (float): Optional hard limit in seconds.
+        backups (list): Names of the providers to hold back.
+        hedge_percentile (float): Percentile of the latency history used as hedge delay.
+        hedge_after (float): Hedge delay in seconds for providers without history.
+        Other arguments as for transcribe_chunks.
+    Yields:
+        tuple: (provider index, list of per-chunk Transcripts) for every provider that
+        finished in time, successful or not.
+    """
+    dispatch = ChunkDispatch(executor, providers, chunks, cache, variants, on_chunk, stats)
+    reserve = [idx for idx, (name, _) in enumerate(providers) if name in backups]
+    minutes = max((audio_minutes(chunk_path) for chunk_path, _ in chunks), default=0.0)
+    end = time.monotonic() + deadline if deadline else None
+    hedges = {}
+    good = 0
+
+    def launch(idx):
+        dispatch.start(idx)
+        delay = stats.latency(providers[idx][0], hedge_percentile, minutes) if stats else None
+        if delay is None:
+            delay = hedge_after
+        if delay is not None:
+            hedges[idx] = time.monotonic() + delay
+
+    try:
+        for idx in range(len(providers)):
+            if idx not in reserve:
+                launch(idx)
+        while True:
+            while reserve and good + len(dispatch.running) < quorum:
+                idx = reserve.pop(0)
+                log.info(f"Starting backup provider {providers[idx][0]}")
+                launch(idx)
+            wakeups = [end] if end else []
+            if reserve:
+                wakeups += [at for idx, at in hedges.items() if idx in dispatch.running]
+            finished = dispatch.wait(max(0.0, min(wakeups) - time.monotonic()) if wakeups else None)
+            for idx, chunk_results in finished:
+                if all(r.ok for r in chunk_results):
+                    good += 1
+                yield idx, chunk_results
+                if good >= quorum:
+                    log.info(f"Quorum of {quorum} reached, not waiting for the other providers")
+                    return
+            if not finished and not dispatch.running:
+                return
+            now = time.monotonic()
+            if end and now >= end:
+                log.error(f"Deadline of {deadline}s reached with {good} of {quorum} transcripts")
+                return
+            for idx, at in list(hedges.items()):
+                if at <= now and idx in dispatch.running and reserve:
+                    del hedges[idx]
+                    backup = reserve.pop(0)
+                    log.info(f"{providers[idx][0]} is slower than usual, hedging with {providers[backup][0]}")
+                    launch(backup)
+    finally:
+        if dispatch.running:
+            names = ', '.join(providers[idx][0] for idx in sorted(dispatch.running))
+            log.info(f"Cancelling {names}")
+        dispatch.cancel()
+
+
+def rank_providers(providers, stats, minutes):
+    """
+    Order the providers from most to least promising, by their history in stats.
+
+    Providers with too little history come first, so all of them get measured. The others
+    are ordered by their average agreement with the combined transcripts times their
+    success rate, and then by their median latency.
+
+    Args:
+        providers (list): (name, function) tuples.
+        stats (ProviderStats): Provider history.
+        minutes (float): Audio per call, for the latency estimate.
+    Returns:
+        list: (provider index, expected seconds or None) tuples.
+    """
+    ranked = []
+    for idx, (name, _) in enumerate(providers):
+        agreement, failures = stats.agreement(name), stats.failure_rate(name)
+        seconds = stats.latency(name, 50, minutes)
+        if agreement is None or failures is None:
+            score = 2.0
+        else:
+            score = agreement * (1.0 - failures)
+        ranked.append((-score, seconds if seconds is not None else 0.0, idx, seconds))
+    ranked.sort()
+    return [(idx, seconds) for _, _, idx, seconds in ranked]
+
+
+def select_chunks(executor, providers, chunks, start=SELECT_START, agreement=SELECT_AGREEMENT,
+                  budget_seconds=None, budget_cost=None, costs=None, explore=SELECT_EXPLORE,
+                  cache=None, variants=None, on_chunk=None, stats=None):
+    """
+    Like transcribe_chunks, but only call as many providers as needed.
+
+    The start best providers by rank_providers are started, skipping those whose median
+    latency for this much audio exceeds budget_seconds and those that would take the
+    total price past budget_cost. With chance explore one other provider is started too,
+    to keep its history up to date. When they are done, the run ends if two of the
+    transcripts agree on at least the agreement share of their words (see word_agreement),
+    or if start is 1 and it succeeded. Otherwise the next provider within the cost budget
+    is started, until the transcripts agree or no provider is left.
+
+    Args:
+        start (int): Number of providers to start with.
+        agreement (float): Word agreement at which two transcripts are trusted.
+        budget_seconds (float): Optional latency budget per file in seconds.
+        budget_cost (float): Optional price budget per file.
+        costs (dict): Price per audio minute by provider name (default 0).
+        explore (float): Chance of starting one extra provider.
+        stats (ProviderStats): Provider history; required.
+        Other arguments as for transcribe_chunks.
+    Yields:
+        tuple: (provider index, list of per-chunk Transcripts) for every provider started.
+    """
+    if not providers:
+        log.error("No providers to choose from")
+        return
+    costs = costs or {}
+    dispatch = ChunkDispatch(executor, providers, chunks, cache, variants, on_chunk, stats)
+    minutes = sum(audio_minutes(chunk_path) for chunk_path, _ in chunks)
+    ranked = rank_providers(providers, stats, max((audio_minutes(c) for c, _ in chunks), default=0.0))
+    price = {idx: float(costs.get(providers[idx][0], 0.0)) * minutes for idx, _ in ranked}
+    spent = 0.0
+    texts = {}
+
+    def affordable(idx):
+        return budget_cost is None or spent + price[idx] <= budget_cost
+
+    def launch(idx, reason):
+        nonlocal spent
+        spent += price[idx]
+        metrics.inc('transcriber_provider_selected_total', provider=providers[idx][0], reason=reason)
+        dispatch.start(idx)
+
+    first = []
+    for idx, seconds in ranked:
+        if len(first) >= start:
+            break
+        if budget_seconds and seconds is not None and seconds > budget_seconds:
+            log.debug(f"Skipping {providers[idx][0]}: usually takes {seconds:.0f}s for this file")
+            continue
+        if affordable(idx):
+            first.append(idx)
+            spent += price[idx]
+    if not first:
+        first = [ranked[0][0]]
+        log.info(f"No provider fits the budget, starting {providers[first[0]][0]}")
+    spent = 0.0
+    reserve = [idx for idx, _ in ranked if idx not in first]
+    for idx in first:
+        launch(idx, 'start')
+    if reserve and random.random() < explore:
+        idx = random.choice(reserve)
+        if affordable(idx):
+            reserve.remove(idx)
+            log.debug(f"Also starting {providers[idx][0]} to keep its statistics current")
+            launch(idx, 'explore')
+    log.info(f"Starting {', '.join(providers[idx][0] for idx in sorted(dispatch.running))}")
+
+    try:
+        while True:
+            for idx, chunk_results in dispatch.wait():
+                if all(r.ok for r in chunk_results):
+                    texts[idx] = ' '.join(r.text for r in chunk_results)
+                yield idx, chunk_results
+            if dispatch.running:
+                continue
+            best = max((word_agreement(texts[a], texts[b]) for a, b in itertools.combinations(texts, 2)),
+                       default=None)
+            if best is not None and best >= agreement:
+                log.info(f"Transcripts agree on {best:.0%} of their words, not calling other providers")
+                return
+            if best is None and texts and start <= 1:
+                return
+            candidates = [idx for idx in reserve if affordable(idx)]
+            if not candidates:
+                if reserve:
+                    log.info("Cost budget reached, not calling other providers")
+                return
+            idx = candidates[0]
+            reserve.remove(idx)
+            reason = f"agree on only {best:.0%} of their words" if best is not None else "are too few"
+            log.info(f"Transcripts {reason}, adding {providers[idx][0]}")
+            launch(idx, 'escalate')
+    finally:
+        dispatch.cancel()
+
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.ogg', '.opus', '.m4a', '.mp4', '.webm')
+JOURNAL_FILE = os.path.join('recordings', 'batch_journal.jsonl')
+RESULTS_FILE = 'results.jsonl'  # Structured results sidecar in every run directory
+BATCH_WORKERS = 2  # Files transcribed at the same time in batch mode
+COMBINE_WORKERS = 4  # Windows merged by ChatGPT at the same time
+DEFAULT_COMBINE_PROMPT = "dit zijn verschillende transcripties van 1 opname van een DND sessie. maak er 1 coherente transcriptie van"
+DEFAULT_POLISH_PROMPT = "Dit is een automatisch samengestelde transcriptie van een DND sessie. Verbeter alleen duidelijke fouten in spelling, grammatica en interpunctie. Vat niets samen en voeg niets toe."
+COMBINE_METHODS = ('gpt', 'rover', 'rover+gpt')
+
+
+def not_empty(val):
+    return val is not None and str(val).strip() != ''
+
+
+def enabled_providers(names=None):
+    """
+    Select the registered providers whose config keys are set in config.json.
+
+    Args:
+        names (list): Only consider these providers; defaults to 'providers' from
+            config.json, else every provider registered as a default one.
+    Returns:
+        list: (name, function) tuples.
+    """
+    names = names or config.get('providers')
+    for name in names or ():
+        if name not in PROVIDERS:
+            log.error(f"Unknown provider '{name}' (known: {', '.join(PROVIDERS)})")
+    providers = []
+    for spec in PROVIDERS.values():
+        if (spec.name not in names) if names else not spec.default:
+            continue
+        missing = spec.missing_keys()
+        if missing:
+            log.info(f"Skipping {spec.name} (missing {', '.join(missing)})")
+            continue
+        log.info(f"Using {spec.name} provider")
+        providers.append((spec.name, spec.func))
+    return providers
+
+
+class BatchJournal:
+    """
+    Append-only JSON Lines record of finished work in a batch.
+
+    Every finished provider result and every finished file is appended as one line, so an
+    interrupted batch can be restarted and skips whatever was already done, reusing the
+    run directory of a partially finished file.
+
+    Args:
+        path (str): Path of the journal file.
+    """
+
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._files = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except ValueError:
+                        # A line cut off by an interrupted write
+                        continue
+
+    def _apply(self, entry):
+        state = self._files.setdefault(entry['file'], {'run_dir': None, 'providers': {}, 'done': False})
+        state['run_dir'] = entry.get('run_dir') or state['run_dir']
+        if entry.get('provider'):
+            state['providers'][entry['provider']] = entry['output']
+        if entry.get('status') == 'done':
+            state['done'] = True
+
+    def _append(self, entry):
+        with self._lock:
+            self._apply(entry)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def state(self, file_path):
+        """Return {'run_dir', 'providers': {name: output file}, 'done'} for a file, or None."""
+        with self._lock:
+            return self._files.get(os.path.abspath(file_path))
+
+    def files(self):
+        """Return a copy of the state of every file in the journal, by absolute path (see state())."""
+        with self._lock:
+            return {path: dict(state, providers=dict(state['providers'])) for path, state in self._files.items()}
+
+    def provider_done(self, file_path, run_dir, provider, output_file):
+        self._append({'file': os.path.abspath(file_path), 'run_dir': run_dir,
+                      'provider': provider, 'output': output_file, 'time': time.time()})
+
+    def file_done(self, file_path, run_dir):
+        self._append({'file': os.path.abspath(file_path), 'run_dir': run_dir,
+                      'status': 'done', 'time': time.time()})
+
+
+def open_journal(path=JOURNAL_FILE, fresh=False):
+    """Open the batch journal at path; with fresh, start a new one and keep the old one as .old."""
+    if fresh and os.path.exists(path):
+        os.replace(path, path + '.old')
+        log.info(f"Starting a new journal, the old one was moved to {path}.old")
+    return BatchJournal(path)
+
+
+def new_run_dir(label=None):
+    """Create a new timestamped run directory in 'recordings'."""
+    ensure_recordings_dir()
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    name = f'run_{timestamp}' if not label else f'run_{timestamp}_{label}'
+    run_dir = os.path.join('recordings', name)
+    os.makedirs(run_dir, exist_ok=True)
+    return run_dir
+
+
+def combine_transcripts(results, run_dir, cache=None):
+    """
+    Combine all provider results according to the 'combine' method and save the result.
+
+    'gpt' merges them with OpenAI ChatGPT, 'rover' by local word voting and 'rover+gpt'
+    polishes the voted transcript with ChatGPT.
+
+    Args:
+        results (list): Transcripts of the whole recording, one per provider.
+        run_dir (str): Run directory to save the combined transcript in.
+        cache (TranscriptCache): Optional cache of earlier results.
+    Returns:
+        str: The combined transcript, or None if it could not be made.
+    """
+    method = combine_method()
+    results = [result for result in results if result.text]
+    if method != 'gpt':
+        consensus = rover_combine([rover_hypothesis(result) for result in results], config.get('provider_weights'))
+        if method == 'rover':
+            print("\n======\nGecombineerde transcriptie (ROVER):\n======\n")
+            print(consensus)
+            combined_path = os.path.join(run_dir, combined_filename(method))
+            with open(combined_path, 'w', encoding='utf-8') as f:
+                f.write(consensus)
+            print(f"\nCombined transcript saved as {combined_path}\n")
+            return consensus
+        results = [Transcript("ROVER", consensus)]
+    openai_api_key = config.get('openai_api_key')
+    if not openai_api_key:
+        log.error("OpenAI API key missing in config.json, cannot combine transcriptions.")
+        return None
+    try:
+        openai = lazy_import('openai')
+        combine_prompt = config.get('combine_prompt') or DEFAULT_COMBINE_PROMPT
+        transcript_texts = "\n\n".join([
+            f"{result.provider}:\n{result.text}" for result in results
+        ])
+        if method == 'rover+gpt':
+            combine_prompt = config.get('polish_prompt') or DEFAULT_POLISH_PROMPT
+            transcript_texts = results[0].text
+        system_message = {"role": "system", "content": combine_prompt}
+        user_message = {"role": "user", "content": transcript_texts}
+        combine_key = TranscriptCache.key('combine', combine_prompt, transcript_texts)
+        combined = cache.get(combine_key) if cache else None
+        if combined is not None:
+            log.debug("Using cached combined transcript")
+        else:
+            started = time.monotonic()
+            try:
+                # Try new openai>=1.0.0 interface
+                client = openai_client(openai_api_key)
+                chat_response = client.chat.completions.create(
+                    model="gpt-4o",
+                    messages=[system_message, user_message]
+                )
+                combined = chat_response.choices[0].message.content.strip()
+                record_combine(time.monotonic() - started, getattr(chat_response, 'usage', None))
+            except ImportError:
+                # Legacy fallback
+                openai.api_key = openai_api_key
+                chat_response = openai.ChatCompletion.create(
+                    model="gpt-4",
+                    messages=[system_message, user_message]
+                )
+                combined = chat_response["choices"][0]["message"]["content"].strip()
+                record_combine(time.monotonic() - started, chat_response.get("usage"))
+            if cache:
+                cache.put(combine_key, combined)
+        print("\n======\nGecombineerde transcriptie (OpenAI GPT):\n======\n")
+        print(combined)
+        combined_path = os.path.join(run_dir, "Combined_OpenAI.txt")
+        with open(combined_path, 'w') as f:
+            f.write(combined)
+        print(f"\nCombined transcript saved as {combined_path}\n")
+        return combined
+    except Exception as e:
+        log.error(f"Error combining transcripts with OpenAI: {e}")
+        return None
+
+
+def chat_stream(api_key, messages):
+    """
+    Ask ChatGPT and yield its answer piece by piece while it is being generated.
+
+    Args:
+        api_key (str): OpenAI API key.
+        messages (list): Chat messages.
+    Yields:
+        str: Pieces of the answer.
+    """
+    started = time.monotonic()
+    try:
+        client = openai_client(api_key)
+    except ImportError:
+        # Legacy fallback
+        openai = lazy_import('openai')
+        openai.api_key = api_key
+        for chunk in openai.ChatCompletion.create(model="gpt-4", messages=messages, stream=True):
+            content = chunk["choices"][0].get("delta", {}).get("content")
+            if content:
+                yield content
+        record_combine(time.monotonic() - started, None)
+        return
+    try:
+        # The last chunk then carries the token counts
+        stream = client.chat.completions.create(model="gpt-4o", messages=messages, stream=True,
+                                                stream_options={'include_usage': True})
+    except TypeError:
+        # openai releases before stream_options
+        stream = client.chat.completions.create(model="gpt-4o", messages=messages, stream=True)
+    usage = None
+    for chunk in stream:
+        usage = getattr(chunk, 'usage', None) or usage
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+    record_combine(time.monotonic() - started, usage)
+
+
+def record_combine(seconds, usage):
+    """
+    Add a ChatGPT combine call to the metrics and to the attributes of the current span.
+
+    Args:
+        seconds (float): Duration of the call.
+        usage: The response's token usage (object or dict), or None if it has none.
+    """
+    metrics.observe('transcriber_combine_seconds', seconds)
+    for kind in ('prompt_tokens', 'completion_tokens'):
+        count = (usage.get(kind) if isinstance(usage, dict) else getattr(usage, kind, None)) if usage else None
+        if count:
+            metrics.inc('transcriber_combine_tokens_total', count, kind=kind.split('_')[0])
+            if _current_span.get() is not None:
+                _current_span.get()['attributes'][kind] = count
+
+
+def combine_method():
+    """Return the configured 'combine' method: 'gpt' (default), 'rover' or 'rover+gpt'."""
+    method = config.get('combine') or 'gpt'
+    if method not in COMBINE_METHODS:
+        log.error(f"Unknown combine method '{method}', using 'gpt'")
+        return 'gpt'
+    return method
+
+
+def combined_filename(method):
+    return "Combined_ROVER.txt" if method == 'rover' else "Combined_OpenAI.txt"
+
+
+class WindowedCombiner:
+    """
+    Combines the provider transcripts window by window while the providers are still running.
+
+    Every chunk of the recording is one window. As soon as all providers have finished a
+    window, its transcripts are merged, with up to 'combine_workers' windows in parallel:
+    by ChatGPT ('gpt'), by local word voting ('rover', see rover_combine), or by voting
+    followed by a ChatGPT polishing pass ('rover+gpt'). The results are streamed to stdout
+    and the combined file in window order, and the words repeated in the chunk overlap are
+    written only once. A window never holds more than one chunk of text, so the recording
+    length is no longer limited by the model's context window.
+
+    Args:
+        provider_names (list): Names of the providers that will deliver text.
+        windows (int): Number of windows (chunks).
+        run_dir (str): Run directory for Combined_OpenAI.txt.
+        api_key (str): OpenAI API key (not needed for 'rover').
+        cache (TranscriptCache): Optional cache of earlier merges.
+        method (str): One of COMBINE_METHODS.
+    """
+
+    def __init__(self, provider_names, windows, run_dir, api_key, cache=None, method='gpt', max_overlap_words=30):
+        import concurrent.futures
+        self.provider_names = list(provider_names)
+        self.api_key = api_key
+        self.cache = cache
+        self.method = method
+        self.prompt = config.get('combine_prompt') or DEFAULT_COMBINE_PROMPT
+        self.polish_prompt = config.get('polish_prompt') or DEFAULT_POLISH_PROMPT
+        self.max_overlap_words = max_overlap_words
+        self.path = os.path.join(run_dir, combined_filename(method))
+        self._inputs = [{} for _ in range(windows)]
+        self._submitted = set()
+        self._windows = [{'buffer': '', 'started': False, 'done': False} for _ in range(windows)]
+        self._next = 0
+        self._tail = []
+        self._written = []
+        self._cond = threading.Condition()
+        self._out = open(self.path, 'w', encoding='utf-8')
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=int(config.get('combine_workers', COMBINE_WORKERS)), thread_name_prefix='combine')
+
+    def add(self, provider, window, result):
+        """Hand in one provider's Transcript of one window."""
+        with self._cond:
+            self._inputs[window][provider] = result
+        self._check(window)
+
+    def drop(self, provider):
+        """Stop waiting for a provider that will not finish (e.g. cancelled in race mode)."""
+        with self._cond:
+            if provider in self.provider_names:
+                self.provider_names.remove(provider)
+        for window in range(len(self._inputs)):
+            self._check(window)
+
+    def _check(self, window):
+        with self._cond:
+            ready = window not in self._submitted and all(name in self._inputs[window]
+                                                          for name in self.provider_names)
+            if ready:
+                self._submitted.add(window)
+        if ready:
+            self._executor.submit(contextvars.copy_context().run, self._merge, window)
+
+    def _merge(self, window):
+        with self._cond:
+            names = list(self.provider_names)
+        texts = []
+        try:
+            parts = [self._inputs[window][name] for name in names if self._inputs[window][name].ok]
+            texts = [(part.provider, part.text) for part in parts]
+            if len(texts) <= 1:
+                self._emit(window, texts[0][1] if texts else '')
+                return
+            if self.method == 'gpt':
+                user_content = "\n\n".join(f"{name}:\n{text}" for name, text in texts)
+                system_content = self.prompt
+            else:
+                user_content = rover_combine([rover_hypothesis(part) for part in parts],
+                                             config.get('provider_weights'))
+                if self.method == 'rover':
+                    self._emit(window, user_content)
+                    return
+                system_content = self.polish_prompt
+            key = TranscriptCache.key('combine', system_content, user_content)
+            cached = self.cache.get(key) if self.cache else None
+            if cached is not None:
+                self._emit(window, cached)
+                return
+            messages = [{"role": "system", "content": system_content},
+                        {"role": "user", "content": user_content}]
+            pieces = []
+            with span('combine_window', window=window, method=self.method):
+                for piece in chat_stream(self.api_key, messages):
+                    pieces.append(piece)
+                    self._emit(window, piece)
+            if self.cache:
+                self.cache.put(key, ''.join(pieces).strip())
+        except Exception as e:
+            log.error(f"Combining window {window + 1} failed: {e}")
+            if not self._windows[window]['buffer'] and not self._windows[window]['started']:
+                # Fall back to the longest transcript of the window
+                self._emit(window, max((text for _, text in texts), key=len, default=''))
+        finally:
+            with self._cond:
+                self._windows[window]['done'] = True
+                self._flush()
+                self._cond.notify_all()
+
+    def _emit(self, window, text):
+        with self._cond:
+            self._windows[window]['buffer'] += text
+            self._flush()
+
+    def _write(self, text):
+        if not self._written:
+            title = "ROVER" if self.method == 'rover' else "OpenAI GPT"
+            print(f"\n======\nGecombineerde transcriptie ({title}):\n======\n")
+        print(text, end='', flush=True)
+        self._out.write(text)
+        self._out.flush()
+        self._written.append(text)
+        self._tail = (self._tail + text.split())[-self.max_overlap_words:]
+
+    def _flush(self):
+        # Write everything that can be written in window order (called with the lock held)
+        while self._next < len(self._windows):
+            w = self._windows[self._next]
+            if not w['started']:
+                text = w['buffer'].lstrip()
+                if self._next > 0 and self._tail:
+                    words = text.split()
+                    if len(words) < self.max_overlap_words and not w['done']:
+                        return
+                    overlap = find_overlap(self._tail, words[:self.max_overlap_words], self.max_overlap_words)
+                    if overlap:
+                        text = ' '.join(words[overlap[1]:]) + (' ' if text[-1:].isspace() else '')
+                    if text:
+                        self._write('\n\n')
+                w['buffer'] = text
+                w['started'] = True
+            if w['buffer']:
+                self._write(w['buffer'])
+                w['buffer'] = ''
+            if not w['done']:
+                return
+            self._next += 1
+
+    def result(self):
+        """Wait until every window is written and return the combined transcript."""
+        with self._cond:
+            while self._next < len(self._windows):
+                self._cond.wait()
+        self._executor.shutdown()
+        self._out.close()
+        combined = ''.join(self._written).strip()
+        print(f"\n\nCombined transcript saved as {self.path}\n")
+        return combined
+
+
+def save_result(run_dir, result):
+    """
+    Append a provider's Transcript to the run's results.jsonl sidecar.
+
+    Every line is one result as written by Transcript.to_dict, with the word columns, the
+    status and the stage timings, so later steps don't have to parse the text files.
+    """
+    with open(os.path.join(run_dir, RESULTS_FILE), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(result.to_dict(), ensure_ascii=False, separators=(',', ':')) + '\n')
+
+
+def load_results(run_dir):
+    """
+    Read the results.jsonl sidecar of a run.
+
+    Returns:
+        dict: The last Transcript written per provider name.
+    """
+    path = os.path.join(run_dir, RESULTS_FILE)
+    results = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    result = Transcript.from_dict(json.loads(line))
+                    results[result.provider] = result
+    return results
+
+
+def process_file(audio_filename, providers, executor, cache=None, journal=None, run_dir=None, archive_results=True):
+    """
+    Transcribe one file with all providers and combine the results.
+
+    Args:
+        audio_filename (str): Path to the audio file.
+        providers (list): (name, function) tuples.
+        executor (concurrent.futures.Executor): Shared executor for the provider jobs.
+        cache (TranscriptCache): Optional cache of earlier results.
+        journal (BatchJournal): Optional batch journal; providers it lists as done for
+            this file are not run again.
+        run_dir (str): Directory for the results; a new run directory if omitted.
+        archive_results (bool): Index the results in the archive (if it is enabled).
+    Returns:
+        tuple: (run directory, combined transcript or None).
+    """
+    with span('file', file=os.path.basename(audio_filename)) as file_attributes:
+        state = journal.state(audio_filename) if journal else None
+        if state and state['run_dir'] and os.path.isdir(state['run_dir']):
+            run_dir = state['run_dir']
+            log.info(f"Resuming {audio_filename} in {run_dir}")
+        if run_dir is None:
+            run_dir = new_run_dir(os.path.splitext(os.path.basename(audio_filename))[0] if journal else None)
+
+        index = archive() if archive_results else None
+        digest = audio_hash(audio_filename) if cache or index else None
+        if cache:
+            file_key = TranscriptCache.key('file', digest)
+            seen = cache.get(file_key)
+            if seen and os.path.abspath(seen['path']) != os.path.abspath(audio_filename):
+                log.info(f"{audio_filename} has the same audio as {seen['path']} ({seen['run_dir']}); reusing cached results")
+            cache.put(file_key, {'path': audio_filename, 'run_dir': run_dir})
+
+        results = [None] * len(providers)
+        todo = []
+        earlier = load_results(run_dir) if state else {}
+        for idx, (name, func) in enumerate(providers):
+            output_file = state['providers'].get(name) if state else None
+            # With a cache, finished providers are run again for free to get their chunks
+            if output_file and os.path.exists(output_file) and not cache:
+                if name in earlier:
+                    results[idx] = earlier[name]
+                else:
+                    with open(output_file, encoding='utf-8') as f:
+                        results[idx] = Transcript(name, f.read())
+                log.debug(f"{name}: already done in an earlier run")
+            else:
+                todo.append(idx)
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            source, variants = audio_filename, None
+            if config.get('preprocess', True) and todo:
+                sample_rate = int(config.get('sample_rate', RATE))
+                channels = int(config.get('channels', CHANNELS))
+                with span('preprocess', sample_rate=sample_rate, channels=channels):
+                    source = prepare_audio(audio_filename, work_dir, sample_rate, channels)
+                if source != audio_filename:
+                    log.info(f"Prepared {sample_rate} Hz audio: "
+                             f"{os.path.getsize(audio_filename) // 1024} KB -> {os.path.getsize(source) // 1024} KB")
+                variants = AudioVariants(work_dir, sample_rate, channels)
+            speech_map = None
+            vad = config.get('vad')
+            if vad and todo:
+                with span('vad', method=vad if isinstance(vad, str) else 'energy') as vad_attributes:
+                    source, speech_map = remove_silence(source, work_dir, vad if isinstance(vad, str) else 'energy')
+                    if speech_map:
+                        vad_attributes['speech_seconds'] = round(speech_map.speech_seconds, 3)
+                        speech_map.save(os.path.join(run_dir, 'speech_map.json'))
+            with span('split') as split_attributes:
+                chunks = split_audio(source, work_dir,
+                                     config.get('chunk_seconds', CHUNK_SECONDS),
+                                     config.get('chunk_overlap_seconds', CHUNK_OVERLAP_SECONDS)) if todo else []
+                split_attributes['chunks'] = len(chunks)
+            if len(chunks) > 1:
+                log.info(f"Split {audio_filename} into {len(chunks)} chunks")
+            log.info(f"Transcribing {audio_filename} with all providers asynchronously...")
+            any_results = len(todo) < len(providers)
+            todo_providers = [providers[idx] for idx in todo]
+            combiner, on_chunk = None, None
+            method = combine_method()
+            if (config.get('openai_api_key') or method == 'rover') and todo and len(todo) == len(providers):
+                combiner = WindowedCombiner([name for name, _ in providers], len(chunks), run_dir,
+                                            config.get('openai_api_key'), cache, method)
+                on_chunk = lambda idx, chunk_idx, result: combiner.add(providers[idx][0], chunk_idx, result)
+            with staging(todo_providers), span('transcribe', providers=len(todo), chunks=len(chunks)):
+                stats = provider_stats()
+                race = config.get('race') or {}
+                if not todo:
+                    runs = []
+                elif race.get('quorum') or race.get('deadline') or race.get('backups'):
+                    backups = race.get('backups') or ()
+                    quorum = int(race.get('quorum') or len([p for p in providers if p[0] not in backups]))
+                    runs = race_chunks(executor, todo_providers, chunks,
+                                       max(1, quorum - (len(providers) - len(todo))), race.get('deadline'), backups,
+                                       race.get('hedge_percentile', HEDGE_PERCENTILE), race.get('hedge_after'),
+                                       cache, variants, on_chunk, stats)
+                elif config.get('select'):
+                    select = config.get('select')
+                    select = select if isinstance(select, dict) else {}
+                    runs = select_chunks(executor, todo_providers, chunks,
+                                         int(select.get('start', SELECT_START)),
+                                         float(select.get('agreement', SELECT_AGREEMENT)),
+                                         select.get('budget_seconds'), select.get('budget_cost'),
+                                         config.get('provider_costs'), float(select.get('explore', SELECT_EXPLORE)),
+                                         cache, variants, on_chunk, stats)
+                else:
+                    runs = transcribe_chunks(executor, todo_providers, chunks, cache, variants, on_chunk, stats)
+                overlap = config.get('chunk_overlap_seconds', CHUNK_OVERLAP_SECONDS)
+                for todo_idx, chunk_results in runs:
+                    idx = todo[todo_idx]
+                    name, _ = providers[idx]
+                    result = stitch_results(chunk_results, chunks, overlap)
+                    if speech_map:
+                        speech_map.restore(result)
+                    results[idx] = result
+                    save_result(run_dir, result)
+                    if index:
+                        index.add_result(run_dir, result, audio_filename, digest)
+                    if result.status == 'error':
+                        log.error(f"{name} failed: {result.error}")
+                        continue
+                    any_results = True
+                    if result.error:
+                        log.error(f"{name} failed for part of the audio: {result.error}")
+                    log.debug(f"{name} finished. Result: {result.text[:100]}")
+                    print(f"\n---\n- {name}\n- {result.text}\n")
+                    output_file = os.path.join(run_dir, f"{name.replace(' ', '_')}.txt")
+                    with open(output_file, 'w', encoding='utf-8') as out_f:
+                        out_f.write(result.text)
+                    if journal and result.ok:
+                        journal.provider_done(audio_filename, run_dir, name, output_file)
+            if not any_results:
+                log.error("No transcription results returned from any provider.")
+
+        print(f"\nAll transcriptions saved in {run_dir}\n")
+
+        with span('combine', method=method):
+            if combiner:
+                for idx, (name, _) in enumerate(providers):
+                    if results[idx] is None:
+                        combiner.drop(name)
+                combined = combiner.result()
+            else:
+                combined = combine_transcripts([r for r in results if r is not None], run_dir, cache)
+        if index and combined:
+            index.add(run_dir, 'Combined', transcript_segments(Transcript('Combined', combined)), audio_filename, digest)
+        if todo:
+            # With a single transcript the combined one is a copy, which says nothing
+            if combined and sum(1 for r in results if r is not None and r.ok) > 1:
+                for idx in todo:
+                    if results[idx] is not None and results[idx].ok:
+                        stats.record_agreement(providers[idx][0], word_agreement(results[idx].text, combined))
+            stats.save()
+        if journal and any_results and (combined is not None or not (config.get('openai_api_key') or method == 'rover')):
+            journal.file_done(audio_filename, run_dir)
+        file_attributes['run_dir'] = run_dir
+    write_metrics()
+    return run_dir, combined
+
+
+def collect_audio_files(inputs):
+    """
+    Expand command line inputs (files, directories and glob patterns) into audio files.
+
+    Returns:
+        list: Paths of audio files, sorted per input, without duplicates.
+    """
+    import glob
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = sorted(os.path.join(item, name) for name in os.listdir(item)
+                             if name.lower().endswith(AUDIO_EXTENSIONS))
+        elif os.path.isfile(item):
+            matches = [item]
+        else:
+            matches = sorted(path for path in glob.glob(item) if os.path.isfile(path))
+        for path in matches:
+            if path not in files:
+                files.append(path)
+    return files
+
+
+# === ARCHIVE ===
+
+ARCHIVE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    run_dir TEXT UNIQUE NOT NULL,
+    created TEXT,
+    audio_path TEXT,
+    audio_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    provider TEXT NOT NULL,
+    start_ms INTEGER,
+    end_ms INTEGER,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_run ON segments(run_id, provider);
+CREATE INDEX IF NOT EXISTS runs_audio ON runs(audio_hash);
+"""
+ARCHIVE_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text, content='segments', content_rowid='id', tokenize='unicode61 remove_diacritics 1');
+CREATE TRIGGER IF NOT EXISTS segments_insert AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_delete AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts(segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+_RUN_TIMESTAMP = re.compile(r'run_(\d{8}_\d{6})')
+
+
+def transcript_segments(result):
+    """
+    Split a Transcript into the segments stored in the archive: after a sentence of at
+    least a third of ARCHIVE_SEGMENT_WORDS words, at pauses of ARCHIVE_SEGMENT_PAUSE
+    seconds and after ARCHIVE_SEGMENT_WORDS words.
+
+    Returns:
+        list: (start ms, end ms, text) tuples; the times are None without word timings.
+    """
+    words = result.words or result.text.split()
+    timed = result.timed
+    segments, current = [], []
+
+    def flush():
+        if current:
+            segments.append((round(result.starts[current[0]] * 1000) if timed else None,
+                             round(result.ends[current[-1]] * 1000) if timed else None,
+                             ' '.join(words[k] for k in current)))
+            current.clear()
+
+    for k, word in enumerate(words):
+        if current and timed and result.starts[k] - result.ends[k - 1] >= ARCHIVE_SEGMENT_PAUSE:
+            flush()
+        current.append(k)
+        if len(current) >= ARCHIVE_SEGMENT_WORDS or (
+                word.endswith(('.', '?', '!')) and len(current) >= ARCHIVE_SEGMENT_WORDS // 3):
+            flush()
+    flush()
+    return segments
+
+
+def _fts_query(query):
+    # Every word must occur; a trailing * matches words starting with it
+    terms = []
+    for term in query.split():
+        prefix = term.endswith('*')
+        term = term.rstrip('*').replace('"', '""')
+        if term:
+            terms.append(f'"{term}"*' if prefix else f'"{term}"')
+    return ' '.join(terms)
+
+
+class Archive:
+    """
+    Full-text index of all transcripts in 'recordings', in an SQLite database.
+
+    The pipeline adds every provider result and combined transcript as it writes them;
+    import_runs() adds run directories written before the archive existed. Transcripts
+    are stored as segments with their times, and with the run's audio file and hash, so
+    a search shows which recording said something and where. Searches use SQLite's FTS5
+    index, or a slower substring search when SQLite was built without it.
+
+    Args:
+        path (str): Location of the database.
+    """
+
+    def __init__(self, path=ARCHIVE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(ARCHIVE_SCHEMA)
+        try:
+            self._db.executescript(ARCHIVE_FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError as e:
+            log.info(f"Archive search without full-text index ({e})")
+            self.fts = False
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def add(self, run_dir, provider, segments, audio_path=None, digest=None):
+        """
+        Store (or replace) one transcript of a run.
+
+        Args:
+            run_dir (str): Run directory.
+            provider (str): Provider name, or 'Combined'.
+            segments (list): (start ms, end ms, text) tuples, see transcript_segments.
+            audio_path (str): Optional path of the recording.
+            digest (str): Optional audio_hash of the recording.
+        """
+        run_dir = os.path.normpath(run_dir)
+        match = _RUN_TIMESTAMP.search(os.path.basename(run_dir))
+        if match:
+            created = datetime.strptime(match.group(1), '%Y%m%d_%H%M%S').isoformat()
+        else:
+            created = datetime.fromtimestamp(os.path.getmtime(run_dir)).isoformat(timespec='seconds') \
+                if os.path.isdir(run_dir) else None
+        try:
+            with self._lock, self._db:
+                self._db.execute('INSERT INTO runs (run_dir, created) VALUES (?, ?) ON CONFLICT (run_dir) DO NOTHING',
+                                 (run_dir, created))
+                self._db.execute('UPDATE runs SET audio_path = coalesce(?, audio_path), '
+                                 'audio_hash = coalesce(?, audio_hash) WHERE run_dir = ?',
+                                 (os.path.abspath(audio_path) if audio_path else None, digest, run_dir))
+                run_id = self._db.execute('SELECT id FROM runs WHERE run_dir = ?', (run_dir,)).fetchone()[0]
+                self._db.execute('DELETE FROM segments WHERE run_id = ? AND provider = ?', (run_id, provider))
+                self._db.executemany('INSERT INTO segments (run_id, provider, start_ms, end_ms, text) '
+                                     'VALUES (?, ?, ?, ?, ?)',
+                                     [(run_id, provider, start, end, text) for start, end, text in segments])
+        except sqlite3.Error as e:
+            log.error(f"Could not add {provider} of {run_dir} to the archive: {e}")
+
+    def add_result(self, run_dir, result, audio_path=None, digest=None):
+        """Store a provider's Transcript (results with an error and no text are skipped)."""
+        if result.text.strip() and result.status != 'error':
+            self.add(run_dir, result.provider, transcript_segments(result), audio_path, digest)
+
+    def search(self, query, provider=None, limit=ARCHIVE_LIMIT):
+        """
+        Find the segments that contain every word of the query (a word ending in * also
+        matches longer words), best matches first.
+
+        Returns:
+            list: Dicts with 'run_dir', 'created', 'audio_path', 'audio_hash', 'provider',
+            'start_ms', 'end_ms' (None without word timings) and 'text', in which the
+            matching words are marked with [ and ].
+        """
+        if self.fts:
+            match = _fts_query(query)
+            if not match:
+                return []
+            sql = ("SELECT r.run_dir, r.created, r.audio_path, r.audio_hash, s.provider, s.start_ms, s.end_ms, "
+                   "highlight(segments_fts, 0, '[', ']') FROM segments_fts "
+                   "JOIN segments s ON s.id = segments_fts.rowid JOIN runs r ON r.id = s.run_id "
+                   "WHERE segments_fts MATCH ?" + (" AND s.provider = ?" if provider else "") +
+                   " ORDER BY rank LIMIT ?")
+            params = [match] + ([provider] if provider else []) + [limit]
+        else:
+            words = query.replace('*', '').split()
+            if not words:
+                return []
+            sql = ("SELECT r.run_dir, r.created, r.audio_path, r.audio_hash, s.provider, s.start_ms, s.end_ms, s.text "
+                   "FROM segments s JOIN runs r ON r.id = s.run_id WHERE " +
+                   " AND ".join("s.text LIKE ?" for _ in words) + (" AND s.provider = ?" if provider else "") +
+                   " ORDER BY r.created DESC, s.start_ms LIMIT ?")
+            params = [f'%{word}%' for word in words] + ([provider] if provider else []) + [limit]
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        keys = ('run_dir', 'created', 'audio_path', 'audio_hash', 'provider', 'start_ms', 'end_ms', 'text')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def import_run(self, run_dir, audio_path=None):
+        """Add the transcripts of an existing run directory (results.jsonl, else the text files)."""
+        results = load_results(run_dir)
+        digest = audio_hash(audio_path) if audio_path and os.path.exists(audio_path) else None
+        for result in results.values():
+            self.add_result(run_dir, result, audio_path, digest)
+        for entry in sorted(os.scandir(run_dir), key=lambda e: e.name):
+            name, ext = os.path.splitext(entry.name)
+            if ext != '.txt' or not entry.is_file():
+                continue
+            provider = 'Combined' if name.startswith('Combined_') else name.replace('_', ' ')
+            if provider in results:
+                continue
+            with open(entry.path, encoding='utf-8', errors='replace') as f:
+                self.add(run_dir, provider, transcript_segments(Transcript(provider, f.read())), audio_path, digest)
+
+    def import_runs(self, root='recordings', journal_path=JOURNAL_FILE):
+        """
+        One-time import of every run directory under root. The batch journal, if there is
+        one, tells which recording a batch run belongs to.
+
+        Returns:
+            int: Number of runs imported.
+        """
+        audio = {}
+        if os.path.exists(journal_path):
+            journal = BatchJournal(journal_path)
+            audio = {os.path.normpath(state['run_dir']): path for path, state in journal.files().items()
+                     if state['run_dir']}
+        count = 0
+        for entry in sorted(os.scandir(root), key=lambda e: e.name):
+            if entry.is_dir() and entry.name.startswith('run_'):
+                self.import_run(entry.path, audio.get(os.path.normpath(entry.path)))
+                count += 1
+                if count % 100 == 0:
+                    log.info(f"Imported {count} runs")
+        return count
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def archive():
+    """Return the shared Archive in 'archive_file', or None if 'archive' is false."""
+    global _archive
+    if not config.get('archive', True):
+        return None
+    with _archive_lock:
+        if _archive is None:
+            try:
+                _archive = Archive(config.get('archive_file') or ARCHIVE_FILE)
+            except sqlite3.Error as e:
+                log.error(f"Could not open the archive: {e}")
+                return None
+        return _archive
+
+
+def format_ms(ms):
+    """Format milliseconds as H:MM:SS.mmm."""
+    seconds, ms = divmod(int(ms), 1000)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}.{ms:03d}"
+
+
+def run_search(query, provider=None, limit=ARCHIVE_LIMIT, as_json=False):
+    """Print the archive segments matching query (see Archive.search)."""
+    index = archive() or Archive(config.get('archive_file') or ARCHIVE_FILE)
+    hits = index.search(query, provider, limit)
+    for hit in hits:
+        if as_json:
+            print(json.dumps(hit, ensure_ascii=False))
+            continue
+        when = f"{format_ms(hit['start_ms'])}-{format_ms(hit['end_ms'])}" if hit['start_ms'] is not None else '-'
+        print(f"{hit['run_dir']}  {hit['provider']}  {when}  {hit['text']}")
+    if not hits and not as_json:
+        log.info(f"Nothing found for '{query}'")
+
+
+# === LIVE MODE ===
+
+class FrameRing:
+    """
+    Ring buffer of audio frames that several readers consume at their own pace.
+
+    The capture thread writes frames; every reader keeps its own cursor (a frame sequence
+    number). A reader that falls more than the capacity behind skips the frames that
+    were overwritten instead of slowing down the capture.
+
+    Args:
+        capacity (int): Number of frames kept.
+    """
+
+    def __init__(self, capacity):
+        self._frames = collections.deque(maxlen=capacity)
+        self._next_seq = 0
+        self._cond = threading.Condition()
+        self.closed = False
+
+    def write(self, frame):
+        with self._cond:
+            self._frames.append(frame)
+            self._next_seq += 1
+            self._cond.notify_all()
+
+    def close(self):
+        """Mark the end of the audio; readers get the remaining frames and then nothing."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def position(self):
+        """Sequence number of the next frame to be written (a cursor for 'from now on')."""
+        with self._cond:
+            return self._next_seq
+
+    def read(self, cursor, timeout=None):
+        """
+        Return the frames written since cursor, waiting up to timeout for at least one.
+
+        Returns:
+            tuple: (list of frames, new cursor). The list is empty on timeout or at the end.
+        """
+        with self._cond:
+            if cursor >= self._next_seq and not self.closed:
+                self._cond.wait(timeout)
+            oldest = self._next_seq - len(self._frames)
+            cursor = max(cursor, oldest)
+            frames = list(itertools.islice(self._frames, cursor - oldest, None))
+            return frames, cursor + len(frames)
+
+
+def microphone_frames(stop):
+    """
+    Yield frames of 16-bit PCM from the default microphone until stop is set.
+
+    Args:
+        stop (threading.Event): Set to end the capture.
+    """
+    import pyaudio
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stderr(devnull):
+        audio = pyaudio.PyAudio()
+        stream = audio.open(format=pyaudio.paInt16, channels=CHANNELS,
+                            rate=RATE, input=True,
+                            frames_per_buffer=CHUNK)
+    try:
+        while not stop.is_set():
+            yield stream.read(CHUNK, exception_on_overflow=False)
+    finally:
+        stream.stop_stream()
+        stream.close()
+        audio.terminate()
+
+
+def replay_frames(file_path, stop, realtime=True):
+    """
+    Yield frames from a WAV file in place of the microphone, at the speed it was recorded.
+
+    The file is converted to the live format (RATE, CHANNELS, 16-bit) first if needed.
+
+    Args:
+        file_path (str): Path to the audio file.
+        stop (threading.Event): Set to end the replay early.
+        realtime (bool): Pace the frames like a live microphone; False replays at full speed.
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        wav_path = prepare_audio(file_path, work_dir, RATE, CHANNELS)
+        with wave.open(wav_path, 'rb') as wf:
+            frame_seconds = CHUNK / float(wf.getframerate())
+            start = time.monotonic()
+            for count in itertools.count():
+                if stop.is_set():
+                    return
+                data = wf.readframes(CHUNK)
+                if not data:
+                    return
+                if realtime:
+                    delay = start + count * frame_seconds - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                yield data
+
+
+class StreamingProvider:
+    """
+    A provider's real-time WebSocket API.
+
+    Subclasses fill in the URL, the messages to start and end a session, and how to read
+    transcripts from the provider's messages. The URL can be replaced with
+    'streaming_urls'[name] in config.json, e.g. to point at a local mock server.
+    """
+
+    name = None
+    api_key_field = None
+    default_url = None
+
+    def __init__(self):
+        self.api_key = config.get(self.api_key_field)
+
+    def url(self):
+        return (config.get('streaming_urls') or {}).get(self.name) or self.default_url
+
+    def headers(self):
+        return []
+
+    def handshake(self, ws):
+        """Send whatever the provider needs before the first audio."""
+
+    def end_message(self, frames_sent):
+        """Message that tells the provider no more audio follows, or None."""
+        return None
+
+    def parse(self, message):
+        """
+        Read transcripts from one message.
+
+        Returns:
+            list: (text, is_final) tuples.
+        """
+        return []
+
+
+class DeepgramStream(StreamingProvider):
+    name = "Deepgram"
+    api_key_field = 'deepgram_api_key'
+    default_url = (f"wss://api.deepgram.com/v1/listen?language=nl&encoding=linear16"
+                   f"&sample_rate={RATE}&channels={CHANNELS}&interim_results=true")
+
+    def headers(self):
+        return [f"Authorization: Token {self.api_key}"]
+
+    def end_message(self, frames_sent):
+        return json.dumps({"type": "CloseStream"})
+
+    def parse(self, message):
+        data = json.loads(message)
+        if data.get('type') != 'Results':
+            return []
+        text = data['channel']['alternatives'][0]['transcript']
+        return [(text, bool(data.get('is_final')))] if text else []
+
+
+class AssemblyAIStream(StreamingProvider):
+    name = "AssemblyAI"
+    api_key_field = 'assemblyai_api_key'
+    default_url = f"wss://streaming.assemblyai.com/v3/ws?sample_rate={RATE}&encoding=pcm_s16le"
+
+    def headers(self):
+        return [f"Authorization: {self.api_key}"]
+
+    def end_message(self, frames_sent):
+        return json.dumps({"type": "Terminate"})
+
+    def parse(self, message):
+        data = json.loads(message)
+        if data.get('type') != 'Turn' or not data.get('transcript'):
+            return []
+        return [(data['transcript'], bool(data.get('end_of_turn')))]
+
+
+class SpeechmaticsStream(StreamingProvider):
+    name = "Speechmatics"
+    api_key_field = 'speechmatics_api_key'
+    default_url = "wss://eu2.rt.speechmatics.com/v2"
+
+    def headers(self):
+        return [f"Authorization: Bearer {self.api_key}"]
+
+    def handshake(self, ws):
+        ws.send(json.dumps({
+            "message": "StartRecognition",
+            "audio_format": {"type": "raw", "encoding": "pcm_s16le", "sample_rate": RATE},
+            "transcription_config": {"language": "nl", "enable_partials": True},
+        }))
+        while True:
+            data = json.loads(ws.recv())
+            if data.get('message') == 'RecognitionStarted':
+                return
+            if data.get('message') == 'Error':
+                raise RuntimeError(f"Speechmatics: {data.get('reason')}")
+
+    def end_message(self, frames_sent):
+        return json.dumps({"message": "EndOfStream", "last_seq_no": frames_sent})
+
+    def parse(self, message):
+        data = json.loads(message)
+        kind = data.get('message')
+        if kind not in ('AddPartialTranscript', 'AddTranscript'):
+            return []
+        text = data.get('metadata', {}).get('transcript', '').strip()
+        return [(text, kind == 'AddTranscript')] if text else []
+
+
+STREAMING_PROVIDERS = [DeepgramStream, AssemblyAIStream, SpeechmaticsStream]
+
+
+class LiveOutput:
+    """
+    Prints live transcripts as they arrive and appends final ones to Live_<Provider>.txt.
+
+    Args:
+        run_dir (str): Run directory the transcripts are written to.
+    """
+
+    def __init__(self, run_dir):
+        self.run_dir = run_dir
+        self.start = time.monotonic()
+        self._lock = threading.Lock()
+        self._last_partial = {}
+
+    def __call__(self, name, text, final, offset=None):
+        if offset is None:
+            offset = time.monotonic() - self.start
+        stamp = time.strftime('%H:%M:%S', time.gmtime(offset))
+        with self._lock:
+            if not final:
+                if self._last_partial.get(name) != text:
+                    self._last_partial[name] = text
+                    print(f"[{stamp}] {name} ... {text}")
+                return
+            self._last_partial.pop(name, None)
+            print(f"[{stamp}] {name}: {text}")
+            path = os.path.join(self.run_dir, f"Live_{name.replace(' ', '_')}.txt")
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(f"[{stamp}] {text}\n")
+
+
+def run_stream(provider, ring, on_text):
+    """
+    Stream the ring's audio to a provider's WebSocket API until the ring is closed.
+
+    Args:
+        provider (StreamingProvider): The provider.
+        ring (FrameRing): Source of the audio.
+        on_text (callable): Called with (provider name, text, is_final).
+    """
+    websocket = lazy_import('websocket')
+    ws = websocket.create_connection(provider.url(), header=provider.headers(),
+                                     timeout=request_timeout(provider.name) or 30)
+    try:
+        provider.handshake(ws)
+        # Silence can mean no messages for a long time
+        ws.settimeout(None)
+        # Start at the oldest buffered frame: nothing captured while connecting is lost
+        cursor = 0
+
+        def receive():
+            while True:
+                try:
+                    message = ws.recv()
+                except (websocket.WebSocketException, OSError):
+                    return
+                if not message:
+                    return
+                if isinstance(message, bytes):
+                    continue
+                try:
+                    for text, final in provider.parse(message):
+                        on_text(provider.name, text, final)
+                except (ValueError, KeyError, IndexError) as e:
+                    log.error(f"{provider.name}: unexpected message: {e}")
+
+        receiver = threading.Thread(target=receive, name=f"live-{provider.name}", daemon=True)
+        receiver.start()
+        frames_sent = 0
+        while True:
+            frames, cursor = ring.read(cursor, timeout=0.5)
+            if frames:
+                ws.send_binary(b''.join(frames))
+                frames_sent += 1
+            elif ring.closed:
+                break
+        end = provider.end_message(frames_sent)
+        if end:
+            ws.send(end)
+        # Give the provider time to send the last transcripts
+        receiver.join(10)
+    finally:
+        ws.close()
+
+
+def run_rolling_chunks(providers, ring, on_text, executor, work_dir, seconds=RECORD_SECONDS):
+    """
+    Send rolling chunks of the ring's audio to batch providers until the ring is closed.
+
+    Args:
+        providers (list): (name, function) tuples of batch providers.
+        ring (FrameRing): Source of the audio.
+        on_text (callable): Called with (provider name, text, True, chunk offset).
+        executor (concurrent.futures.Executor): Executor for the provider calls.
+        work_dir (str): Directory for the chunk files.
+        seconds (int): Chunk length.
+    """
+    frames_per_chunk = max(1, int(RATE / CHUNK * seconds))
+    cursor = 0
+    buffered = []
+    offset = 0.0
+    futures = []
+
+    def transcribe_live_chunk(name, func, path, chunk_offset):
+        result = as_transcript(name, wait_for_job(_call_provider(func, name, path, None)))
+        if not result.ok:
+            log.error(f"{name} failed for the chunk at {chunk_offset:.0f}s: {result.error}")
+            return
+        on_text(name, result.text, True, chunk_offset)
+
+    for count in itertools.count():
+        frames, cursor = ring.read(cursor, timeout=0.5)
+        buffered.extend(frames)
+        if len(buffered) < frames_per_chunk and not (ring.closed and not frames):
+            continue
+        if buffered:
+            path = os.path.join(work_dir, f"live_{count:05d}.wav")
+            with wave.open(path, 'wb') as wf:
+                wf.setnchannels(CHANNELS)
+                wf.setsampwidth(2)
+                wf.setframerate(RATE)
+                wf.writeframes(b''.join(buffered))
+            for name, func in providers:
+                futures.append(executor.submit(transcribe_live_chunk, name, func, path, offset))
+            offset += len(buffered) * CHUNK / float(RATE)
+            buffered = []
+        if ring.closed and not frames:
+            break
+    for future in futures:
+        try:
+            future.result()
+        except Exception as exc:
+            log.error(f"Live chunk failed: {exc}")
+
+
+def run_live(replay=None, duration=None, realtime=True):
+    """
+    Transcribe the microphone (or a replayed WAV file) while it is being recorded.
+
+    Streaming providers (Deepgram, AssemblyAI, Speechmatics) get the audio over WebSocket
+    as it is captured; every other enabled provider gets rolling RECORD_SECONDS chunks.
+
+    Args:
+        replay (str): WAV file to replay instead of the microphone.
+        duration (float): Stop after this many seconds (default: until Ctrl+C or end of replay).
+        realtime (bool): Replay at recording speed.
+    """
+    import concurrent.futures
+    run_dir = new_run_dir('live')
+    stop = threading.Event()
+    ring = FrameRing(int(RATE / CHUNK * LIVE_BUFFER_SECONDS))
+    output = LiveOutput(run_dir)
+
+    streams = []
+    try:
+        lazy_import('websocket')  # websocket-client
+        only = config.get('providers')
+        streams = [cls() for cls in STREAMING_PROVIDERS
+                   if not_empty(config.get(cls.api_key_field)) and (not only or cls.name in only)]
+    except ImportError:
+        log.info("websocket-client is not installed; streaming providers get rolling chunks instead")
+    streaming_names = {stream.name for stream in streams}
+    rolling = [(name, func) for name, func in enabled_providers() if name not in streaming_names]
+    if not streams and not rolling:
+        log.error("No providers enabled. Please add at least one API key to config.json.")
+        sys.exit(1)
+
+    def capture():
+        source = replay_frames(replay, stop, realtime) if replay else microphone_frames(stop)
+        try:
+            for frame in source:
+                ring.write(frame)
+        finally:
+            ring.close()
+
+    print(f"Live transcription ({'replaying ' + replay if replay else 'microphone'}), press Ctrl+C to stop...")
+    # The streams and the rolling loop run for the whole session, each on a thread of its
+    # own, so they never hold up the chunk calls on the executor
+    with tempfile.TemporaryDirectory() as work_dir, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=config.get('max_workers')) as executor, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=len(streams) + 1, thread_name_prefix='live') as loops:
+        workers = [loops.submit(run_stream, stream, ring, output) for stream in streams]
+        if rolling:
+            workers.append(loops.submit(run_rolling_chunks, rolling, ring, output, executor, work_dir))
+        capture_thread = threading.Thread(target=capture, name='live-capture', daemon=True)
+        capture_thread.start()
+        try:
+            capture_thread.join(duration)
+        except KeyboardInterrupt:
+            pass
+        stop.set()
+        capture_thread.join()
+        for worker in workers:
+            try:
+                worker.result()
+            except Exception as exc:
+                log.error(f"Live transcription failed: {exc}")
+    print(f"\nLive transcripts saved in {run_dir}\n")
+
+
+# === SERVICE MODE ===
+
+SERVICE_HOST = '127.0.0.1'  # The API has no authentication, so it only listens locally by default
+SERVICE_PORT = 8080
+SERVICE_QUEUE_SIZE = 1000  # Jobs waiting at most; more are refused with HTTP 503
+SERVICE_HISTORY = 1000  # Finished jobs whose status is kept
+SERVICE_CONNECTIONS = 64  # HTTP requests handled at the same time
+SERVICE_DIR = os.path.join('recordings', 'incoming')  # Where uploaded audio is kept until it is transcribed
+SERVICE_JOURNAL_FILE = os.path.join('recordings', 'service_journal.jsonl')
+WATCH_INTERVAL_SECONDS = 5  # How often the watched directory is scanned
+
+
+class ServiceJob:
+    """
+    A file waiting for, or going through, the pipeline in service mode.
+
+    Args:
+        job_id (str): Identifier used in the API.
+        path (str): The audio file.
+        priority (int): Higher priorities are transcribed first.
+        providers (list): (name, function) tuples to use.
+        upload (bool): True if the file was uploaded to the service and is removed when done.
+        journal (BatchJournal): For files from the watched directory, so a restart skips
+            the files that are done.
+    """
+
+    def __init__(self, job_id, path, priority=0, providers=None, upload=False, journal=None):
+        self.id = job_id
+        self.path = path
+        self.priority = priority
+        self.providers = providers
+        self.upload = upload
+        self.journal = journal
+        self.status = 'queued'
+        self.order = 0
+        self.error = None
+        self.run_dir = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def to_dict(self):
+        return {'id': self.id, 'file': self.path, 'priority': self.priority, 'status': self.status,
+                'error': self.error, 'run_dir': self.run_dir,
+                'providers': [name for name, _ in self.providers],
+                'submitted': self.submitted, 'started': self.started, 'finished': self.finished}
+
+
+class TranscriptionService:
+    """
+    Long-running process that transcribes the files it is sent, through a priority queue.
+
+    The providers, cache, HTTP connection pools, API clients and job engine are set up
+    once and stay warm between jobs. 'service_workers' files are transcribed at the same
+    time, sharing one executor for the provider calls; at most 'service_queue_size' jobs
+    wait, and only the last 'service_history' finished jobs are remembered.
+
+    HTTP API (JSON):
+        POST /jobs                 {"path": ..., "priority": 0, "providers": [...]}, or the
+                                   audio itself as the body (?name=file.wav&priority=0)
+        GET /jobs                  queued, running and recent jobs
+        GET /jobs/<id>             status of a job
+        GET /jobs/<id>/result      combined transcript and provider results of a done job
+        DELETE /jobs/<id>          cancel a queued job
+        GET /search?q=...          archive segments matching q (&provider=...&limit=...)
+        GET /health, GET /metrics
+
+    Args:
+        providers (list): (name, function) tuples of all enabled providers.
+        executor (concurrent.futures.Executor): Executor for the provider calls.
+        cache (TranscriptCache): Optional cache of earlier results.
+    """
+
+    def __init__(self, providers, executor, cache=None):
+        import queue
+        self.providers = providers
+        self.executor = executor
+        self.cache = cache
+        self.queue_size = int(config.get('service_queue_size', SERVICE_QUEUE_SIZE))
+        self.upload_dir = config.get('service_dir') or SERVICE_DIR
+        self._queue = queue.PriorityQueue()
+        self._jobs = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._order = itertools.count()
+        self._queued = 0
+        self._running = 0
+        self._server = None
+        self._stop = threading.Event()
+
+    # --- Jobs ---
+
+    def submit(self, path, priority=0, names=None, upload=False, journal=None):
+        """
+        Queue a file.
+
+        Args:
+            path (str): The audio file.
+            priority (int): Higher priorities are transcribed first.
+            names (list): Only use these providers (of the enabled ones).
+        Returns:
+            ServiceJob: The queued job.
+        Raises:
+            ValueError: If the file or a provider is unknown.
+            OverflowError: If the queue is full.
+        """
+        providers = self.providers
+        if names:
+            unknown = [name for name in names if name not in dict(self.providers)]
+            if unknown:
+                raise ValueError(f"providers not enabled: {', '.join(unknown)}")
+            providers = [(name, func) for name, func in self.providers if name in names]
+        if not os.path.isfile(path):
+            raise ValueError(f"file not found: {path}")
+        with self._lock:
+            if self._queued >= self.queue_size:
+                metrics.inc('transcriber_service_jobs_total', status='rejected')
+                raise OverflowError(f"queue is full ({self.queue_size} jobs)")
+            job = ServiceJob(uuid.uuid4().hex, os.path.abspath(path), int(priority), providers, upload, journal)
+            job.order = next(self._order)
+            self._jobs[job.id] = job
+            self._queued += 1
+            metrics.set('transcriber_service_queued', self._queued)
+            self._forget()
+        # Highest priority first, then first come first served
+        self._queue.put((-job.priority, job.order, job))
+        metrics.inc('transcriber_service_jobs_total', status='submitted')
+        log.info(f"Queued job {job.id} for {path} (priority {job.priority})")
+        return job
+
+    def _forget(self):
+        # Drop the oldest finished jobs beyond 'service_history'; called with the lock held
+        history = int(config.get('service_history', SERVICE_HISTORY))
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - history)]:
+            del self._jobs[job_id]
+
+    def job(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def position(self, job):
+        """Number of queued jobs that will start before this one."""
+        with self._lock:
+            return sum(1 for other in self._jobs.values() if other.status == 'queued'
+                       and (-other.priority, other.order) < (-job.priority, job.order))
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued job.
+
+        Returns:
+            bool: False if the job is already running or finished.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != 'queued':
+                return False
+            job.status = 'cancelled'
+            job.finished = time.time()
+            self._queued -= 1
+            metrics.set('transcriber_service_queued', self._queued)
+        metrics.inc('transcriber_service_jobs_total', status='cancelled')
+        self._cleanup(job)
+        return True
+
+    def result(self, job):
+        """Return the combined transcript and the provider results of a finished job."""
+        combined = None
+        for name in ('Combined_ROVER.txt', 'Combined_OpenAI.txt'):
+            path = os.path.join(job.run_dir, name)
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    combined = f.read()
+        return {'id': job.id, 'status': job.status, 'combined': combined,
+                'providers': {name: result.to_dict() for name, result in load_results(job.run_dir).items()}}
+
+    def _cleanup(self, job):
+        if job.upload:
+            try:
+                os.remove(job.path)
+            except OSError:
+                pass
+
+    def _work(self):
+        import queue
+        while not self._stop.is_set():
+            try:
+                _, _, job = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            with self._lock:
+                if job.status != 'queued':
+                    continue
+                job.status = 'running'
+                job.started = time.time()
+                self._queued -= 1
+                self._running += 1
+                metrics.set('transcriber_service_queued', self._queued)
+                metrics.set('transcriber_service_running', self._running)
+            metrics.observe('transcriber_service_queue_seconds', job.started - job.submitted)
+            try:
+                with span('service_job', job=job.id, priority=job.priority):
+                    job.run_dir, _ = process_file(job.path, job.providers, self.executor, self.cache, job.journal)
+                results = load_results(job.run_dir)
+                job.status = 'done' if any(result.text for result in results.values()) else 'failed'
+                if job.status == 'failed':
+                    job.error = '; '.join(f"{name}: {result.error}" for name, result in results.items()) or "no results"
+            except Exception as e:
+                log.error(f"Job {job.id} ({job.path}) failed: {e}")
+                job.status, job.error = 'failed', str(e)
+            job.finished = time.time()
+            with self._lock:
+                self._running -= 1
+                metrics.set('transcriber_service_running', self._running)
+            metrics.inc('transcriber_service_jobs_total', status=job.status)
+            log.info(f"Job {job.id} {job.status} in {job.finished - job.started:.1f}s")
+            self._cleanup(job)
+
+    # --- Sources ---
+
+    def receive_upload(self, body, length, name, priority=0, names=None):
+        """Stream an uploaded recording to 'service_dir' and queue it."""
+        os.makedirs(self.upload_dir, exist_ok=True)
+        extension = os.path.splitext(name or '')[1].lower()
+        if extension not in AUDIO_EXTENSIONS:
+            raise ValueError(f"unsupported audio file name: {name!r} (use ?name=<file>{AUDIO_EXTENSIONS[0]})")
+        path = os.path.join(self.upload_dir, f"{uuid.uuid4().hex}{extension}")
+        with open(path, 'wb') as f:
+            remaining = length
+            while remaining > 0:
+                block = body.read(min(remaining, 1 << 16))
+                if not block:
+                    break
+                f.write(block)
+                remaining -= len(block)
+        try:
+            if remaining:
+                raise ValueError("upload was cut off")
+            return self.submit(path, priority, names, upload=True)
+        except Exception:
+            os.remove(path)
+            raise
+
+    def watch(self, directory, interval=WATCH_INTERVAL_SECONDS):
+        """
+        Queue every audio file that appears in a directory, once it has stopped growing.
+
+        Finished files are recorded in the service journal, so they are not transcribed
+        again after a restart.
+        """
+        journal = BatchJournal(config.get('service_journal') or SERVICE_JOURNAL_FILE)
+        sizes = {}
+        seen = set()
+        log.info(f"Watching {directory} for new recordings")
+        while not self._stop.wait(interval):
+            for path in collect_audio_files([directory]):
+                path = os.path.abspath(path)
+                if path in seen:
+                    continue
+                state = journal.state(path)
+                if state and state['done']:
+                    seen.add(path)
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                size = (stat.st_size, stat.st_mtime)
+                if sizes.get(path) != size:
+                    # Still being written, or new: wait for the next scan
+                    sizes[path] = size
+                    continue
+                try:
+                    self.submit(path, journal=journal)
+                except OverflowError:
+                    # Try again at the next scan
+                    continue
+                except ValueError as e:
+                    log.error(f"Could not queue {path}: {e}")
+                seen.add(path)
+                sizes.pop(path, None)
+
+    # --- HTTP API ---
+
+    def start(self, host=SERVICE_HOST, port=SERVICE_PORT, workers=BATCH_WORKERS, connections=SERVICE_CONNECTIONS):
+        """Start the workers and the HTTP API in background threads."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        service = self
+        for k in range(workers):
+            threading.Thread(target=self._work, name=f'service-{k}', daemon=True).start()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def reply(self, status, body, content_type='application/json', close=False):
+                data = body if isinstance(body, bytes) else json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                if status == 503:
+                    self.send_header('Retry-After', '30')
+                if close:
+                    # Part of the request body may be unread; it must not be taken for the next request
+                    self.send_header('Connection', 'close')
+                    self.close_connection = True
+                self.end_headers()
+                self.wfile.write(data)
+
+            def route(self):
+                url = urlsplit(self.path)
+                return [part for part in url.path.split('/') if part], parse_qs(url.query)
+
+            def do_GET(self):
+                parts, query = self.route()
+                if parts == ['health']:
+                    with service._lock:
+                        counts = collections.Counter(job.status for job in service._jobs.values())
+                    self.reply(200, {'status': 'ok', 'workers': workers, **counts})
+                elif parts == ['metrics']:
+                    self.reply(200, metrics.render().encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8')
+                elif parts == ['jobs']:
+                    with service._lock:
+                        jobs = [job.to_dict() for job in service._jobs.values()]
+                    self.reply(200, {'jobs': jobs})
+                elif parts == ['search']:
+                    index = archive()
+                    if index is None:
+                        self.reply(404, {'error': 'archive is disabled'})
+                    elif not query.get('q'):
+                        self.reply(400, {'error': "'q' missing"})
+                    else:
+                        try:
+                            limit = int((query.get('limit') or [ARCHIVE_LIMIT])[0])
+                        except ValueError:
+                            self.reply(400, {'error': "'limit' must be a number"})
+                            return
+                        self.reply(200, {'results': index.search(query['q'][0], (query.get('provider') or [None])[0],
+                                                                 limit)})
+                elif len(parts) in (2, 3) and parts[0] == 'jobs' and parts[2:] in ([], ['result']):
+                    job = service.job(parts[1])
+                    if job is None:
+                        self.reply(404, {'error': 'unknown job'})
+                    elif len(parts) == 2:
+                        status = job.to_dict()
+                        if job.status == 'queued':
+                            status['position'] = service.position(job)
+                        self.reply(200, status)
+                    elif job.status not in ('done', 'failed') or not job.run_dir:
+                        self.reply(409, {'error': f'job is {job.status}', 'status': job.status})
+                    else:
+                        self.reply(200, service.result(job))
+                else:
+                    self.reply(404, {'error': 'not found'})
+
+            def do_POST(self):
+                parts, query = self.route()
+                length = int(self.headers.get('Content-Length') or 0)
+                if parts != ['jobs']:
+                    self.rfile.read(length)
+                    self.reply(404, {'error': 'not found'})
+                    return
+                upload = not self.headers.get('Content-Type', '').startswith('application/json')
+                try:
+                    if not upload:
+                        request = json.loads(self.rfile.read(length) or b'{}')
+                        if not isinstance(request, dict):
+                            raise ValueError("expected a JSON object")
+                        if not request.get('path'):
+                            raise ValueError("'path' missing")
+                        job = service.submit(request['path'], request.get('priority', 0), request.get('providers'))
+                    else:
+                        job = service.receive_upload(self.rfile, length, (query.get('name') or [None])[0],
+                                                     int((query.get('priority') or [0])[0]),
+                                                     query.get('provider'))
+                except OverflowError as e:
+                    self.reply(503, {'error': str(e)}, close=upload)
+                except (ValueError, TypeError) as e:
+                    self.reply(400, {'error': str(e)}, close=upload)
+                else:
+                    self.reply(202, {'id': job.id, 'status': job.status,
+                                     'status_url': f'/jobs/{job.id}', 'result_url': f'/jobs/{job.id}/result'})
+
+            def do_DELETE(self):
+                parts, _ = self.route()
+                if len(parts) != 2 or parts[0] != 'jobs' or service.job(parts[1]) is None:
+                    self.reply(404, {'error': 'unknown job'})
+                elif service.cancel(parts[1]):
+                    self.reply(200, {'id': parts[1], 'status': 'cancelled'})
+                else:
+                    self.reply(409, {'error': f'job is {service.job(parts[1]).status}'})
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            slots = threading.BoundedSemaphore(connections)
+
+            def process_request(self, request, client_address):
+                # Bound the request threads; further connections wait in the listen backlog
+                self.slots.acquire()
+                try:
+                    super().process_request(request, client_address)
+                except Exception:
+                    self.slots.release()
+                    raise
+
+            def process_request_thread(self, request, client_address):
+                try:
+                    super().process_request_thread(request, client_address)
+                finally:
+                    self.slots.release()
+
+        self._server = Server((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name='service-http', daemon=True).start()
+        log.info(f"Service listening on http://{host}:{self._server.server_address[1]} with {workers} workers")
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def run_service(watch_dir=None):
+    """Run the transcription service until interrupted (see TranscriptionService)."""
+    import concurrent.futures
+    providers = enabled_providers()
+    if not providers:
+        log.error("No providers enabled. Please add at least one API key to config.json.")
+        sys.exit(1)
+    cache = transcript_cache()
+    if cache:
+        cache.evict()
+    ensure_recordings_dir()
+    if any(name == "Local Whisper" for name, _ in providers):
+        # Load the model before the first job arrives
+        try:
+            local_whisper()
+        except Exception as e:
+            log.error(f"Could not load the local Whisper model: {e}")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=config.get('max_workers')) as executor:
+        service = TranscriptionService(providers, executor, cache)
+        service.start(config.get('service_host') or SERVICE_HOST,
+                      int(config.get('service_port', SERVICE_PORT)),
+                      int(config.get('service_workers', config.get('batch_workers', BATCH_WORKERS))),
+                      int(config.get('service_connections', SERVICE_CONNECTIONS)))
+        watch_dir = watch_dir or config.get('watch_dir')
+        try:
+            if watch_dir:
+                service.watch(watch_dir, float(config.get('watch_interval', WATCH_INTERVAL_SECONDS)))
+            else:
+                while True:
+                    time.sleep(3600)
+        except KeyboardInterrupt:
+            log.info("Stopping the service")
+        finally:
+            service.stop()
+
+
+# === DISTRIBUTED MODE ===
+
+QUEUE_FILE = os.path.join('recordings', 'queue.db')  # Local job queue shared by the coordinator and its workers
+QUEUE_LEASE_SECONDS = 300  # A job whose worker stopped renewing its lease this long goes to another worker
+QUEUE_ATTEMPTS = 3  # Tries per job before it is marked failed
+QUEUE_POLL_SECONDS = 2  # How often idle workers and the coordinator look at the queue
+SHARD_DIR = os.path.join('recordings', 'shards')  # Chunks of sharded files; the workers must be able to read them
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY,
+    id TEXT UNIQUE NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, seq);
+"""
+
+
+class SQLiteQueue:
+    """
+    Job queue with leases in an SQLite database, for workers on the same machine (or on a
+    file system with working locks).
+
+    A job is 'queued' until a worker leases it. The worker renews its lease while it works
+    and marks the job 'done' with its result; a job whose lease ran out (the worker died)
+    is leased again. After max_attempts tries a job is 'failed'. Putting a failed job
+    again queues it with fresh attempts; putting any other existing job does nothing, so a
+    restarted coordinator picks up where it left off.
+
+    Args:
+        path (str): Location of the database.
+        max_attempts (int): Tries per job.
+    """
+
+    def __init__(self, path=QUEUE_FILE, max_attempts=QUEUE_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(QUEUE_SCHEMA)
+
+    def put(self, job_id, payload):
+        with self._lock:
+            self._db.execute("INSERT INTO jobs (id, payload) VALUES (?, ?) ON CONFLICT (id) DO UPDATE "
+                             "SET status = 'queued', attempts = 0, error = NULL WHERE status = 'failed'",
+                             (job_id, json.dumps(payload, ensure_ascii=False)))
+
+    def lease(self, worker, seconds):
+        """Lease the oldest waiting job; returns {'id', 'attempts', **payload} or None."""
+        with self._lock:
+            now = time.time()
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                while True:
+                    row = self._db.execute("SELECT id, payload, attempts FROM jobs WHERE status = 'queued' "
+                                           "OR (status = 'leased' AND lease_until < ?) ORDER BY seq LIMIT 1",
+                                           (now,)).fetchone()
+                    if row is None:
+                        return None
+                    job_id, payload, attempts = row
+                    if attempts >= self.max_attempts:
+                        self._db.execute("UPDATE jobs SET status = 'failed', lease_until = NULL, "
+                                         "error = coalesce(error, 'lease expired') WHERE id = ?", (job_id,))
+                        continue
+                    self._db.execute("UPDATE jobs SET status = 'leased', worker = ?, lease_until = ?, "
+                                     "attempts = attempts + 1 WHERE id = ?", (worker, now + seconds, job_id))
+                    return {'id': job_id, 'attempts': attempts + 1, **json.loads(payload)}
+            finally:
+                self._db.execute('COMMIT')
+
+    def renew(self, job_id, worker, seconds):
+        """Extend a lease; False if the job is no longer leased to this worker."""
+        with self._lock:
+            return self._db.execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                                    (time.time() + seconds, job_id, worker)).rowcount == 1
+
+    def complete(self, job_id, worker, result):
+        # The first result counts, also from a worker whose lease expired meanwhile
+        with self._lock:
+            self._db.execute("UPDATE jobs SET status = 'done', worker = ?, result = ?, lease_until = NULL "
+                             "WHERE id = ? AND status != 'done'",
+                             (worker, json.dumps(result, ensure_ascii=False), job_id))
+
+    def fail(self, job_id, worker, error):
+        with self._lock:
+            self._db.execute("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                             "error = ?, lease_until = NULL WHERE id = ? AND worker = ? AND status = 'leased'",
+                             (self.max_attempts, str(error), job_id, worker))
+
+    def get(self, job_ids):
+        """Return {id: {'status', 'attempts', 'worker', 'error', 'result'}} for the known jobs."""
+        jobs = {}
+        with self._lock:
+            for k in range(0, len(job_ids), 500):
+                part = job_ids[k:k + 500]
+                rows = self._db.execute("SELECT id, status, attempts, worker, error, result FROM jobs WHERE id IN "
+                                        f"({','.join('?' * len(part))})", part).fetchall()
+                for job_id, status, attempts, worker, error, result in rows:
+                    jobs[job_id] = {'status': status, 'attempts': attempts, 'worker': worker, 'error': error,
+                                    'result': json.loads(result) if result else None}
+        return jobs
+
+    def delete(self, job_ids):
+        with self._lock:
+            self._db.executemany('DELETE FROM jobs WHERE id = ?', [(job_id,) for job_id in job_ids])
+
+
+class RedisQueue:
+    """
+    The SQLiteQueue on a Redis server (or anything that speaks its protocol), for workers
+    on several machines. Needs the redis package.
+
+    Waiting jobs are a sorted set in queue order and leases a sorted set by expiry; each
+    job is a hash with its payload, status, attempts, worker, result and error. A worker
+    claims a job by removing it from the waiting set, adding its lease and marking it
+    leased in one optimistic transaction (WATCH/MULTI), so two workers never get the same
+    job and a worker that dies right after claiming one still leaves a lease that runs
+    out.
+
+    Args:
+        url (str): Server URL, e.g. redis://queue-host:6379/0.
+        max_attempts (int): Tries per job.
+        prefix (str): Prefix of all keys.
+    """
+
+    def __init__(self, url, max_attempts=QUEUE_ATTEMPTS, prefix='transcriber'):
+        self.path = url
+        self.max_attempts = max_attempts
+        self._redis = lazy_import('redis').Redis.from_url(url, decode_responses=True)
+        self._queue, self._leases, self._seq = f'{prefix}:queue', f'{prefix}:leases', f'{prefix}:seq'
+        self._prefix = prefix
+
+    def _key(self, job_id):
+        return f'{self._prefix}:job:{job_id}'
+
+    def put(self, job_id, payload):
+        key = self._key(job_id)
+        if self._redis.hsetnx(key, 'payload', json.dumps(payload, ensure_ascii=False)):
+            seq = self._redis.incr(self._seq)
+            self._redis.hset(key, mapping={'status': 'queued', 'attempts': 0, 'seq': seq})
+            self._redis.zadd(self._queue, {job_id: seq})
+        elif self._redis.hget(key, 'status') == 'failed':
+            self._redis.hset(key, mapping={'status': 'queued', 'attempts': 0})
+            self._redis.hdel(key, 'error')
+            self._redis.zadd(self._queue, {job_id: int(self._redis.hget(key, 'seq') or 0)})
+
+    def _requeue_expired(self):
+        watch_error = lazy_import('redis').WatchError
+        for job_id in self._redis.zrangebyscore(self._leases, 0, time.time()):
+            key = self._key(job_id)
+            with self._redis.pipeline(transaction=True) as pipe:
+                try:
+                    # Only one client requeues the job, and not after a worker leased it again
+                    pipe.watch(self._leases, key)
+                    score = pipe.zscore(self._leases, job_id)
+                    if score is None or score > time.time():
+                        continue
+                    status, attempts, seq = pipe.hmget(key, 'status', 'attempts', 'seq')
+                    pipe.multi()
+                    pipe.zrem(self._leases, job_id)
+                    if status in ('leased', 'queued'):
+                        if int(attempts or 0) >= self.max_attempts:
+                            pipe.hset(key, mapping={'status': 'failed', 'error': 'lease expired'})
+                        else:
+                            pipe.hset(key, 'status', 'queued')
+                            pipe.zadd(self._queue, {job_id: int(seq or 0)})
+                    pipe.execute()
+                except watch_error:
+                    continue
+
+    def lease(self, worker, seconds):
+        self._requeue_expired()
+        watch_error = lazy_import('redis').WatchError
+        while True:
+            with self._redis.pipeline(transaction=True) as pipe:
+                try:
+                    # Claiming the job, its lease, status, worker and attempts all happen in
+                    # one transaction, which fails if another worker took a job meanwhile
+                    pipe.watch(self._queue)
+                    first = pipe.zrange(self._queue, 0, 0)
+                    if not first:
+                        return None
+                    job_id = first[0]
+                    key = self._key(job_id)
+                    pipe.multi()
+                    pipe.zrem(self._queue, job_id)
+                    pipe.zadd(self._leases, {job_id: time.time() + seconds})
+                    pipe.hset(key, mapping={'status': 'leased', 'worker': worker})
+                    pipe.hincrby(key, 'attempts', 1)
+                    pipe.hget(key, 'payload')
+                    *_, attempts, payload = pipe.execute()
+                except watch_error:
+                    continue
+            return {'id': job_id, 'attempts': attempts, **json.loads(payload)}
+
+    def renew(self, job_id, worker, seconds):
+        status, owner = self._redis.hmget(self._key(job_id), 'status', 'worker')
+        if status != 'leased' or owner != worker:
+            return False
+        return self._redis.zadd(self._leases, {job_id: time.time() + seconds}, xx=True, ch=True) == 1
+
+    def complete(self, job_id, worker, result):
+        key = self._key(job_id)
+        if self._redis.hget(key, 'status') != 'done':
+            self._redis.hset(key, mapping={'status': 'done', 'worker': worker,
+                                           'result': json.dumps(result, ensure_ascii=False)})
+            self._redis.zrem(self._leases, job_id)
+
+    def fail(self, job_id, worker, error):
+        key = self._key(job_id)
+        status, owner, attempts, seq = self._redis.hmget(key, 'status', 'worker', 'attempts', 'seq')
+        if status != 'leased' or owner != worker or not self._redis.zrem(self._leases, job_id):
+            return
+        if int(attempts or 0) >= self.max_attempts:
+            self._redis.hset(key, mapping={'status': 'failed', 'error': str(error)})
+        else:
+            self._redis.hset(key, mapping={'status': 'queued', 'error': str(error)})
+            self._redis.zadd(self._queue, {job_id: int(seq or 0)})
+
+    def get(self, job_ids):
+        pipe = self._redis.pipeline(transaction=False)
+        for job_id in job_ids:
+            pipe.hmget(self._key(job_id), 'status', 'attempts', 'worker', 'error', 'result')
+        jobs = {}
+        for job_id, (status, attempts, worker, error, result) in zip(job_ids, pipe.execute()):
+            if status:
+                jobs[job_id] = {'status': status, 'attempts': int(attempts or 0), 'worker': worker, 'error': error,
+                                'result': json.loads(result) if result else None}
+        return jobs
+
+    def delete(self, job_ids):
+        if job_ids:
+            self._redis.delete(*[self._key(job_id) for job_id in job_ids])
+            self._redis.zrem(self._queue, *job_ids)
+            self._redis.zrem(self._leases, *job_ids)
+
+
+def open_queue(url=None):
+    """Open the job queue at url or 'queue_url': a redis:// URL, or else an SQLite file."""
+    url = url or config.get('queue_url') or QUEUE_FILE
+    max_attempts = int(config.get('queue_attempts', QUEUE_ATTEMPTS))
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisQueue(url, max_attempts)
+    return SQLiteQueue(url, max_attempts)
+
+
+def run_job(job, providers, executor, cache=None):
+    """
+    Do one queue job on a worker.
+
+    A 'file' job runs the whole pipeline on the file (process_file) in a scratch run
+    directory and returns the files written there. A 'chunk' job runs every provider on
+    one chunk of a sharded file and returns their Transcripts, with times relative to the
+    chunk; the coordinator stitches and combines them.
+
+    Returns:
+        dict: {'files': {name: text}} or {'results': {provider: Transcript.to_dict()}}.
+    Raises:
+        RuntimeError: When no provider returned a transcript, so the job is retried.
+    """
+    if not os.path.exists(job['path']):
+        raise RuntimeError(f"{job['path']} not found on this worker")
+    if job['kind'] == 'file':
+        with tempfile.TemporaryDirectory() as run_dir:
+            # The coordinator indexes the results it writes; this scratch run must not be
+            process_file(job['path'], providers, executor, cache, run_dir=run_dir, archive_results=False)
+            if not any(result.ok for result in load_results(run_dir).values()):
+                raise RuntimeError("no provider returned a transcript")
+            files = {}
+            for entry in os.scandir(run_dir):
+                if entry.is_file():
+                    with open(entry.path, encoding='utf-8') as f:
+                        files[entry.name] = f.read()
+            return {'files': files}
+    with tempfile.TemporaryDirectory() as work_dir:
+        source, variants = job['path'], None
+        if config.get('preprocess', True):
+            sample_rate = int(config.get('sample_rate', RATE))
+            channels = int(config.get('channels', CHANNELS))
+            source = prepare_audio(job['path'], work_dir, sample_rate, channels)
+            variants = AudioVariants(work_dir, sample_rate, channels)
+        with staging(providers):
+            runs = list(transcribe_chunks(executor, providers, [(source, 0.0)], cache, variants,
+                                          stats=provider_stats()))
+    if not any(parts[0].ok for _, parts in runs):
+        raise RuntimeError("no provider returned a transcript")
+    return {'results': {providers[idx][0]: parts[0].to_dict() for idx, parts in runs}}
+
+
+def run_worker(queue, drain=False):
+    """
+    Take jobs from the queue and do them until interrupted (see run_job).
+
+    'worker_jobs' jobs run at the same time, sharing the 'max_workers' provider calls. The
+    leases of running jobs are renewed every third of 'queue_lease_seconds'. A job that
+    raises goes back to the queue until it has had 'queue_attempts' tries.
+
+    Args:
+        queue (SQLiteQueue or RedisQueue): The coordinator's queue.
+        drain (bool): Stop once there is nothing left to lease.
+    """
+    import concurrent.futures
+    import socket
+    providers = enabled_providers()
+    if not providers:
+        log.error("No providers enabled. Please add at least one API key to config.json.")
+        sys.exit(1)
+    cache = transcript_cache()
+    if cache:
+        cache.evict()
+    ensure_recordings_dir()
+    name = f'{socket.gethostname()}-{os.getpid()}'
+    lease_seconds = float(config.get('queue_lease_seconds', QUEUE_LEASE_SECONDS))
+    poll = float(config.get('queue_poll_seconds', QUEUE_POLL_SECONDS))
+    slots = int(config.get('worker_jobs', config.get('batch_workers', BATCH_WORKERS)))
+    active = set()
+    active_lock = threading.Lock()
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(lease_seconds / 3):
+            with active_lock:
+                job_ids = list(active)
+            for job_id in job_ids:
+                try:
+                    if not queue.renew(job_id, name, lease_seconds):
+                        log.info(f"Lost the lease of job {job_id}; another worker may do it again")
+                except Exception as e:
+                    log.error(f"Could not renew the lease of job {job_id}: {e}")
+
+    def work(executor):
+        while not stop.is_set():
+            try:
+                job = queue.lease(name, lease_seconds)
+            except Exception as e:
+                log.error(f"Could not lease a job: {e}")
+                job = None
+            if job is None:
+                if drain:
+                    return
+                stop.wait(poll)
+                continue
+            log.info(f"Job {job['id']} ({job['kind']} {os.path.basename(job['path'])}, try {job['attempts']})")
+            with active_lock:
+                active.add(job['id'])
+            started = time.monotonic()
+            try:
+                with span('worker_job', kind=job['kind']):
+                    result = run_job(job, providers, executor, cache)
+            except Exception as e:
+                log.error(f"Job {job['id']} failed: {e}")
+                metrics.inc('transcriber_worker_jobs_total', kind=job['kind'], status='failed')
+                queue.fail(job['id'], name, e)
+            else:
+                queue.complete(job['id'], name, result)
+                metrics.inc('transcriber_worker_jobs_total', kind=job['kind'], status='done')
+                metrics.observe('transcriber_worker_job_seconds', time.monotonic() - started, kind=job['kind'])
+            finally:
+                with active_lock:
+                    active.discard(job['id'])
+                write_metrics()
+
+    log.info(f"Worker {name} taking {slots} jobs at a time from {queue.path}")
+    threading.Thread(target=heartbeat, name='lease-heartbeat', daemon=True).start()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=config.get('max_workers')) as executor:
+        threads = [threading.Thread(target=work, args=(executor,), name=f'worker-{k}', daemon=True)
+                   for k in range(slots)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(1)
+        except KeyboardInterrupt:
+            log.info("Stopping the worker; running jobs go back to the queue when their lease runs out")
+        finally:
+            stop.set()
+
+
+def collect_file(audio_filename, jobs, cache=None):
+    """
+    Write the results of a distributed file to a new run directory, like process_file.
+
+    A file done as one job gets the files its worker wrote. For a sharded file the chunk
+    Transcripts of every provider are stitched, saved and combined here.
+
+    Args:
+        audio_filename (str): The original recording.
+        jobs (list): (payload, job) tuples in chunk order, with the job's 'result'.
+        cache (TranscriptCache): Optional cache for the combine step.
+    Returns:
+        tuple: (run directory, combined transcript or None).
+    """
+    run_dir = new_run_dir(os.path.splitext(os.path.basename(audio_filename))[0])
+    combined = None
+    if jobs[0][0]['kind'] == 'file':
+        for name, text in jobs[0][1]['result']['files'].items():
+            with open(os.path.join(run_dir, os.path.basename(name)), 'w', encoding='utf-8') as f:
+                f.write(text)
+            if name.startswith('Combined_'):
+                combined = text
+    else:
+        chunks = [(payload['path'], payload['offset']) for payload, _ in jobs]
+        names = list(dict.fromkeys(name for _, job in jobs for name in job['result']['results']))
+        results = []
+        for name in names:
+            parts = [Transcript.from_dict(job['result']['results'][name]) if name in job['result']['results']
+                     else Transcript.failed(name, 'no result for this chunk') for _, job in jobs]
+            result = stitch_results(parts, chunks, config.get('chunk_overlap_seconds', CHUNK_OVERLAP_SECONDS))
+            save_result(run_dir, result)
+            if result.status == 'error':
+                log.error(f"{name} failed: {result.error}")
+                continue
+            results.append(result)
+            print(f"\n---\n- {name}\n- {result.text}\n")
+            with open(os.path.join(run_dir, f"{name.replace(' ', '_')}.txt"), 'w', encoding='utf-8') as f:
+                f.write(result.text)
+        with span('combine', method=combine_method()):
+            combined = combine_transcripts(results, run_dir, cache)
+    index = archive()
+    if index:
+        index.import_run(run_dir, audio_filename)
+    return run_dir, combined
+
+
+def run_coordinator(audio_files, queue, journal):
+    """
+    Put the files on the queue, wait for the workers and collect their results.
+
+    Files longer than 'shard_seconds' are split into chunks in 'shard_dir', one job each,
+    so several workers share one long recording; other files are one job. Job ids follow
+    from the file path, so running the coordinator again after an interruption keeps the
+    jobs that are done and retries the ones that failed.
+
+    Args:
+        audio_files (list): Recordings, at paths the workers can read.
+        queue (SQLiteQueue or RedisQueue): The shared queue.
+        journal (BatchJournal): Journal of finished files; they are skipped.
+    Returns:
+        list: The files that failed.
+    """
+    cache = transcript_cache()
+    shard_seconds = float(config.get('shard_seconds') or 0)
+    shard_root = config.get('shard_dir') or SHARD_DIR
+    poll = float(config.get('queue_poll_seconds', QUEUE_POLL_SECONDS))
+    pending = {}
+    for path in audio_files:
+        if (journal.state(path) or {}).get('done'):
+            continue
+        path = os.path.abspath(path)
+        key = hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]
+        shard_dir = os.path.abspath(os.path.join(shard_root, key))
+        chunks = []
+        if shard_seconds > 0:
+            os.makedirs(shard_dir, exist_ok=True)
+            with span('split'):
+                chunks = split_audio(path, shard_dir, shard_seconds,
+                                     config.get('chunk_overlap_seconds', CHUNK_OVERLAP_SECONDS))
+        if len(chunks) > 1:
+            payloads = [{'kind': 'chunk', 'path': os.path.abspath(chunk_path), 'offset': offset, 'file': path}
+                        for chunk_path, offset in chunks]
+        else:
+            payloads = [{'kind': 'file', 'path': path}]
+            shutil.rmtree(shard_dir, ignore_errors=True)
+        jobs = [(f'{key}-{k}', payload) for k, payload in enumerate(payloads)]
+        for job_id, payload in jobs:
+            queue.put(job_id, payload)
+        pending[path] = (jobs, shard_dir)
+    total = len(pending)
+    log.info(f"Queued {total} files as {sum(len(jobs) for jobs, _ in pending.values())} jobs on {queue.path}")
+
+    failed, counts = [], None
+    while pending:
+        states = queue.get([job_id for jobs, _ in pending.values() for job_id, _ in jobs])
+        now = collections.Counter(state['status'] for state in states.values())
+        for status in ('queued', 'leased', 'done', 'failed'):
+            metrics.set('transcriber_queue_jobs', now.get(status, 0), status=status)
+        if now != counts:
+            counts = now
+            log.info(f"{total - len(pending)} of {total} files collected; jobs: "
+                     + ', '.join(f'{n} {status}' for status, n in sorted(now.items())))
+        for path, (jobs, shard_dir) in list(pending.items()):
+            done = [states.get(job_id) for job_id, _ in jobs]
+            if any(state is None for state in done):
+                log.error(f"Jobs of {path} disappeared from the queue")
+                failed.append(path)
+                del pending[path]
+            elif any(state['status'] == 'failed' for state in done):
+                errors = '; '.join(dict.fromkeys(state['error'] or 'failed' for state in done
+                                                 if state['status'] == 'failed'))
+                log.error(f"{path} failed: {errors}")
+                failed.append(path)
+                del pending[path]
+            elif all(state['status'] == 'done' for state in done):
+                try:
+                    run_dir, _ = collect_file(path, [(payload, state) for (_, payload), state in zip(jobs, done)],
+                                              cache)
+                except Exception as e:
+                    log.error(f"Could not collect the results of {path}: {e}")
+                    failed.append(path)
+                else:
+                    log.info(f"{path} done in {run_dir}")
+                    journal.file_done(path, run_dir)
+                    queue.delete([job_id for job_id, _ in jobs])
+                    shutil.rmtree(shard_dir, ignore_errors=True)
+                del pending[path]
+        write_metrics()
+        if pending:
+            time.sleep(poll)
+    return failed
+
+
+def main(argv=None):
+    import argparse
+    import concurrent.futures
+
+    parser = argparse.ArgumentParser(
+        description="Transcribe audio with all configured providers and combine the results.")
+    parser.add_argument('inputs', nargs='*',
+                        help="audio file(s), directories or glob patterns (more than one file runs a batch)")
+    parser.add_argument('--live', action='store_true',
+                        help="transcribe the microphone while recording")
+    parser.add_argument('--replay', metavar='WAV',
+                        help="with --live: replay this file instead of the microphone")
+    parser.add_argument('--duration', type=float,
+                        help="with --live: stop after this many seconds")
+    parser.add_argument('--serve', action='store_true',
+                        help="run as a service that takes jobs over HTTP (see 'service_port')")
+    parser.add_argument('--watch', metavar='DIR',
+                        help="with --serve: also transcribe every recording that appears in this directory")
+    parser.add_argument('--provider', action='append', metavar='NAME',
+                        help="only use this provider (repeat for more; overrides 'providers' in config.json)")
+    parser.add_argument('--quorum', type=int,
+                        help="race mode: stop after this many providers returned a good transcript")
+    parser.add_argument('--deadline', type=float,
+                        help="race mode: give up on providers that are not done after this many seconds")
+    parser.add_argument('--journal', default=JOURNAL_FILE,
+                        help=f"batch journal used to resume interrupted batches (default: {JOURNAL_FILE})")
+    parser.add_argument('--fresh', action='store_true',
+                        help="start a new batch journal and transcribe every file again")
+    parser.add_argument('--coordinator', action='store_true',
+                        help="put the input files on the job queue for workers and collect their results")
+    parser.add_argument('--worker', action='store_true',
+                        help="take jobs from the job queue (run on any number of machines)")
+    parser.add_argument('--queue', metavar='URL',
+                        help=f"job queue: an SQLite file or redis://host:port/db (default: 'queue_url', else {QUEUE_FILE})")
+    parser.add_argument('--drain', action='store_true',
+                        help="with --worker: stop once the queue is empty")
+    parser.add_argument('--search', metavar='QUERY',
+                        help="search the transcript archive (with --provider: only that provider's transcripts)")
+    parser.add_argument('--limit', type=int, default=ARCHIVE_LIMIT,
+                        help=f"with --search: show at most this many segments (default: {ARCHIVE_LIMIT})")
+    parser.add_argument('--json', action='store_true',
+                        help="with --search: print one JSON object per segment")
+    parser.add_argument('--import-runs', action='store_true',
+                        help="add every run in 'recordings' to the transcript archive (once, for older runs)")
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], type=str.upper,
+                        help="how much to log (default: 'log_level' in config.json, else INFO)")
+    args = parser.parse_args(argv)
+    setup_logging(args.log_level)
+    if config.get('metrics_port'):
+        metrics.serve(int(config['metrics_port']))
+
+    if args.import_runs:
+        index = archive() or Archive(config.get('archive_file') or ARCHIVE_FILE)
+        ensure_recordings_dir()
+        log.info(f"Imported {index.import_runs('recordings', args.journal)} runs into {index.path}")
+        return
+    if args.search:
+        run_search(args.search, args.provider[0] if args.provider else None, args.limit, args.json)
+        return
+    if args.provider:
+        config['providers'] = args.provider
+    if args.quorum or args.deadline:
+        race = dict(config.get('race') or {})
+        if args.quorum:
+            race['quorum'] = args.quorum
+        if args.deadline:
+            race['deadline'] = args.deadline
+        config['race'] = race
+    if args.live:
+        run_live(args.replay, args.duration)
+        return
+    if args.serve or args.watch:
+        run_service(args.watch)
+        return
+    if args.worker:
+        run_worker(open_queue(args.queue), args.drain)
+        return
+    if not args.inputs:
+        parser.error("no audio file given")
+    audio_files = collect_audio_files(args.inputs)
+    if not audio_files:
+        log.error(f"File not found: {' '.join(args.inputs)}")
+        sys.exit(1)
+    batch = len(audio_files) > 1 or os.path.isdir(args.inputs[0]) or len(args.inputs) > 1
+    if args.coordinator:
+        ensure_recordings_dir()
+        failed = run_coordinator(audio_files, open_queue(args.queue), open_journal(args.journal, args.fresh))
+        if failed:
+            log.error("Not finished (run again to retry): " + ', '.join(failed))
+            sys.exit(1)
+        return
+
+    providers = enabled_providers()
+    if not providers:
+        log.error("No providers enabled. Please add at least one API key to config.json.")
+        sys.exit(1)
+    cache = transcript_cache()
+    if cache:
+        cache.evict()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=config.get('max_workers')) as executor:
+        if not batch:
+            _, combined = process_file(audio_files[0], providers, executor, cache)
+            if combined is None and not config.get('openai_api_key'):
+                sys.exit(1)
+            return
+
+        ensure_recordings_dir()
+        journal = open_journal(args.journal, args.fresh)
+        todo = [path for path in audio_files if not (journal.state(path) or {}).get('done')]
+        if len(todo) < len(audio_files):
+            log.info(f"Skipping {len(audio_files) - len(todo)} files finished in an earlier batch")
+        log.info(f"Batch of {len(todo)} files")
+        failed = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=int(config.get('batch_workers', BATCH_WORKERS)),
+                                                   thread_name_prefix='batch') as files_executor:
+            futures = {files_executor.submit(process_file, path, providers, executor, cache, journal): path
+                       for path in todo}
+            for future in concurrent.futures.as_completed(futures):
+                path = futures[future]
+                try:
+                    future.result()
+                    if not (journal.state(path) or {}).get('done'):
+                        failed.append(path)
+                except Exception as exc:
+                    log.error(f"{path} failed: {exc}")
+                    failed.append(path)
+        log.info(f"Batch finished: {len(todo) - len(failed)} of {len(todo)} files done")
+        if failed:
+            log.error("Not finished (run again to resume): " + ', '.join(failed))
+
+
+if __name__ == "__main__":
+    main()